@@ -0,0 +1,174 @@
+"""
+Admission control for the classification API.
+
+Each endpoint gets its own controller with:
+- a bounded number of requests processed at once (in-flight limit)
+- a bounded wait queue in front of it
+- a maximum time a request may wait in that queue
+
+When the queue is full (or the wait times out) the request is rejected
+immediately with 429 + Retry-After instead of piling more work onto a
+saturated threadpool. Queue-wait and processing time are measured
+separately so overload is visible in every response.
+
+Waiting happens on the event loop, NOT in a worker thread, so queued
+requests never occupy threadpool slots.
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from logger import logger
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request cannot be admitted (queue full or wait timed out)."""
+
+    error_code = "ADMISSION_REJECTED"
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionTicket:
+    """Timing record for one admitted request."""
+
+    queue_wait_seconds: float = 0.0
+    processing_started_at: float = 0.0
+    processing_seconds: float = 0.0
+
+    def timings(self) -> dict:
+        return {
+            "queue_wait_ms": round(self.queue_wait_seconds * 1000, 1),
+            "processing_ms": round(self.processing_seconds * 1000, 1),
+        }
+
+    def headers(self) -> dict:
+        return {
+            "X-Queue-Wait-Ms": f"{self.queue_wait_seconds * 1000:.1f}",
+            "X-Processing-Ms": f"{self.processing_seconds * 1000:.1f}",
+        }
+
+
+class AdmissionController:
+    """
+    Bounded in-flight limit + bounded wait queue for one endpoint.
+
+    Usage:
+        async with controller.admit() as ticket:
+            result = await run_in_threadpool(work)
+        ticket.timings()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        max_queue: int,
+        max_wait_seconds: float,
+        min_retry_after: int = 1,
+    ):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must be >= 0")
+
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.min_retry_after = min_retry_after
+
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._waiting = 0
+        self._rejected = 0
+        # Smoothed processing time, used to estimate Retry-After
+        self._avg_processing_seconds = 0.0
+
+    # -------------------------
+    # Introspection
+    # -------------------------
+    def stats(self) -> dict:
+        return {
+            "endpoint": self.name,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "rejected": self._rejected,
+            "avg_processing_ms": round(self._avg_processing_seconds * 1000, 1),
+        }
+
+    def retry_after(self) -> int:
+        """Estimate how long until a slot is likely free (seconds)."""
+        backlog = self._waiting + 1
+        estimate = self._avg_processing_seconds * backlog / self.max_in_flight
+        return max(self.min_retry_after, math.ceil(estimate))
+
+    # -------------------------
+    # Admission
+    # -------------------------
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        self._rejected += 1
+        retry_after = self.retry_after()
+        logger.warning(
+            "Admission rejected | endpoint=%s reason=%s in_flight=%d waiting=%d retry_after=%ds",
+            self.name, reason, self._in_flight, self._waiting, retry_after,
+        )
+        return AdmissionRejectedError(reason, retry_after)
+
+    async def acquire(self) -> AdmissionTicket:
+        """
+        Wait for a processing slot.
+
+        Raises:
+            AdmissionRejectedError: If the wait queue is full or the wait times out.
+        """
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            raise self._reject("queue full")
+
+        enqueued_at = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            raise self._reject("queue wait timed out")
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        now = time.perf_counter()
+        return AdmissionTicket(
+            queue_wait_seconds=now - enqueued_at,
+            processing_started_at=now,
+        )
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        """Free the slot held by ticket and record its processing time."""
+        ticket.processing_seconds = time.perf_counter() - ticket.processing_started_at
+        self._in_flight -= 1
+        self._slots.release()
+
+        alpha = 0.2
+        if self._avg_processing_seconds == 0.0:
+            self._avg_processing_seconds = ticket.processing_seconds
+        else:
+            self._avg_processing_seconds = (
+                alpha * ticket.processing_seconds + (1 - alpha) * self._avg_processing_seconds
+            )
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[AdmissionTicket]:
+        ticket = await self.acquire()
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
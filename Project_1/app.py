@@ -1,11 +1,18 @@
 # app.py
 from logger import logger
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from pathlib import Path
+import asyncio
+import json
+import os
+import time
 import uuid
 import uvicorn
-from steps.Pipeline import build_document_pipeline
+from admission import AdmissionController, AdmissionRejectedError
+from steps.Pipeline import build_document_pipeline, summarize_result
 from state import TriageState
 
 # -------------------------
@@ -14,6 +21,22 @@ from state import TriageState
 
 app = FastAPI(title="Document Classification Pipeline")
 
+# -------------------------
+# ADMISSION CONTROL (per endpoint)
+# -------------------------
+classify_admission = AdmissionController(
+    name="/classify",
+    max_in_flight=int(os.getenv("CLASSIFY_MAX_IN_FLIGHT", "8")),
+    max_queue=int(os.getenv("CLASSIFY_MAX_QUEUE", "16")),
+    max_wait_seconds=float(os.getenv("CLASSIFY_MAX_WAIT_SECONDS", "30")),
+)
+stream_admission = AdmissionController(
+    name="/classify/stream",
+    max_in_flight=int(os.getenv("STREAM_MAX_IN_FLIGHT", "8")),
+    max_queue=int(os.getenv("STREAM_MAX_QUEUE", "16")),
+    max_wait_seconds=float(os.getenv("STREAM_MAX_WAIT_SECONDS", "30")),
+)
+
 # -------------------------
 # BUILD PIPELINE ONCE
 # -------------------------
@@ -30,59 +53,147 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 # -------------------------
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "admission": [classify_admission.stats(), stream_admission.stats()],
+        "llm_circuit": pipeline.breaker.stats(),
+    }
 
 # -------------------------
-# ROUTE: Process PDF
+# HELPERS
 # -------------------------
-@app.post("/classify")
-def classify_pdf(path:str):
-    # Generate unique filename
-    file_id = str(uuid.uuid4())
-
-    # Initialize TriageState
-    state: TriageState = {
-        "document_id": file_id,
-        'file_path': path,
+def new_state(path: str, document_id: str | None = None) -> TriageState:
+    """
+    Build a TriageState for a document path.
+
+    Re-using a document_id resumes that document from its last
+    checkpointed stage; omitting it starts a new document.
+    """
+    return {
+        "document_id": document_id or str(uuid.uuid4()),
+        "file_path": path,
         "document_content": None,
         "document_type": None,
         "confidence_score": 0.0,
         "classification_details": {},
     }
 
+
+def format_sse(event: str, payload: dict) -> str:
+    """Encode one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+def rejected_response(error: AdmissionRejectedError) -> JSONResponse:
+    """Fast 429 for requests that cannot be admitted."""
+    return JSONResponse(
+        status_code=429,
+        content={"error": "Server busy", "details": error.message, "retry_after": error.retry_after},
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+# -------------------------
+# ROUTE: Process PDF
+# -------------------------
+@app.post("/classify")
+async def classify_pdf(path:str, document_id: str | None = None, restart: bool = False):
+    # Initialize TriageState (restart=true ignores any checkpoint of document_id)
+    state = new_state(path, document_id)
+
+    # Wait for a slot on the event loop, not in the threadpool
+    try:
+        ticket = await classify_admission.acquire()
+    except AdmissionRejectedError as e:
+        return rejected_response(e)
+
     # Run pipeline
     try:
-        result = pipeline(state)
-        response = {
-            "route": result.get("route"),
-            "document_type": state.get("document_type"),
-            "confidence_score": state.get("confidence_score"),
-            "classification_details": state.get("classification_details"),
-        }
-
-        # Include validation results if available
-        if "validation" in result:
-            v = result["validation"]
-            response["validation"] = {
-                "decision": v.validation_decision,
-                "matched_rules": v.matched_rules,
-                "missing_required_rules": v.missing_required_rules,
-                "forbidden_hits": v.forbidden_rule_hits,
-                "justification": v.justification,
-            }
-
-        # Include error if any
-        if "error" in result:
-            response["error"] = str(result["error"])
-
-        return response
+        result = await run_in_threadpool(pipeline, state, restart=restart)
+        response = {"document_id": state["document_id"], **summarize_result(result)}
+        status_code = 200
 
     except Exception as e:
         logger.exception("Pipeline execution failed")
-        return JSONResponse(
-            status_code=500,
-            content={"error": "Pipeline failed", "details": str(e)},
-        )
+        response = {"error": "Pipeline failed", "details": str(e)}
+        status_code = 500
+
+    finally:
+        classify_admission.release(ticket)
+
+    response["timings"] = ticket.timings()
+    return JSONResponse(
+        status_code=status_code,
+        content=jsonable_encoder(response),
+        headers=ticket.headers(),
+    )
+
+# -------------------------
+# ROUTE: Process PDF (SSE progress stream)
+# -------------------------
+@app.post("/classify/stream")
+async def classify_pdf_stream(path: str, document_id: str | None = None, restart: bool = False):
+    """
+    Run the pipeline and stream one SSE event per finished stage:
+    accepted, extracted, pass_1, pass_2, validation, error, route.
+    restart=true re-runs every stage even if document_id has a checkpoint.
+
+    The stream always ends with either a `route` or a `failed` event,
+    which carries queue-wait and processing timings.
+    """
+    state = new_state(path, document_id)
+
+    try:
+        ticket = await stream_admission.acquire()
+    except AdmissionRejectedError as e:
+        return rejected_response(e)
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_event(event: str, payload: dict) -> None:
+        # Called from the worker thread
+        loop.call_soon_threadsafe(events.put_nowait, (event, payload))
+
+    def run() -> None:
+        try:
+            pipeline(state, on_event=on_event, restart=restart)
+        except Exception as e:
+            logger.exception("Pipeline execution failed (stream)")
+            on_event("failed", {"error": "Pipeline failed", "details": str(e)})
+
+    # The slot is tied to the pipeline run, not to the client connection,
+    # so it is released even if the client never reads the stream.
+    worker = loop.run_in_executor(None, run)
+    worker.add_done_callback(lambda _: stream_admission.release(ticket))
+
+    async def event_stream():
+        yield format_sse("accepted", {
+            "document_id": state["document_id"],
+            "path": path,
+            "queue_wait_ms": ticket.timings()["queue_wait_ms"],
+        })
+        try:
+            while True:
+                event, payload = await events.get()
+                if event in ("route", "failed"):
+                    processing = time.perf_counter() - ticket.processing_started_at
+                    payload = {**payload, "timings": {
+                        "queue_wait_ms": ticket.timings()["queue_wait_ms"],
+                        "processing_ms": round(processing * 1000, 1),
+                    }}
+                yield format_sse(event, payload)
+                if event in ("route", "failed"):
+                    break
+        finally:
+            if not worker.done():
+                logger.info("SSE client left early | document_id=%s", state["document_id"])
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__=='__main__':
     uvicorn.run(app=app,host='127.0.0.1',port=5000)
\ No newline at end of file
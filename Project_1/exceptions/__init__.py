@@ -67,6 +67,14 @@ class InvalidModelResponseError(ModelInvocationError):
     error_code = "INVALID_MODEL_RESPONSE"
 
 
+class CircuitOpenError(ModelInvocationError):
+    """
+    Raised without calling the model when the provider's circuit breaker
+    is open (provider known to be failing or too slow).
+    """
+    error_code = "CIRCUIT_OPEN"
+
+
 # =========================
 # State Errors (CRITICAL)
 # =========================
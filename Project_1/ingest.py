@@ -0,0 +1,328 @@
+"""
+ingest.py
+
+Resumable bulk-ingestion CLI.
+
+Walks a directory of PDFs, runs the document pipeline on each file with
+bounded parallelism and writes one result record per document as JSONL
+or Parquet.
+
+Progress is journaled line-by-line, so an interrupted run resumes where
+it stopped. Documents that ended on a retry route (RETRY_EXTRACTION,
+RETRY_CLASSIFICATION, FAIL_PIPELINE) or that were classified in degraded
+mode (LLM circuit open) are NOT journaled and are picked up again on the
+next run. Documents are identified by path + content hash,
+so a file edited since it was journaled is classified again.
+
+Usage:
+    python ingest.py Data/ --output results.jsonl --workers 8
+    python ingest.py archive/ --output results.parquet --format parquet
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Set
+
+from logger import logger
+from steps.Pipeline import build_document_pipeline, summarize_result
+from state import TriageState
+
+
+# Routes that mean "try this document again later"
+RETRY_ROUTES = {"RETRY_EXTRACTION", "RETRY_CLASSIFICATION", "FAIL_PIPELINE"}
+
+
+def is_retryable(record: dict) -> bool:
+    """Retry routes, plus degraded (keyword-only / circuit-open) results."""
+    return record.get("route") in RETRY_ROUTES or bool(record.get("degraded"))
+
+
+# -------------------------
+# Discovery
+# -------------------------
+def discover_files(root: Path, pattern: str = "*.pdf") -> List[Path]:
+    """Recursively list matching files under root, in a stable order."""
+    if not root.is_dir():
+        raise FileNotFoundError(f"Input directory does not exist: {root}")
+    return sorted(p for p in root.rglob(pattern) if p.is_file())
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_id_for(path: Path) -> str:
+    """
+    Deterministic document id from the file's path and content, so re-runs
+    of an unchanged file are idempotent and an edited file is reclassified.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{path.resolve()}#{file_sha256(path)}"))
+
+
+# -------------------------
+# Journal (checkpoint)
+# -------------------------
+def journal_path_for(output: Path, fmt: str) -> Path:
+    """JSONL output doubles as the journal; Parquet gets a sidecar journal."""
+    if fmt == "jsonl":
+        return output
+    return output.with_name(output.name + ".partial.jsonl")
+
+
+def load_completed(journal: Path) -> Set[str]:
+    """Return the document ids (path + content) already present in the journal."""
+    completed: Set[str] = set()
+    if not journal.exists():
+        return completed
+
+    with open(journal, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                completed.add(json.loads(line)["document_id"])
+            except (json.JSONDecodeError, KeyError):
+                # A torn last line from a killed run is expected
+                logger.warning("Skipping unreadable journal line %d in %s", line_no, journal)
+    return completed
+
+
+def repair_journal(journal: Path) -> int:
+    """
+    Cut a torn last line left by a killed run, so the next record starts
+    on a fresh line instead of being glued onto the partial one.
+
+    Returns:
+        int: Bytes removed.
+    """
+    if not journal.exists():
+        return 0
+    with open(journal, "rb+") as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            return 0
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return 0
+
+        # Scan back in blocks for the last complete line
+        end, block = size, 64 * 1024
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            end = start
+        else:
+            keep = 0
+        f.truncate(keep)
+
+    logger.warning("Removed a torn last line (%d bytes) from journal %s", size - keep, journal)
+    return size - keep
+
+
+def iter_journal(journal: Path) -> Iterator[dict]:
+    with open(journal, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def write_parquet(journal: Path, output: Path) -> int:
+    """Convert the journal into a Parquet file. Nested fields are stored as JSON strings."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit("Parquet output requires pyarrow: pip install pyarrow") from e
+
+    rows = []
+    for record in iter_journal(journal):
+        rows.append({
+            "file_path": record.get("file_path"),
+            "document_id": record.get("document_id"),
+            "route": record.get("route"),
+            "document_type": record.get("document_type"),
+            "confidence_score": record.get("confidence_score"),
+            "classification_details": json.dumps(record.get("classification_details"), default=str),
+            "validation": json.dumps(record.get("validation"), default=str),
+            "error": record.get("error"),
+            "elapsed_seconds": record.get("elapsed_seconds"),
+            "processed_at": record.get("processed_at"),
+        })
+
+    pq.write_table(pa.Table.from_pylist(rows), output)
+    return len(rows)
+
+
+# -------------------------
+# Processing
+# -------------------------
+def process_file(pipeline, path: Path, document_id: Optional[str] = None) -> dict:
+    """Run the pipeline on one file and return its journal record."""
+    state: TriageState = {
+        "document_id": document_id or document_id_for(path),
+        "file_path": str(path),
+        "document_content": None,
+        "document_type": None,
+        "confidence_score": 0.0,
+        "classification_details": {},
+    }
+
+    started = time.perf_counter()
+    try:
+        record = summarize_result(pipeline(state))
+    except Exception as e:
+        logger.exception("Pipeline crashed | file=%s", path)
+        record = {"route": "FAIL_PIPELINE", "error": str(e)}
+
+    record.update({
+        "file_path": str(path.resolve()),
+        "document_id": state["document_id"],
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "processed_at": datetime.now(timezone.utc).isoformat(),
+    })
+    return record
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(max(seconds, 0))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+
+
+def print_progress(done: int, total: int, retried: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    sys.stderr.write(
+        f"\r[{done}/{total}] {rate:.2f} docs/s | retry later: {retried} | "
+        f"elapsed {format_eta(elapsed)} | ETA {format_eta(eta)}   "
+    )
+    sys.stderr.flush()
+
+
+def run(
+    input_dir: Path,
+    output: Path,
+    fmt: str = "jsonl",
+    workers: int = 4,
+    pattern: str = "*.pdf",
+) -> dict:
+    """
+    Ingest every matching file under input_dir, resuming from the journal.
+
+    Returns:
+        dict: Run summary (total, skipped, processed, retry_later).
+    """
+    journal = journal_path_for(output, fmt)
+    journal.parent.mkdir(parents=True, exist_ok=True)
+    repair_journal(journal)
+
+    files = discover_files(input_dir, pattern)
+    completed = load_completed(journal)
+    document_ids = {p: document_id_for(p) for p in files}
+    pending = [p for p in files if document_ids[p] not in completed]
+
+    logger.info(
+        "Bulk ingestion starting | files=%d already_done=%d pending=%d workers=%d",
+        len(files), len(files) - len(pending), len(pending), workers,
+    )
+    print(f"Found {len(files)} files, {len(files) - len(pending)} already done, {len(pending)} to process.")
+
+    pipeline = build_document_pipeline()
+
+    done = 0
+    retried = 0
+    started = time.perf_counter()
+    queue = iter(pending)
+
+    with open(journal, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        # Keep a bounded window of futures so 100k files never sit in memory at once
+        in_flight = set()
+        for path in queue:
+            in_flight.add(pool.submit(process_file, pipeline, path, document_ids[path]))
+            if len(in_flight) >= workers * 2:
+                break
+
+        while in_flight:
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                done += 1
+
+                if is_retryable(record):
+                    retried += 1
+                    logger.warning(
+                        "Left for retry | file=%s route=%s degraded=%s",
+                        record["file_path"], record["route"], record.get("degraded"),
+                    )
+                else:
+                    out.write(json.dumps(record, default=str) + "\n")
+                    out.flush()
+
+                next_path = next(queue, None)
+                if next_path is not None:
+                    in_flight.add(pool.submit(process_file, pipeline, next_path, document_ids[next_path]))
+
+            print_progress(done, len(pending), retried, started)
+
+    if pending:
+        sys.stderr.write("\n")
+
+    if fmt == "parquet":
+        rows = write_parquet(journal, output)
+        print(f"Parquet written to {output} ({rows} rows).")
+
+    summary = {
+        "total": len(files),
+        "skipped": len(files) - len(pending),
+        "processed": done,
+        "retry_later": retried,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info("Bulk ingestion finished | %s", summary)
+    return summary
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk-classify a directory of PDFs (resumable).")
+    parser.add_argument("input_dir", type=Path, help="Directory to scan recursively")
+    parser.add_argument("--output", "-o", type=Path, default=Path("results.jsonl"), help="Output file")
+    parser.add_argument("--format", "-f", choices=["jsonl", "parquet"], default=None,
+                        help="Output format (default: from the output file extension)")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="Documents processed in parallel")
+    parser.add_argument("--pattern", default="*.pdf", help="Glob pattern for input files")
+    args = parser.parse_args(argv)
+
+    if args.format is None:
+        args.format = "parquet" if args.output.suffix == ".parquet" else "jsonl"
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = run(args.input_dir, args.output, args.format, args.workers, args.pattern)
+    print(json.dumps(summary, indent=2))
@@ -200,6 +200,72 @@ DOCUMENT_RULES = {
 }
 
 
+# Keyword indicators for deterministic (degraded-mode) classification.
+# Used only when the LLM provider is unavailable.
+DOCUMENT_KEYWORDS = {
+    "invoice": ["invoice", "invoice #", "invoice number", "bill to", "amount due", "due date", "subtotal"],
+    "contract": ["agreement", "contract", "parties", "hereinafter", "effective date", "terms and conditions", "in witness whereof"],
+    "w2_form": ["w-2", "wage and tax statement", "employer identification number", "social security wages", "federal income tax withheld"],
+    "medical_record": ["patient", "diagnosis", "prescription", "lab results", "medical history", "date of service", "physician"],
+    "insurance_claim": ["claim number", "claim #", "policy number", "insured", "date of loss", "claimant", "incident"],
+    "purchase_order": ["purchase order", "po number", "p.o.", "ship to", "delivery date", "quantity", "vendor"],
+    "resume": ["linkedin", "experience", "education", "skills", "resume", "curriculum vitae", "projects"],
+}
+
+# Deterministic validation rules: rule -> any-of keywords.
+# "forbidden" keywords must NOT appear for the label.
+DOCUMENT_KEYWORD_RULES = {
+    "invoice": {
+        "required": {
+            "invoice number": ["invoice #", "invoice no", "invoice number"],
+            "total amount": ["total", "amount due", "balance due"],
+            "issue or due date": ["date", "due date"],
+        },
+        "forbidden": [],
+    },
+    "contract": {
+        "required": {
+            "parties involved": ["parties", "between", "party"],
+            "effective date or terms": ["effective date", "term", "terms"],
+            "signatures": ["signature", "signed", "in witness whereof"],
+        },
+        "forbidden": ["draft"],
+    },
+    "w2_form": {
+        "required": {
+            "W-2 title": ["w-2", "wage and tax statement"],
+            "employer info": ["employer", "employer identification number"],
+            "wages and tax": ["wages", "federal income tax"],
+        },
+        "forbidden": [],
+    },
+    "medical_record": {
+        "required": {
+            "patient info": ["patient", "dob", "date of birth"],
+            "clinical headings": ["diagnosis", "prescription", "lab results"],
+            "dates of service": ["date of service", "visit date", "date"],
+        },
+        "forbidden": [],
+    },
+    "insurance_claim": {
+        "required": {
+            "claim number": ["claim number", "claim #", "claim no"],
+            "policy number": ["policy number", "policy #", "policy no"],
+            "incident details": ["date of loss", "incident", "accident"],
+        },
+        "forbidden": [],
+    },
+    "purchase_order": {
+        "required": {
+            "PO number": ["purchase order", "po number", "po #", "p.o."],
+            "vendor info": ["vendor", "supplier"],
+            "item quantities": ["quantity", "qty"],
+        },
+        "forbidden": [],
+    },
+}
+
+
 RouteDecision = Literal[
     "ACCEPT",
     "RETRY_CLASSIFICATION",
@@ -208,3 +274,13 @@ RouteDecision = Literal[
     "REJECT",
     "FAIL_PIPELINE",
 ]
+
+
+# State carried by the checkpointed pipeline graph (steps/Pipeline.py).
+# Every stage writes its output here so a retry can resume from the
+# stage that failed instead of starting over.
+class PipelineState(TriageState, total=False):
+    pass_1: DocumentClassification | None
+    pass_2: DocumentClassification | None
+    validation: DocumentValidation | None
+    route: RouteDecision | None
@@ -0,0 +1,168 @@
+"""
+Circuit_Breaker.py
+
+Purpose:
+--------
+Circuit breaker around the LLM provider (Groq).
+
+States:
+- CLOSED    : calls go through; consecutive failures / slow calls are counted
+- OPEN      : calls fail fast with CircuitOpenError until reset_timeout passes
+- HALF_OPEN : a limited number of probe calls are let through;
+              success closes the circuit, failure re-opens it
+
+A single breaker is shared by every chain that talks to the same
+provider (pass 1, pass 2, validation), so one outage trips them all
+and no worker thread waits on a timeout that is known to fail.
+"""
+
+import threading
+import time
+from typing import Any, Callable
+
+from langchain_core.runnables import RunnableLambda
+
+from logger import logger
+from exceptions import CircuitOpenError
+
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    Args:
+        name: Name used in logs and errors.
+        failure_threshold: Consecutive failures that open the circuit.
+        slow_call_seconds: Calls slower than this count as failures
+            even when they succeed.
+        reset_timeout_seconds: Time spent OPEN before probing again.
+        half_open_max_calls: Concurrent probe calls allowed while HALF_OPEN.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        slow_call_seconds: float = 20.0,
+        reset_timeout_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._short_circuited = 0
+
+    # -------------------------
+    # Introspection
+    # -------------------------
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "name": self.name,
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "short_circuited": self._short_circuited,
+            }
+
+    # -------------------------
+    # State transitions (lock held)
+    # -------------------------
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+            logger.info("Circuit %s half-open | probing provider", self.name)
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            logger.warning(
+                "Circuit %s OPEN | consecutive_failures=%d | failing fast for %.0fs",
+                self.name, self._consecutive_failures, self.reset_timeout_seconds,
+            )
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+
+    # -------------------------
+    # Call accounting
+    # -------------------------
+    def before_call(self) -> None:
+        """
+        Reserve permission to call the provider.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or half-open with
+                all probe slots taken).
+        """
+        with self._lock:
+            self._maybe_half_open()
+
+            if self._state == OPEN:
+                self._short_circuited += 1
+                raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+            if self._state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self._short_circuited += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open, probe in progress")
+                self._half_open_in_flight += 1
+
+    def record_success(self, duration_seconds: float) -> None:
+        if duration_seconds > self.slow_call_seconds:
+            logger.warning("Slow call on circuit %s | %.1fs", self.name, duration_seconds)
+            self.record_failure()
+            return
+
+        with self._lock:
+            if self._state == HALF_OPEN:
+                logger.info("Circuit %s CLOSED | provider recovered", self.name)
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            self._state = CLOSED
+            self._consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                self._open()
+            elif self._consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    # -------------------------
+    # Wrappers
+    # -------------------------
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Invoke fn through the breaker."""
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def wrap(self, runnable) -> RunnableLambda:
+        """Return a Runnable that invokes `runnable` through the breaker."""
+        return RunnableLambda(lambda value: self.call(runnable.invoke, value), name=f"{self.name}_breaker")
@@ -18,7 +18,7 @@ from langchain_groq import ChatGroq
 from langchain_classic.schema import Document
 from logger import logger
 from prompts import CLASSIFICAION_PROMPT
-from state import DocumentClassification, TriageState
+from state import DocumentClassification, TriageState, DOCUMENT_KEYWORDS
 from exceptions import (
     FileIngestionError,
     TextExtractionError,
@@ -181,6 +181,48 @@ def create_classification_workflow(llm, system_prompt) -> state.CompiledStateGra
     return builder.compile()
 
 
+# -------------------------
+# Degraded-mode classification
+# -------------------------
+DEGRADED_MAX_CONFIDENCE = 0.6
+
+
+def classify_with_keywords(content: str) -> DocumentClassification:
+    """
+    Deterministic keyword classification used when the LLM is unavailable.
+
+    Confidence is capped at DEGRADED_MAX_CONFIDENCE so a degraded
+    label is never mistaken for a model-confirmed one.
+    """
+    text = content.lower()
+    scores = {
+        doc_type: [kw for kw in keywords if kw in text]
+        for doc_type, keywords in DOCUMENT_KEYWORDS.items()
+    }
+    ranked = sorted(scores.items(), key=lambda item: len(item[1]), reverse=True)
+    best_type, best_hits = ranked[0]
+
+    if not best_hits:
+        return DocumentClassification(
+            document_type="unknown",
+            confidence=0.0,
+            alternative_types=[],
+            reasoning="Degraded mode: no keyword indicators matched.",
+            key_indicators=[],
+        )
+
+    total = sum(len(hits) for hits in scores.values())
+    confidence = min(DEGRADED_MAX_CONFIDENCE, len(best_hits) / total)
+
+    return DocumentClassification(
+        document_type=best_type,
+        confidence=round(confidence, 3),
+        alternative_types=[doc_type for doc_type, hits in ranked[1:3] if hits],
+        reasoning=f"Degraded mode: {len(best_hits)} keyword indicators matched for {best_type}.",
+        key_indicators=best_hits,
+    )
+
+
 # -------------------------
 # Main classification function
 # -------------------------
@@ -3,21 +3,290 @@ pipeline.py
 
 Single-entry document pipeline.
 Classification, validation, and routing are wired ONCE.
+
+The stages run as a LangGraph graph with a persistent checkpointer
+(SQLite), keyed by `document_id`:
+
+    extract -> classify_pass_1 -> [classify_pass_2] -> validate -> route
+
+Each finished stage is checkpointed. If a stage raises (e.g.
+ModelInvocationError -> RETRY_CLASSIFICATION), calling the pipeline
+again with the same `document_id` resumes at the failed stage instead
+of re-reading, re-extracting and re-OCRing the PDF. Checkpoints of
+documents not touched for CHECKPOINT_TTL_SECONDS are deleted, so the
+store does not keep every extracted text forever.
+
+Every model call goes through one shared CircuitBreaker. While it is
+open, classification and validation fall back to deterministic keyword
+rules (degraded mode) and the document is routed to HUMAN_REVIEW.
+Degraded results are not final: calling the pipeline again for the same
+document re-runs classification (the extraction checkpoint is kept).
 """
 
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
 from logger import logger
 from langchain_groq import ChatGroq
+from langgraph.graph import StateGraph, START, END
 
-from state import TriageState
-from steps.File_Classification import file_extraction_workflow
-from steps.Validation import create_validation_chain, validate_document
+from state import TriageState, PipelineState
+from steps.File_Classification import file_extraction_workflow, classify_with_keywords
+from steps.Validation import create_validation_chain, validate_document, validate_document_with_rules
 from steps.Routing import route
+from steps.Circuit_Breaker import CircuitBreaker
 from state import DocumentClassification
 from prompts import CLASSIFICAION_PROMPT
-from exceptions import ClassificationPipelineError
+from exceptions import ClassificationPipelineError, ModelInvocationError, CircuitOpenError
+
+
+# -------------------------
+# CONFIG
+# -------------------------
+CHECKPOINT_DB = Path("checkpoints/pipeline.sqlite")
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 3600  # idle documents' checkpoints are deleted after this
+CHECKPOINT_PRUNE_INTERVAL_SECONDS = 3600
+PASS_1_ACCEPT_THRESHOLD = 0.8
+LLM_TIMEOUT_SECONDS = 30.0
+LLM_MAX_RETRIES = 1
+
+# Graph node -> public stage event name
+STAGE_EVENTS = {
+    "extract": "extracted",
+    "classify_pass_1": "pass_1",
+    "classify_pass_2": "pass_2",
+    "validate": "validation",
+}
+
+
+# Callback invoked as each pipeline stage finishes: (event_name, payload)
+EventCallback = Callable[[str, dict], None]
+
+
+def _emit(on_event: Optional[EventCallback], event: str, payload: dict) -> None:
+    """
+    Deliver a stage event to the caller.
+
+    A broken consumer must never break the pipeline, so callback
+    failures are logged and swallowed.
+    """
+    if on_event is None:
+        return
+    try:
+        on_event(event, payload)
+    except Exception:
+        logger.exception("Pipeline event callback failed | event=%s", event)
+
+
+def serialize_validation(validation) -> dict:
+    """Convert a DocumentValidation into the public API shape."""
+    return {
+        "decision": validation.validation_decision,
+        "matched_rules": validation.matched_rules,
+        "missing_required_rules": validation.missing_required_rules,
+        "forbidden_hits": validation.forbidden_rule_hits,
+        "justification": validation.justification,
+    }
+
+
+def summarize_result(result: dict) -> dict:
+    """
+    Convert the raw pipeline output into a JSON-serializable response.
+
+    Shared by every front-end (REST, SSE, Streamlit) so they all
+    report the same shape.
+    """
+    state = result.get("state") or {}
+    response = {
+        "route": result.get("route"),
+        "document_type": state.get("document_type"),
+        "confidence_score": state.get("confidence_score"),
+        "classification_details": state.get("classification_details"),
+    }
+
+    # Include validation results if available
+    if "validation" in result:
+        response["validation"] = serialize_validation(result["validation"])
+
+    # Include error if any
+    if "error" in result:
+        response["error"] = str(result["error"])
+
+    # Produced without the LLM (circuit open): worth retrying once it recovers
+    response["degraded"] = bool(
+        (state.get("classification_details") or {}).get("degraded")
+        or isinstance(result.get("error"), CircuitOpenError)
+    )
+
+    return response
+
+
+def _content_str(state: PipelineState) -> str:
+    return "\n".join(
+        c.page_content if hasattr(c, "page_content") else str(c)
+        for c in state.get("document_content") or []
+    )
+
+
+def _stage_payload(node: str, state: PipelineState) -> dict:
+    """Build the public event payload for a finished graph node."""
+    payload = {"document_id": state["document_id"]}
+
+    if node == "extract":
+        payload.update({
+            "chunks": len(state.get("document_content") or []),
+            "characters": len(_content_str(state)),
+        })
+    elif node == "classify_pass_1":
+        quick = state["pass_1"]
+        payload.update({
+            "document_type": quick.document_type,
+            "confidence": quick.confidence,
+            "accepted": quick.confidence >= PASS_1_ACCEPT_THRESHOLD,
+            "degraded": bool(state["classification_details"].get("degraded")),
+        })
+    elif node == "classify_pass_2":
+        detailed = state["pass_2"]
+        payload.update({
+            "document_type": detailed.document_type,
+            "confidence": detailed.confidence,
+            "ambiguous": state["classification_details"]["ambiguous"],
+            "degraded": bool(state["classification_details"].get("degraded")),
+        })
+    elif node == "validate":
+        payload.update(serialize_validation(state["validation"]))
+
+    return payload
+
+
+def create_checkpointer(checkpoint_path: Optional[Path] = CHECKPOINT_DB):
+    """
+    Create the graph checkpointer.
+
+    Args:
+        checkpoint_path: SQLite file for persistent checkpoints.
+            None keeps checkpoints in memory (lost on restart).
+    """
+    if checkpoint_path is None:
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
+
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    checkpoint_path = Path(checkpoint_path)
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(checkpoint_path), check_same_thread=False)
+    logger.info("Pipeline checkpoints stored at %s", checkpoint_path)
+    return SqliteSaver(conn)
+
+
+class CheckpointRetention:
+    """
+    Deletes the checkpoints of documents idle for longer than a TTL.
+
+    Last use per document_id is kept in a `checkpoint_threads` table in
+    the checkpoint database (in memory for MemorySaver). Pruning runs at
+    most once per `prune_every_seconds`, piggybacked on pipeline calls.
+
+    Args:
+        checkpointer: Graph checkpointer (SqliteSaver or MemorySaver).
+        ttl_seconds: Idle time after which a document's checkpoints go.
+        prune_every_seconds: Minimum time between prune passes.
+    """
+
+    def __init__(
+        self,
+        checkpointer,
+        ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+        prune_every_seconds: float = CHECKPOINT_PRUNE_INTERVAL_SECONDS,
+    ):
+        self.checkpointer = checkpointer
+        self.ttl_seconds = ttl_seconds
+        self.prune_every_seconds = prune_every_seconds
+
+        self._conn = getattr(checkpointer, "conn", None)
+        # Share the saver's lock: both use the same SQLite connection
+        self._lock = getattr(checkpointer, "lock", None) or threading.Lock()
+        self._touched: dict = {}
+        self._last_prune = 0.0
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS checkpoint_threads "
+                    "(thread_id TEXT PRIMARY KEY, touched_at REAL NOT NULL)"
+                )
+                self._conn.commit()
+
+    def touch(self, thread_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                self._touched[thread_id] = now
+                return
+            self._conn.execute(
+                "INSERT INTO checkpoint_threads (thread_id, touched_at) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET touched_at = excluded.touched_at",
+                (thread_id, now),
+            )
+            self._conn.commit()
+
+    def _expired(self, cutoff: float) -> list:
+        with self._lock:
+            if self._conn is None:
+                return [t for t, at in self._touched.items() if at < cutoff]
+            try:
+                # Adopt checkpoints written before retention was tracked
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO checkpoint_threads (thread_id, touched_at) "
+                    "SELECT DISTINCT thread_id, ? FROM checkpoints",
+                    (time.time(),),
+                )
+                self._conn.commit()
+            except sqlite3.OperationalError:
+                pass  # checkpoints table not created yet
+            rows = self._conn.execute(
+                "SELECT thread_id FROM checkpoint_threads WHERE touched_at < ?", (cutoff,)
+            ).fetchall()
+            return [row[0] for row in rows]
+
+    def prune(self) -> int:
+        """
+        Delete checkpoints of documents idle longer than the TTL.
+
+        Returns:
+            int: Number of documents removed.
+        """
+        self._last_prune = time.time()
+        expired = self._expired(self._last_prune - self.ttl_seconds)
+        for thread_id in expired:
+            self.checkpointer.delete_thread(thread_id)
+            with self._lock:
+                if self._conn is None:
+                    self._touched.pop(thread_id, None)
+                else:
+                    self._conn.execute("DELETE FROM checkpoint_threads WHERE thread_id = ?", (thread_id,))
+                    self._conn.commit()
+        if expired:
+            logger.info("🧹 Pruned checkpoints of %d idle documents", len(expired))
+        return len(expired)
+
+    def maybe_prune(self) -> None:
+        if time.time() - self._last_prune >= self.prune_every_seconds:
+            try:
+                self.prune()
+            except Exception:
+                logger.exception("Checkpoint pruning failed")
 
 
-def build_document_pipeline():
+def build_document_pipeline(
+    checkpoint_path: Optional[Path] = CHECKPOINT_DB,
+    breaker: Optional[CircuitBreaker] = None,
+    degraded_mode: bool = True,
+    checkpoint_ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+):
     """
     Builds the document pipeline ONCE and returns a callable.
 
@@ -26,8 +295,20 @@ def build_document_pipeline():
     - repeated chain construction
     - hidden state bugs
 
+    Args:
+        checkpoint_path: SQLite file used to checkpoint stage outputs
+            per document_id. None keeps checkpoints in memory.
+        breaker: CircuitBreaker shared by all model calls. One is
+            created when omitted (exposed as `pipeline.breaker`).
+        degraded_mode: When the circuit is open, classify/validate with
+            deterministic keyword rules. If False, the document fails
+            fast with CircuitOpenError and is routed to HUMAN_REVIEW.
+        checkpoint_ttl_seconds: Checkpoints of documents idle this long
+            are deleted (see CheckpointRetention).
+
     Returns:
-        function(state: TriageState) -> dict
+        function(state: TriageState, on_event: EventCallback | None = None,
+                 restart: bool = False) -> dict
     """
 
     logger.info("🧠 Initializing document pipeline (one-time setup)")
@@ -38,89 +319,138 @@ def build_document_pipeline():
     llm = ChatGroq(
         model="llama-3.3-70b-versatile",
         temperature=0.0,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
     )
+    breaker = breaker or CircuitBreaker("groq")
 
     # -------------------------
     # SHARED CHAINS
     # -------------------------
-    classifier = llm.with_structured_output(DocumentClassification)
-    validation_chain = create_validation_chain()
+    classifier = breaker.wrap(llm.with_structured_output(DocumentClassification))
+    validation_chain = create_validation_chain(breaker=breaker, llm=llm)
+
+    def degraded_classification(state: PipelineState, stage: str) -> dict:
+        logger.warning("⚠️ LLM circuit open | degraded classification (%s)", stage)
+        fallback = classify_with_keywords(_content_str(state))
+        return {
+            stage: fallback,
+            "document_type": fallback.document_type,
+            "confidence_score": fallback.confidence,
+            "classification_details": {
+                "pass": "degraded",
+                "reasoning": fallback.reasoning,
+                "key_indicators": fallback.key_indicators,
+                "alternative_types": fallback.alternative_types,
+                "ambiguous": True,
+                "degraded": True,
+            },
+        }
 
     # =========================
-    # PIPELINE FUNCTION
+    # GRAPH NODES
     # =========================
-    def pipeline(state: TriageState) -> dict:
-        """
-        Executes the full pipeline on a TriageState.
-
-        Steps:
-        1. Extraction
-        2. Classification (two-pass)
-        3. Validation
-        4. Routing decision
-        """
+    def extract(state: PipelineState) -> dict:
+        chunks = file_extraction_workflow(state["file_path"])
+        # A fresh extraction invalidates every downstream stage
+        return {
+            "document_content": chunks,
+            "document_type": None,
+            "confidence_score": 0.0,
+            "classification_details": {},
+            "pass_1": None,
+            "pass_2": None,
+            "validation": None,
+            "route": None,
+        }
 
+    def classify_pass_1(state: PipelineState) -> dict:
         try:
-            # -------------------------
-            # EXTRACTION
-            # -------------------------
-            chunks = file_extraction_workflow(state["file_path"])
-            state["document_content"] = chunks
-
-            content_str = "\n".join(
-                c.page_content if hasattr(c, "page_content") else str(c)
-                for c in chunks
-            )
-
-            # -------------------------
-            # CLASSIFICATION (PASS 1)
-            # -------------------------
             quick = classifier.invoke([
                 ("system", "Classify this document quickly."),
-                ("human", content_str[:2000]),
+                ("human", _content_str(state)[:2000]),
             ])
+        except CircuitOpenError:
+            if not degraded_mode:
+                raise
+            return degraded_classification(state, "pass_1")
+        except Exception as e:
+            logger.exception("❌ Model invocation failed (pass 1)")
+            raise ModelInvocationError(str(e))
 
-            if quick.confidence >= 0.8:
-                state["document_type"] = quick.document_type
-                state["confidence_score"] = quick.confidence
-                state["classification_details"] = {
+        update = {"pass_1": quick}
+        if quick.confidence >= PASS_1_ACCEPT_THRESHOLD:
+            update.update({
+                "document_type": quick.document_type,
+                "confidence_score": quick.confidence,
+                "classification_details": {
                     "pass": 1,
                     "reasoning": quick.reasoning,
                     "key_indicators": quick.key_indicators,
                     "alternative_types": quick.alternative_types,
                     "ambiguous": False,
-                }
-            else:
-                # -------------------------
-                # CLASSIFICATION (PASS 2)
-                # -------------------------
-                detailed = classifier.invoke([
-                    ("system", CLASSIFICAION_PROMPT),
-                    ("human", content_str),
-                ])
-
-                ambiguous = (
-                    detailed.confidence < 0.8
-                    or len(detailed.alternative_types) > 2
-                )
+                },
+            })
+        return update
+
+    def classify_pass_2(state: PipelineState) -> dict:
+        try:
+            detailed = classifier.invoke([
+                ("system", CLASSIFICAION_PROMPT),
+                ("human", _content_str(state)),
+            ])
+        except CircuitOpenError:
+            if not degraded_mode:
+                raise
+            return degraded_classification(state, "pass_2")
+        except Exception as e:
+            logger.exception("❌ Model invocation failed (pass 2)")
+            raise ModelInvocationError(str(e))
+
+        ambiguous = (
+            detailed.confidence < PASS_1_ACCEPT_THRESHOLD
+            or len(detailed.alternative_types) > 2
+        )
+
+        return {
+            "pass_2": detailed,
+            "document_type": detailed.document_type,
+            "confidence_score": detailed.confidence,
+            "classification_details": {
+                "pass": 2,
+                "reasoning": detailed.reasoning,
+                "key_indicators": detailed.key_indicators,
+                "alternative_types": detailed.alternative_types,
+                "ambiguous": ambiguous,
+            },
+        }
 
-                state["document_type"] = detailed.document_type
-                state["confidence_score"] = detailed.confidence
-                state["classification_details"] = {
-                    "pass": 2,
-                    "reasoning": detailed.reasoning,
-                    "key_indicators": detailed.key_indicators,
-                    "alternative_types": detailed.alternative_types,
-                    "ambiguous": ambiguous,
-                }
-
-            # -------------------------
-            # VALIDATION
-            # -------------------------
-            extracted_signals = {
-                "text_snippet": content_str[:1500]
+    def after_pass_1(state: PipelineState) -> str:
+        # Set only when pass 1 was confident or degraded mode took over
+        if state["classification_details"]:
+            return "validate"
+        return "classify_pass_2"
+
+    def validate(state: PipelineState) -> dict:
+        extracted_signals = {
+            "text_snippet": _content_str(state)[:1500]
+        }
+
+        def rule_validation() -> dict:
+            # Keyword rules never auto-accept: mark the result degraded for routing
+            return {
+                "validation": validate_document_with_rules(
+                    validated_label=state["document_type"],
+                    classifier_confidence=state["confidence_score"],
+                    extracted_signals=extracted_signals,
+                ),
+                "classification_details": {**state["classification_details"], "degraded": True},
             }
 
+        if state["classification_details"].get("degraded"):
+            return rule_validation()
+
+        try:
             validation = validate_document(
                 validated_label=state["document_type"],
                 classifier_confidence=state["confidence_score"],
@@ -128,24 +458,145 @@ def build_document_pipeline():
                 extracted_signals=extracted_signals,
                 chain=validation_chain,
             )
+        except CircuitOpenError:
+            if not degraded_mode:
+                raise
+            logger.warning("⚠️ LLM circuit open | degraded rule validation")
+            return rule_validation()
+        except ClassificationPipelineError:
+            raise
+        except Exception as e:
+            raise ModelInvocationError(str(e))
 
-            # -------------------------
-            # ROUTING
-            # -------------------------
-            decision = route(state)
+        return {"validation": validation}
 
-            return {
+    def route_node(state: PipelineState) -> dict:
+        return {"route": route(state)}
+
+    # =========================
+    # GRAPH
+    # =========================
+    builder = StateGraph(PipelineState)
+    builder.add_node("extract", extract)
+    builder.add_node("classify_pass_1", classify_pass_1)
+    builder.add_node("classify_pass_2", classify_pass_2)
+    builder.add_node("validate", validate)
+    builder.add_node("route", route_node)
+
+    builder.add_edge(START, "extract")
+    builder.add_edge("extract", "classify_pass_1")
+    builder.add_conditional_edges(
+        "classify_pass_1",
+        after_pass_1,
+        {"validate": "validate", "classify_pass_2": "classify_pass_2"},
+    )
+    builder.add_edge("classify_pass_2", "validate")
+    builder.add_edge("validate", "route")
+    builder.add_edge("route", END)
+
+    checkpointer = create_checkpointer(checkpoint_path)
+    retention = CheckpointRetention(checkpointer, ttl_seconds=checkpoint_ttl_seconds)
+    graph = builder.compile(checkpointer=checkpointer)
+
+    # =========================
+    # PIPELINE FUNCTION
+    # =========================
+    def pipeline(
+        state: TriageState,
+        on_event: Optional[EventCallback] = None,
+        restart: bool = False,
+    ) -> dict:
+        """
+        Executes the full pipeline on a TriageState.
+
+        Steps:
+        1. Extraction
+        2. Classification (two-pass)
+        3. Validation
+        4. Routing decision
+
+        Calling this again with the same document_id resumes from the
+        stage that failed. A document that already finished returns its
+        stored result without re-running any stage.
+
+        Args:
+            state: TriageState to process (updated in place with the
+                checkpointed values).
+            on_event: Optional callback receiving (event, payload) as each
+                stage finishes. Events: extracted, pass_1, pass_2,
+                validation, error, route.
+            restart: Ignore any checkpoint and run every stage again.
+        """
+        retention.maybe_prune()
+        retention.touch(state["document_id"])
+        config = {"configurable": {"thread_id": state["document_id"]}}
+        snapshot = graph.get_state(config)
+
+        completed = False
+        if restart or not snapshot.values:
+            graph_input = dict(state)
+        elif not snapshot.next and (snapshot.values.get("classification_details") or {}).get("degraded"):
+            # Degraded results are provisional: keep the extraction, classify again
+            logger.info("♻️ Re-classifying degraded document %s", state["document_id"])
+            graph.update_state(config, {
+                "document_type": None,
+                "confidence_score": 0.0,
+                "classification_details": {},
+                "pass_1": None,
+                "pass_2": None,
+                "validation": None,
+                "route": None,
+            }, as_node="extract")
+            graph_input = None
+        elif snapshot.next:
+            logger.info(
+                "♻️ Resuming document %s at stage %s",
+                state["document_id"], ", ".join(snapshot.next),
+            )
+            graph_input = None
+        else:
+            logger.info("✅ Document %s already processed | returning checkpoint", state["document_id"])
+            completed = True
+
+        error = None
+        if not completed:
+            values = dict(graph_input or snapshot.values)
+            try:
+                for update in graph.stream(graph_input, config, stream_mode="updates"):
+                    for node, node_update in update.items():
+                        values.update(node_update or {})
+                        if node in STAGE_EVENTS:
+                            _emit(on_event, STAGE_EVENTS[node], _stage_payload(node, values))
+            except ClassificationPipelineError as e:
+                error = e
+
+        values = graph.get_state(config).values
+        state.update({key: values[key] for key in TriageState.__annotations__ if key in values})
+
+        if error is not None:
+            _emit(on_event, "error", {
+                "document_id": state["document_id"],
+                "error_code": error.error_code,
+                "message": error.message,
+            })
+            result = {
                 "state": state,
-                "validation": validation,
-                "route": decision,
+                "error": error,
+                "route": route(state, error=error),
             }
-
-        except ClassificationPipelineError as e:
-            decision = route(state, error=e)
-            return {
+        else:
+            result = {
                 "state": state,
-                "error": e,
-                "route": decision,
+                "validation": values["validation"],
+                "route": values["route"],
             }
 
+        _emit(on_event, "route", {
+            "document_id": state["document_id"],
+            **summarize_result(result),
+        })
+        return result
+
+    pipeline.breaker = breaker
+    pipeline.prune_checkpoints = retention.prune
     return pipeline
@@ -12,6 +12,7 @@ from exceptions import (
     FileIngestionError,
     TextExtractionError,
     OCRFailureError,
+    CircuitOpenError,
     ModelInvocationError,
     InvalidPipelineStateError,
     LowConfidenceClassificationError,
@@ -58,6 +59,13 @@ def route(
             logger.warning("Extraction-related error | retrying")
             return "RETRY_EXTRACTION"
 
+        # -------------------------
+        # PROVIDER DOWN (circuit open) → don't queue retries behind it
+        # -------------------------
+        if isinstance(error, CircuitOpenError):
+            logger.warning("LLM circuit open | fast-routing to human review")
+            return "HUMAN_REVIEW"
+
         # -------------------------
         # MODEL FAILURES
         # -------------------------
@@ -85,6 +93,11 @@ def route(
         if not state.get("document_type"):
             raise RoutingDecisionError("Missing document_type in state")
 
+        # Degraded (LLM-free) results are never auto-routed
+        if (state.get("classification_details") or {}).get("degraded"):
+            logger.info("Degraded-mode classification | escalating to human review")
+            return "HUMAN_REVIEW"
+
         confidence = state.get("confidence_score", 0.0)
         logger.debug("State confidence_score=%.2f", confidence)
 
@@ -23,7 +23,7 @@ from typing import Dict, Any
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
 
-from state import DocumentValidation, DOCUMENT_RULES
+from state import DocumentValidation, DOCUMENT_RULES, DOCUMENT_KEYWORD_RULES
 from prompts import VALIDATION_PROMPT
 
 
@@ -32,11 +32,18 @@ from prompts import VALIDATION_PROMPT
 # =========================
 # CHAIN CREATION
 # =========================
-def create_validation_chain():
+def create_validation_chain(breaker=None, llm=None):
     """
     Create a validation chain that evaluates classifier output
     against rule definitions using structured evidence only.
 
+    Args:
+        breaker: Optional CircuitBreaker guarding the model call.
+            When open, the chain raises CircuitOpenError immediately.
+        llm: Chat model to use (the pipeline passes its shared, bounded
+            one). Defaults to Groq with a 30s timeout and one retry, so a
+            hung call can never block a worker indefinitely.
+
     Returns:
         Runnable chain producing DocumentValidation.
     """
@@ -77,12 +84,17 @@ Return:
 - justification (concise, factual)
 """
     ])
-    llm = ChatGroq(
+    llm = llm or ChatGroq(
         model="llama-3.3-70b-versatile",
-        temperature=0.0
+        temperature=0.0,
+        timeout=30.0,
+        max_retries=1,
     )
+    structured = llm.with_structured_output(DocumentValidation)
+    if breaker is not None:
+        structured = breaker.wrap(structured)
     logger.info("Validation chain created successfully.")
-    return prompt | llm.with_structured_output(DocumentValidation)
+    return prompt | structured
 
 
 # =========================
@@ -132,3 +144,64 @@ def validate_document(
     except Exception:
         logger.exception("Validation chain invocation failed")
         raise
+
+
+# =========================
+# DEGRADED-MODE VALIDATION
+# =========================
+def validate_document_with_rules(
+    *,
+    validated_label: str,
+    classifier_confidence: float,
+    extracted_signals: Dict[str, Any],
+) -> DocumentValidation:
+    """
+    Deterministic keyword-rule validation used when the LLM is unavailable.
+
+    Args:
+        validated_label (str): Label produced by the classifier.
+        classifier_confidence (float): Confidence score from classification.
+        extracted_signals (Dict[str, Any]): Structured evidence extracted earlier.
+
+    Returns:
+        DocumentValidation: VALID if every required rule matched,
+        WEAK if some did, INVALID if none did or a forbidden rule hit.
+    """
+    rules = DOCUMENT_KEYWORD_RULES.get(validated_label)
+    text = str(extracted_signals.get("text_snippet", "")).lower()
+
+    if rules is None:
+        return DocumentValidation(
+            validated_label=validated_label,
+            classifier_confidence=classifier_confidence,
+            validation_decision="INVALID",
+            matched_rules=[],
+            missing_required_rules=[],
+            forbidden_rule_hits=[],
+            justification=f"Degraded mode: no deterministic rules for '{validated_label}'.",
+        )
+
+    matched = [rule for rule, keywords in rules["required"].items() if any(kw in text for kw in keywords)]
+    missing = [rule for rule in rules["required"] if rule not in matched]
+    forbidden = [kw for kw in rules["forbidden"] if kw in text]
+
+    if forbidden or not matched:
+        decision = "INVALID"
+    elif missing:
+        decision = "WEAK"
+    else:
+        decision = "VALID"
+
+    logger.info("Rule validation completed (degraded) | label=%s decision=%s", validated_label, decision)
+    return DocumentValidation(
+        validated_label=validated_label,
+        classifier_confidence=classifier_confidence,
+        validation_decision=decision,
+        matched_rules=matched,
+        missing_required_rules=missing,
+        forbidden_rule_hits=forbidden,
+        justification=(
+            f"Degraded mode (LLM unavailable): {len(matched)}/{len(rules['required'])} "
+            "keyword rules matched."
+        ),
+    )
@@ -0,0 +1,27 @@
+import json
+import requests
+
+url = "http://127.0.0.1:5000/classify/stream"
+
+params = {
+    "path": "Data/sample-invoice.pdf"  # real PDF path on server
+}
+
+try:
+    with requests.post(url, params=params, stream=True, timeout=(10, 180)) as response:
+        response.raise_for_status()
+
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                payload = json.loads(line[len("data: "):])
+                print(f"[{event}] {payload}")
+
+                # Early consumers can act on a confident pass-1 label here
+                if event == "pass_1" and payload.get("accepted"):
+                    print(f"Early label: {payload['document_type']}")
+
+except requests.exceptions.RequestException as e:
+    print("Request failed:", e)
@@ -0,0 +1,38 @@
+"""
+escalation.py
+
+Purpose:
+--------
+Hand a ticket to a human. Used by the router's "E" verdict and by the
+responder when a guardrail stops an answer mid-generation.
+
+The ticket keeps everything gathered so far (facts, retrieval results)
+so the human picks up with full context; a partially generated answer
+is never kept.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from logger import logger
+from state import SupportTicketState
+
+
+def escalate(state: SupportTicketState, reason: str, details: Optional[dict] = None) -> SupportTicketState:
+    """
+    Mark a ticket for human handling.
+
+    Args:
+        state (SupportTicketState): Ticket to escalate.
+        reason (str): Short machine-readable cause, e.g. "unsupported_claim".
+        details (dict): Extra context for the audit log.
+
+    Returns:
+        SupportTicketState: Copy with verdict "E" and no answer.
+    """
+    logger.warning("Ticket %s escalated | reason=%s details=%s", state.ticket_id, reason, details or {})
+    return state.model_copy(update={
+        "current_verdict": "E",
+        "answer": None,
+        "last_agent_action_at": datetime.now(),
+    })
@@ -0,0 +1,319 @@
+"""
+extractor.py
+
+Purpose:
+--------
+Incremental fact extraction for multi-turn tickets.
+
+Each turn runs INPUT_PARSING_PROMPT on the latest `ticket_text` only and
+merges the new facts into `info_list`, de-duplicated by normalized text.
+The per-turn LLM cost is therefore constant no matter how long the
+conversation is. `recompute=True` rebuilds `info_list` from every user
+message (e.g. after a prompt change).
+
+Backlogs (e.g. the morning queue) go through extract_bulk / aextract_bulk:
+one chain.batch / abatch call with bounded concurrency, per-ticket
+failures reported instead of aborting the run.
+
+Usage:
+    python -m agents.extractor --max-concurrency 16
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_groq import ChatGroq
+
+from exceptions import FactExtractionError
+from logger import logger
+from prompts import INPUT_PARSING_PROMPT
+from state import ExtractedFacts, SupportTicketState
+from state.facts import merge_facts
+
+USER_ROLES = ("user", "human", "customer")
+
+
+# -------------------------
+# Chain
+# -------------------------
+def create_extraction_chain(llm=None):
+    """
+    Build the structured fact extraction chain.
+
+    Args:
+        llm: Chat model (default: Groq llama-3.3-70b, temperature 0).
+
+    Returns:
+        Runnable: {"message": str} -> ExtractedFacts
+    """
+    llm = llm or ChatGroq(model="llama-3.3-70b-versatile", temperature=0.0)
+    prompt = ChatPromptTemplate.from_messages(INPUT_PARSING_PROMPT)
+    return prompt | llm.with_structured_output(ExtractedFacts)
+
+
+# -------------------------
+# Extraction
+# -------------------------
+def extract_facts(message: str, chain) -> List[str]:
+    """
+    Run the extraction chain on one message.
+
+    Raises:
+        FactExtractionError: If the LLM call fails.
+    """
+    if not message or not message.strip():
+        return []
+    try:
+        result: ExtractedFacts = chain.invoke({"message": message})
+    except Exception as e:
+        logger.exception("Fact extraction failed")
+        raise FactExtractionError(str(e))
+    return list(result.facts)
+
+
+def user_messages(state: SupportTicketState) -> List[str]:
+    """Every user message in order (falls back to ticket_text)."""
+    messages = [text for role, text in state.messages if role.lower() in USER_ROLES]
+    return messages or [state.ticket_text]
+
+
+def update_facts(state: SupportTicketState, chain, recompute: bool = False) -> SupportTicketState:
+    """
+    Merge facts from the latest user message into info_list.
+
+    Args:
+        state (SupportTicketState): Ticket; `ticket_text` is the newest message.
+        chain: Extraction chain (see create_extraction_chain).
+        recompute (bool): Ignore the current info_list and re-extract from
+            every user message (batched into one chain.batch call).
+
+    Returns:
+        SupportTicketState: Copy with the updated info_list.
+
+    Raises:
+        FactExtractionError: If extraction fails.
+    """
+    if recompute:
+        messages = user_messages(state)
+        try:
+            results = chain.batch([{"message": m} for m in messages])
+        except Exception as e:
+            logger.exception("Fact re-extraction failed")
+            raise FactExtractionError(str(e))
+        info_list: List[str] = []
+        for result in results:
+            info_list, _ = merge_facts(info_list, list(result.facts))
+        logger.info("Facts recomputed | ticket=%s messages=%d facts=%d", state.ticket_id, len(messages), len(info_list))
+        return state.model_copy(update={"info_list": info_list})
+
+    new_facts = extract_facts(state.ticket_text, chain)
+    info_list, added = merge_facts(list(state.info_list), new_facts)
+    logger.info("Facts extracted | ticket=%s new=%d duplicate=%d", state.ticket_id, len(added), len(new_facts) - len(added))
+    return state.model_copy(update={"info_list": info_list})
+
+
+# -------------------------
+# Bulk extraction
+# -------------------------
+@dataclass
+class BulkExtractionReport:
+    """Outcome and throughput of one bulk run."""
+    total: int = 0
+    succeeded: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    facts_added: int = 0
+    retried: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def tickets_per_second(self) -> float:
+        return self.total / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.succeeded}/{self.total} tickets extracted | {len(self.failed)} failed | "
+            f"{self.facts_added} facts added | {self.retried} retried | "
+            f"{self.elapsed_seconds:.1f}s | {self.tickets_per_second:.1f} tickets/s"
+        )
+
+
+def _apply_results(states, results, report: BulkExtractionReport) -> Tuple[list, List[int]]:
+    """Merge batch results into states; return updated states and failed positions."""
+    updated, failed = list(states), []
+    for i, (state, result) in enumerate(zip(states, results)):
+        if isinstance(result, Exception):
+            failed.append(i)
+            continue
+        info_list, added = merge_facts(list(state.info_list), list(result.facts))
+        updated[i] = state.model_copy(update={"info_list": info_list})
+        report.facts_added += len(added)
+    return updated, failed
+
+
+def _bulk_rounds(states: List[SupportTicketState], retries: int):
+    """
+    Retry/merge loop shared by extract_bulk and aextract_bulk.
+
+    A generator so the sync and async entry points only differ in how they
+    run a batch: it yields the chain inputs of each attempt, expects the
+    batch results (return_exceptions=True) sent back, and returns
+    (states, report) once every ticket succeeded or `retries` ran out.
+    """
+    report = BulkExtractionReport(total=len(states))
+    started = time.perf_counter()
+
+    updated, pending, last_errors = list(states), list(range(len(states))), {}
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            report.retried += len(pending)
+        batch = [updated[i] for i in pending]
+        results = yield [{"message": s.ticket_text} for s in batch]
+        merged, failed = _apply_results(batch, results, report)
+        for i, state in zip(pending, merged):
+            updated[i] = state
+        last_errors = {pending[j]: results[j] for j in failed}
+        pending = [pending[j] for j in failed]
+
+    for i in pending:
+        report.failed[states[i].ticket_id] = str(last_errors[i])
+    report.succeeded = report.total - len(report.failed)
+    report.elapsed_seconds = time.perf_counter() - started
+
+    if report.failed:
+        logger.warning("Bulk extraction partial failure | %s", report.summary())
+    else:
+        logger.info("Bulk extraction finished | %s", report.summary())
+    return updated, report
+
+
+def extract_bulk(
+    states: List[SupportTicketState],
+    chain,
+    max_concurrency: int = 8,
+    retries: int = 1,
+) -> Tuple[List[SupportTicketState], BulkExtractionReport]:
+    """
+    Extract facts for many tickets with one batched chain call.
+
+    Args:
+        states (list): Tickets; each one's latest `ticket_text` is extracted.
+        chain: Extraction chain (see create_extraction_chain).
+        max_concurrency (int): LLM calls in flight at once.
+        retries (int): Extra batched attempts for tickets that failed.
+
+    Returns:
+        (states, report): States in input order (failed ones unchanged)
+        and a BulkExtractionReport.
+    """
+    config = {"max_concurrency": max_concurrency}
+    rounds = _bulk_rounds(states, retries)
+    try:
+        inputs = next(rounds)
+        while True:
+            inputs = rounds.send(chain.batch(inputs, config=config, return_exceptions=True))
+    except StopIteration as done:
+        return done.value
+
+
+async def aextract_bulk(
+    states: List[SupportTicketState],
+    chain,
+    max_concurrency: int = 8,
+    retries: int = 1,
+) -> Tuple[List[SupportTicketState], BulkExtractionReport]:
+    """Async variant of extract_bulk (chain.abatch); same arguments and result."""
+    config = {"max_concurrency": max_concurrency}
+    rounds = _bulk_rounds(states, retries)
+    try:
+        inputs = next(rounds)
+        while True:
+            inputs = rounds.send(await chain.abatch(inputs, config=config, return_exceptions=True))
+    except StopIteration as done:
+        return done.value
+
+
+def run_backlog_extraction(
+    store,
+    ticket_ids: Optional[List[str]] = None,
+    chain=None,
+    max_concurrency: int = 8,
+    chunk_size: int = 256,
+    use_async: bool = False,
+    retries: int = 1,
+) -> BulkExtractionReport:
+    """
+    Job: extract facts for open tickets in the session store and write them back.
+
+    Tickets are processed in chunks of `chunk_size` (memory stays bounded).
+    Only the newly extracted facts are written back, merged into the
+    ticket's current stored state (store.merge_facts), so turns or facts
+    saved while the LLM calls ran are kept.
+
+    Args:
+        store (SessionStore): Open-ticket store (state.session_store).
+        ticket_ids (list): Tickets to process (default: every stored ticket).
+        chain: Extraction chain (default: create_extraction_chain()).
+        max_concurrency (int): LLM calls in flight at once.
+        chunk_size (int): Tickets loaded and batched together.
+        use_async (bool): Use abatch instead of batch.
+        retries (int): Extra batched attempts per chunk for failed tickets.
+
+    Returns:
+        BulkExtractionReport: Totals over all chunks.
+    """
+    chain = chain or create_extraction_chain()
+    ticket_ids = list(ticket_ids) if ticket_ids is not None else store.ticket_ids()
+    total = BulkExtractionReport()
+    started = time.perf_counter()
+
+    for start in range(0, len(ticket_ids), chunk_size):
+        states = [s for s in (store.get(t) for t in ticket_ids[start:start + chunk_size]) if s is not None]
+        if use_async:
+            updated, report = asyncio.run(aextract_bulk(states, chain, max_concurrency, retries))
+        else:
+            updated, report = extract_bulk(states, chain, max_concurrency, retries)
+        for before, after in zip(states, updated):
+            if before.ticket_id in report.failed:
+                continue
+            # merge_facts only appends, so the tail is what this run extracted
+            extracted = after.info_list[len(before.info_list):]
+            try:
+                total.facts_added += len(store.merge_facts(before.ticket_id, extracted))
+            except KeyError:
+                logger.info("Ticket %s closed during extraction; facts dropped", before.ticket_id)
+
+        total.total += report.total
+        total.succeeded += report.succeeded
+        total.failed.update(report.failed)
+        total.retried += report.retried
+
+    total.elapsed_seconds = time.perf_counter() - started
+    return total
+
+
+if __name__ == "__main__":
+    from state.session_store import SessionStore
+
+    parser = argparse.ArgumentParser(description="Bulk fact extraction for open tickets in the session store.")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--retries", type=int, default=1, help="Extra attempts for failed tickets")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Use abatch")
+    args = parser.parse_args()
+
+    result = run_backlog_extraction(
+        SessionStore(),
+        max_concurrency=args.max_concurrency,
+        chunk_size=args.chunk_size,
+        use_async=args.use_async,
+        retries=args.retries,
+    )
+    print(result.summary())
+    for ticket_id, error in result.failed.items():
+        print(f"FAILED {ticket_id}: {error}")
@@ -0,0 +1,287 @@
+"""
+responder.py
+
+Purpose:
+--------
+Streaming answer generation with incremental hallucination guardrails.
+
+The answer is streamed from the LLM and split into sentences as it
+arrives. Each complete sentence is checked before it is released to the
+caller (on_text):
+    - forbidden claims (decision.policy), also checked on the unfinished
+      sentence after every chunk, so a bad claim stops generation at once
+    - support: share of the sentence's content terms found in the context
+      passages or the user's own message and facts
+      (decision.confidence.sentence_support); courtesy and framing
+      sentences are not judged
+
+The first failing check closes the stream (no more tokens are generated
+or paid for) and the ticket is escalated (agents.escalation) instead of
+answered. Released text is therefore always checked text, and time to
+first output is one sentence, not one full answer plus a guardrail pass.
+
+Repeated questions are answered from the semantic answer cache; the
+prompt context is built by knowledge.context.assemble_for_state.
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_groq import ChatGroq
+
+from agents.escalation import escalate
+from decision.confidence import SUPPORT_THRESHOLD, sentence_support, snippet_terms
+from decision.policy import check_forbidden
+from exceptions import AnswerGenerationError, GuardrailViolationError
+from knowledge.config import CONTEXT_TOKEN_BUDGET
+from knowledge.context import AssembledContext, assemble_for_state
+from logger import logger
+from prompts import RESPONDER_PROMPT
+from state import SupportTicketState
+
+# A sentence ends at . ! ? followed by whitespace (not after a list number like "1.") or at a newline
+_BOUNDARY = re.compile(r"(?<=[^\d\s][.!?])\s+|\n+")
+# List markers and [n] passage citations carry no claim
+_NOISE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+|\[\d+\]")
+
+
+# -------------------------
+# Chain
+# -------------------------
+def create_responder_chain(llm=None):
+    """
+    Build the streaming answer chain.
+
+    Args:
+        llm: Chat model (default: Groq llama-3.3-70b, streaming).
+
+    Returns:
+        Runnable: {"context", "facts", "message"} -> str (stream of text chunks)
+    """
+    llm = llm or ChatGroq(model="llama-3.3-70b-versatile", temperature=0.2, streaming=True)
+    prompt = ChatPromptTemplate.from_messages(RESPONDER_PROMPT)
+    return prompt | llm | StrOutputParser()
+
+
+# -------------------------
+# Incremental checks
+# -------------------------
+class SentenceSplitter:
+    """Turns a stream of text chunks into complete sentences (trailing whitespace kept)."""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        sentences, start = [], 0
+        for match in _BOUNDARY.finditer(self.buffer):
+            sentences.append(self.buffer[start:match.end()])
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return [s for s in sentences if s.strip()]
+
+    def flush(self) -> str:
+        tail, self.buffer = self.buffer, ""
+        return tail
+
+
+class StreamGuard:
+    """
+    Guardrail checks against one set of context passages.
+
+    Args:
+        snippets: Passages the answer must be grounded in.
+        support_threshold (float): Minimum sentence_support to release a sentence.
+        ticket_text (str): The user's message; its terms and numbers may be repeated.
+        info_list: Extracted facts, allowed like ticket_text.
+    """
+
+    def __init__(
+        self,
+        snippets: Sequence[str],
+        support_threshold: float = SUPPORT_THRESHOLD,
+        ticket_text: str = "",
+        info_list: Sequence[str] = (),
+    ):
+        self.terms = snippet_terms([*snippets, ticket_text, *info_list])
+        self.support_threshold = support_threshold
+
+    def check_partial(self, text: str) -> None:
+        """
+        Forbidden-claim check on unfinished text.
+
+        Raises:
+            GuardrailViolationError: On a forbidden claim.
+        """
+        violation = check_forbidden(text)
+        if violation is not None:
+            raise GuardrailViolationError(violation.description, check=violation.rule, sentence=text.strip())
+
+    def check_sentence(self, sentence: str) -> Optional[float]:
+        """
+        Full check of one complete sentence.
+
+        Returns:
+            float: Support score, or None for a sentence without a claim.
+
+        Raises:
+            GuardrailViolationError: On a forbidden or unsupported claim.
+        """
+        self.check_partial(sentence)
+        support = sentence_support(_NOISE.sub(" ", sentence), self.terms)
+        if support is not None and support < self.support_threshold:
+            raise GuardrailViolationError(
+                f"Sentence not supported by the context (support {support:.2f})",
+                check="unsupported_claim",
+                sentence=sentence.strip(),
+            )
+        return support
+
+
+# -------------------------
+# Responder
+# -------------------------
+@dataclass
+class ResponderResult:
+    """Outcome and timings of one response."""
+    source: str = "generated"  # "cache" | "generated" | "escalated"
+    violation: Optional[dict] = None
+    sentences: List[dict] = field(default_factory=list)
+    chunks_streamed: int = 0
+    first_chunk_ms: Optional[float] = None
+    first_release_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+    context: Optional[dict] = None
+
+    @property
+    def mean_support(self) -> Optional[float]:
+        scores = [s["support"] for s in self.sentences if s["support"] is not None]
+        return sum(scores) / len(scores) if scores else None
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def respond(
+    state: SupportTicketState,
+    chain=None,
+    answer_cache=None,
+    past_tickets: Sequence[dict] = (),
+    on_text: Optional[Callable[[str], None]] = None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    support_threshold: float = SUPPORT_THRESHOLD,
+) -> Tuple[SupportTicketState, ResponderResult]:
+    """
+    Answer a ticket, streaming checked sentences to on_text.
+
+    Args:
+        state (SupportTicketState): Ticket with retrieval results in retrieved_from_kb.
+        chain: Streaming answer chain (default: create_responder_chain()).
+        answer_cache (AnswerCache): Reuse answers to near-identical questions.
+        past_tickets: TicketMemory.search results (else PAST_TICKET entries in state).
+        on_text: Called with each released sentence as soon as it passes the checks.
+        token_budget (int): Context token budget (knowledge.context).
+        support_threshold (float): Minimum sentence support.
+
+    Returns:
+        (state, result): Verdict "A" with the answer and the context passages
+        as retrieved_from_kb, or verdict "E" (see agents.escalation) if no
+        context was found or a guardrail stopped generation.
+
+    Raises:
+        AnswerGenerationError: If the LLM call fails.
+    """
+    started = time.perf_counter()
+    result = ResponderResult()
+    emit = on_text or (lambda text: None)
+
+    if answer_cache is not None:
+        hit = answer_cache.lookup(state.ticket_text)
+        if hit is not None:
+            emit(hit.answer)
+            result.source = "cache"
+            result.first_release_ms = result.total_ms = _ms(started)
+            return state.model_copy(update={
+                "answer": hit.answer,
+                "retrieved_from_kb": hit.retrieved_from_kb,
+                "current_verdict": "A",
+                "last_agent_action_at": datetime.now(),
+            }), result
+
+    context: AssembledContext = assemble_for_state(state, past_tickets, token_budget=token_budget)
+    result.context = context.summary()
+    if not context.passages:
+        result.source = "escalated"
+        result.total_ms = _ms(started)
+        return escalate(state, "no_context"), result
+
+    chain = chain or create_responder_chain()
+    guard = StreamGuard(
+        [p["snippet"] for p in context.passages],
+        support_threshold,
+        ticket_text=state.ticket_text,
+        info_list=state.info_list,
+    )
+    inputs = {
+        "context": context.as_text(),
+        "facts": "\n".join(f"- {fact}" for fact in state.info_list) or "None",
+        "message": state.ticket_text,
+    }
+
+    splitter, released = SentenceSplitter(), []
+
+    def release(sentence: str) -> None:
+        support = guard.check_sentence(sentence)
+        result.sentences.append({"text": sentence.strip(), "support": support})
+        released.append(sentence)
+        if result.first_release_ms is None:
+            result.first_release_ms = _ms(started)
+        emit(sentence)
+
+    stream = chain.stream(inputs)
+    try:
+        for chunk in stream:
+            if result.first_chunk_ms is None:
+                result.first_chunk_ms = _ms(started)
+            result.chunks_streamed += 1
+            for sentence in splitter.feed(chunk):
+                release(sentence)
+            guard.check_partial(splitter.buffer)
+        tail = splitter.flush()
+        if tail.strip():
+            release(tail)
+    except GuardrailViolationError as e:
+        result.source = "escalated"
+        result.violation = {"check": e.check, "message": e.message, "sentence": e.sentence}
+        result.total_ms = _ms(started)
+        logger.warning(
+            "Answer cut off after %d chunks | ticket=%s check=%s",
+            result.chunks_streamed, state.ticket_id, e.check,
+        )
+        return escalate(state, e.check, result.violation), result
+    except Exception as e:
+        logger.exception("Answer generation failed")
+        raise AnswerGenerationError(str(e))
+    finally:
+        # Stops the LLM stream early when a check failed
+        if hasattr(stream, "close"):
+            stream.close()
+
+    result.total_ms = _ms(started)
+    logger.info(
+        "Answer generated | ticket=%s sentences=%d first_release=%sms total=%sms",
+        state.ticket_id, len(result.sentences), result.first_release_ms, result.total_ms,
+    )
+    return state.model_copy(update={
+        "answer": "".join(released).strip(),
+        "retrieved_from_kb": context.passages,
+        "current_verdict": "A",
+        "last_agent_action_at": datetime.now(),
+    }), result
@@ -0,0 +1,87 @@
+# app.py
+from logger import logger
+from fastapi import FastAPI, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from typing import Optional
+import hmac
+import os
+import uvicorn
+from knowledge.hot_reload import IndexHolder
+from knowledge.indexer import update_vectorstore
+
+# -------------------------
+# CONFIG
+# -------------------------
+KB_WATCH_INTERVAL_SECONDS = float(os.getenv("KB_WATCH_INTERVAL_SECONDS", "5"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # admin routes are disabled when unset
+
+app = FastAPI(title="Customer Support Agent")
+
+# -------------------------
+# LOAD KB ONCE (reloaded in place, never restarted)
+# -------------------------
+kb = IndexHolder().start_watching(KB_WATCH_INTERVAL_SECONDS)
+
+# -------------------------
+# ROUTE: Health check
+# -------------------------
+@app.get("/health")
+async def health_check():
+    return {"status": "ok", "kb": kb.stats()}
+
+# -------------------------
+# ROUTE: KB search
+# -------------------------
+@app.post("/kb/search")
+async def kb_search(query: str, k: int = 3):
+    try:
+        results = await run_in_threadpool(kb.retrieve, query, k)
+    except Exception as e:
+        logger.exception("KB search failed")
+        return JSONResponse(status_code=500, content={"error": "KB search failed", "details": str(e)})
+    return {"kb_version": kb.stats()["kb_version"], "results": results}
+
+# -------------------------
+# ROUTE: KB reload (admin)
+# -------------------------
+def admin_denied(token: Optional[str]) -> Optional[JSONResponse]:
+    """Error response unless `token` matches ADMIN_TOKEN."""
+    if not ADMIN_TOKEN:
+        return JSONResponse(status_code=403, content={"error": "Admin routes are disabled (ADMIN_TOKEN not set)"})
+    if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return JSONResponse(status_code=401, content={"error": "Invalid or missing X-Admin-Token"})
+    return None
+
+
+@app.post("/admin/kb/reload")
+async def kb_reload(rebuild: bool = False, force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Pick up a new KB version without a restart. Requires the X-Admin-Token header.
+
+    With rebuild=true the KB folder is re-indexed first (into a staging
+    directory, published by swap). Only one build runs at a time; a
+    rebuild requested while another is running gets 409. Searches keep
+    hitting the current version until the new one is loaded and warmed up.
+    """
+    denied = admin_denied(x_admin_token)
+    if denied is not None:
+        return denied
+    try:
+        if rebuild:
+            try:
+                update = await run_in_threadpool(update_vectorstore, blocking=False)
+            except BlockingIOError:
+                return JSONResponse(status_code=409, content={"error": "A KB build is already running"})
+            logger.info(
+                "KB rebuilt | added=%d changed=%d removed=%d",
+                len(update.added), len(update.changed), len(update.removed),
+            )
+        reloaded = await run_in_threadpool(kb.reload, force)
+    except Exception as e:
+        logger.exception("KB reload failed")
+        return JSONResponse(status_code=500, content={"error": "KB reload failed", "details": str(e)})
+    return {"reloaded": reloaded, "kb": kb.stats()}
+
+if __name__=='__main__':
+    uvicorn.run(app=app,host='127.0.0.1',port=5000)
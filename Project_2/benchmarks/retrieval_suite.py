@@ -0,0 +1,402 @@
+# retrieval_suite.py
+
+"""
+Retrieval benchmark and evaluation suite for the knowledge module.
+
+Builds the KB into a scratch directory, then runs a labelled query set
+through every retriever / index configuration and reports:
+    quality   recall@k (a relevant FAQ entry in the top k), MRR; for ANN
+              configs also the overlap with the exact (flat) top k
+    speed     per-query latency p50/p95/p99, QPS (batch: wall time only)
+    cost      index build time, ANN build time, RSS after load, index size
+
+Each configuration runs in its own process, so its RSS is measured from
+a fresh interpreter instead of on top of the configs before it.
+
+Configurations:
+    dense           retrieve_from_kb on the exact (flat) index
+    hybrid          retrieve_hybrid (BM25 + dense, lexical fast path on)
+    hybrid_no_fast  retrieve_hybrid with the fast path off
+    batch           retrieve_many over the whole query set (one call)
+    ann_<type>      retrieve_from_kb on each ANN index type (knowledge.ann)
+
+Labels: each query maps to the parent_id(s) of the FAQ entries that
+answer it. By default the hand-written paraphrased set in
+benchmarks/queries/kb_paraphrased.jsonl is used; --queries loads another
+JSONL file of {"query": ..., "parent_ids": [...]} (or {"query", "title"}).
+--generated instead builds queries from every entry's title and the lead
+sentence of each bullet point; these are copied from the indexed text, so
+they measure self-retrieval. --save-queries writes the set used.
+
+Every run is appended to benchmarks/results/retrieval_history.jsonl with
+the git commit, and compared with the previous run of each config.
+
+Usage (from Project_2/):
+    python -m benchmarks.retrieval_suite --k 3
+    python -m benchmarks.retrieval_suite --configs dense hybrid --queries my_queries.jsonl
+"""
+
+import argparse
+import json
+import re
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from knowledge import (
+    chunk_file,
+    get_embeddings,
+    load_saved_vectorstore,
+    retrieve_from_kb,
+    retrieve_hybrid,
+    retrieve_many,
+)
+from knowledge.ann import INDEX_TYPES, build_ann_index
+from knowledge.config import HF_MODEL_NAME, KB_FOLDER
+from knowledge.docstore import close_vectorstore, save_vectorstore
+
+HISTORY_PATH = Path("benchmarks/results/retrieval_history.jsonl")
+DEFAULT_QUERIES = Path("benchmarks/queries/kb_paraphrased.jsonl")
+CONFIGS = ("dense", "hybrid", "hybrid_no_fast", "batch", *[f"ann_{t}" for t in INDEX_TYPES if t != "flat"])
+
+_BULLET = re.compile(r"^\s*[*-]\s+\**([^*:]+):?\**:?\s*(.+)$", re.MULTILINE)
+
+
+# -------------------------
+# Labelled queries
+# -------------------------
+def _lead(text: str, max_words: int = 14) -> str:
+    sentence = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0]
+    return " ".join(sentence.split()[:max_words]).rstrip(".,;:")
+
+
+def generate_queries(kb_folder: Path = KB_FOLDER) -> List[dict]:
+    """Title and bullet-lead queries for every FAQ entry, labelled with its parent_id."""
+    queries = []
+    for file_path in sorted(kb_folder.glob("*.txt")):
+        for parent in chunk_file(file_path)[0]:
+            parent_id, title = parent.metadata["id"], parent.metadata.get("title")
+            if title:
+                queries.append({"query": title, "parent_ids": [parent_id], "kind": "title"})
+            for label, text in _BULLET.findall(parent.page_content):
+                queries.append({"query": f"{label.strip()}: {_lead(text)}", "parent_ids": [parent_id], "kind": "bullet"})
+    return queries
+
+
+def load_queries(path: Path, kb_folder: Path = KB_FOLDER) -> List[dict]:
+    """
+    Load a JSONL query set. Rows with a 'title' instead of 'parent_ids'
+    are labelled with every FAQ entry of that title.
+
+    Raises:
+        ValueError: If a row has no usable label.
+    """
+    by_title: Dict[str, List[str]] = {}
+    for file_path in kb_folder.glob("*.txt"):
+        for parent in chunk_file(file_path)[0]:
+            by_title.setdefault(parent.metadata.get("title", "").casefold(), []).append(parent.metadata["id"])
+
+    queries = []
+    for line_no, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        parent_ids = row.get("parent_ids") or by_title.get(str(row.get("title", "")).casefold())
+        if not parent_ids:
+            raise ValueError(f"{path}:{line_no}: no parent_ids and no matching title")
+        queries.append({"query": row["query"], "parent_ids": parent_ids, "kind": row.get("kind", "loaded")})
+    return queries
+
+
+# -------------------------
+# Metrics
+# -------------------------
+def rss_mb() -> float:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except (OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def dir_size_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file()) / 2**20
+
+
+def rank_of_first_relevant(results: list, parent_ids: List[str]) -> Optional[int]:
+    """1-based rank of the first result from a relevant FAQ entry, or None."""
+    for rank, result in enumerate(results, start=1):
+        if result.get("parent_id") in parent_ids:
+            return rank
+    return None
+
+
+def quality(all_results: List[list], queries: List[dict]) -> dict:
+    ranks = [rank_of_first_relevant(r, q["parent_ids"]) for r, q in zip(all_results, queries)]
+    return {
+        "recall_at_k": round(float(np.mean([rank is not None for rank in ranks])), 4),
+        "mrr": round(float(np.mean([1 / rank if rank else 0.0 for rank in ranks])), 4),
+    }
+
+
+def result_keys(all_results: List[list]) -> List[List[Tuple[str, str]]]:
+    """Chunk identity (parent_id, snippet) of every result, for comparing configs."""
+    return [[(r.get("parent_id"), r.get("snippet")) for r in results] for results in all_results]
+
+
+def overlap_recall(keys: List[list], exact: List[list]) -> float:
+    """Mean share of the exact top-k chunks that a config also returned."""
+    shares = [len(set(map(tuple, got)) & set(map(tuple, ref))) / len(ref) for got, ref in zip(keys, exact) if ref]
+    return round(float(np.mean(shares)), 4) if shares else 0.0
+
+
+def latency(seconds: List[float]) -> dict:
+    ms = np.array(seconds) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)}
+
+
+# -------------------------
+# Runs
+# -------------------------
+def run_per_query(search: Callable[[str], list], queries: List[dict], warmup: int = 5) -> Tuple[dict, List[list]]:
+    for q in queries[:warmup]:
+        search(q["query"])
+    all_results, seconds = [], []
+    started = time.perf_counter()
+    for q in queries:
+        t0 = time.perf_counter()
+        all_results.append(search(q["query"]))
+        seconds.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+    return {**quality(all_results, queries), **latency(seconds), "qps": round(len(queries) / total, 1)}, all_results
+
+
+def run_batch(vectorstore: FAISS, queries: List[dict], k: int) -> Tuple[dict, List[list]]:
+    texts = [q["query"] for q in queries]
+    retrieve_many(texts[:5], vectorstore, k=k)
+    started = time.perf_counter()
+    all_results = retrieve_many(texts, vectorstore, k=k)
+    total = time.perf_counter() - started
+    # One call for the whole set: there is no per-query latency to report
+    return {
+        **quality(all_results, queries),
+        "qps": round(len(texts) / total, 1),
+        "batch_seconds": round(total, 3),
+    }, all_results
+
+
+def build_index(kb_folder: Path, path: Path, cached: bool) -> dict:
+    """Build the KB into `path` (same steps as build_vectorstore, minus publishing)."""
+    parents, chunks = {}, []
+    for file_path in sorted(kb_folder.glob("*.txt")):
+        file_parents, file_chunks = chunk_file(file_path)
+        parents.update({doc.metadata["id"]: doc for doc in file_parents})
+        chunks.extend(file_chunks)
+    if not chunks:
+        raise ValueError(f"No .txt files found in {kb_folder}")
+
+    embeddings = get_embeddings(HF_MODEL_NAME, cached=cached)
+    started = time.perf_counter()
+    vectorstore = FAISS.from_documents(chunks, embeddings)
+    save_vectorstore(vectorstore, path, parents=parents)
+    return {
+        "build_seconds": round(time.perf_counter() - started, 3),
+        "vectors": vectorstore.index.ntotal,
+        "parents": len(parents),
+        "index_mb": round(dir_size_mb(path), 3),
+    }
+
+
+def load_for_config(path: Path, config: str, cached: bool) -> FAISS:
+    vectorstore = load_saved_vectorstore(path, ann=config.startswith("ann_"))
+    if not cached:
+        vectorstore.embedding_function = get_embeddings(HF_MODEL_NAME, cached=False)
+    return vectorstore
+
+
+def evaluate_config(path: Path, config: str, queries: List[dict], k: int, cached: bool) -> Tuple[dict, List[list]]:
+    """
+    Load the index for one configuration and run the query set against it.
+
+    Run in a fresh process (see run_suite) so rss_mb covers this config only.
+
+    Returns:
+        tuple: (metrics, result keys per query).
+    """
+    baseline_rss = rss_mb()
+    vectorstore = load_for_config(path, config, cached)
+    loaded_rss = round(rss_mb() - baseline_rss, 1)
+    try:
+        if config == "batch":
+            metrics, all_results = run_batch(vectorstore, queries, k)
+        elif config == "hybrid":
+            metrics, all_results = run_per_query(lambda q: retrieve_hybrid(q, vectorstore, k=k), queries)
+        elif config == "hybrid_no_fast":
+            metrics, all_results = run_per_query(lambda q: retrieve_hybrid(q, vectorstore, k=k, lexical_fast_path=False), queries)
+        else:
+            metrics, all_results = run_per_query(lambda q: retrieve_from_kb(q, vectorstore, k=k), queries)
+    finally:
+        close_vectorstore(vectorstore)
+    return {**metrics, "rss_mb": loaded_rss}, result_keys(all_results)
+
+
+def _in_subprocess(fn: Callable, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def run_suite(
+    queries: List[dict],
+    configs: List[str],
+    k: int = 3,
+    kb_folder: Path = KB_FOLDER,
+    cached: bool = False,
+) -> dict:
+    """
+    Build once, then evaluate each configuration in its own process.
+
+    ANN configs also get 'ann_recall': their overlap with the exact flat
+    top k for the same queries (the dense config is run for reference
+    even when it was not requested).
+
+    Returns:
+        dict: {"build": {...}, "configs": {name: metrics}}; a config that
+        cannot run on this corpus (e.g. too few vectors to train IVF-PQ)
+        gets {"error": ...}.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="kb_bench_"))
+    path = workdir / "kb_index"
+    try:
+        build = build_index(kb_folder, path, cached)
+        results, exact = {}, None
+        wants_ann = any(c.startswith("ann_") for c in configs)
+        order = (["dense"] if wants_ann and "dense" not in configs else []) + sorted(configs, key=lambda c: c.startswith("ann_"))
+        for config in order:
+            try:
+                extra = {}
+                if config.startswith("ann_"):
+                    started = time.perf_counter()
+                    build_ann_index(path, config[len("ann_"):])
+                    extra["ann_build_seconds"] = round(time.perf_counter() - started, 3)
+                    extra["index_mb"] = round(dir_size_mb(path), 3)
+
+                metrics, keys = _in_subprocess(evaluate_config, path, config, queries, k, cached)
+                if config == "dense":
+                    exact = keys
+                if config.startswith("ann_") and exact is not None:
+                    extra["ann_recall"] = overlap_recall(keys, exact)
+                if config in configs:
+                    results[config] = {**metrics, **extra}
+            except Exception as e:
+                results[config] = {"error": f"{type(e).__name__}: {e}"}
+        return {"build": build, "configs": {c: results[c] for c in configs if c in results}}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# -------------------------
+# History
+# -------------------------
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_runs(history_path: Path = HISTORY_PATH) -> Dict[str, dict]:
+    """Most recent metrics of each config in the history file."""
+    previous: Dict[str, dict] = {}
+    if history_path.exists():
+        for line in history_path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                previous.update(json.loads(line).get("configs", {}))
+    return previous
+
+
+def append_history(record: dict, history_path: Path = HISTORY_PATH) -> None:
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with history_path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def format_results(record: dict, previous: Dict[str, dict]) -> str:
+    build = record["build"]
+    lines = [
+        f"commit={record['commit']} queries={record['n_queries']} k={record['k']} "
+        f"vectors={build['vectors']} build={build['build_seconds']:.2f}s index={build['index_mb']:.2f}MB",
+        f"{'config':<16} {'recall@k':>8} {'MRR':>6} {'ANN rec':>7} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} "
+        f"{'QPS':>9} {'RSS MB':>7}  vs last",
+    ]
+
+    def cell(m: dict, key: str, width: int, precision: int) -> str:
+        return f"{m[key]:>{width}.{precision}f}" if key in m else f"{'-':>{width}}"
+
+    for name, m in record["configs"].items():
+        if "error" in m:
+            lines.append(f"{name:<16} skipped: {m['error']}")
+            continue
+        before = previous.get(name, {})
+        delta = f"recall {m['recall_at_k'] - before['recall_at_k']:+.3f}" if "recall_at_k" in before else "-"
+        if "recall_at_k" in before and "p50_ms" in m and "p50_ms" in before:
+            delta += f", p50 {m['p50_ms'] - before['p50_ms']:+.2f}ms"
+        elif "recall_at_k" in before and "batch_seconds" in m and "batch_seconds" in before:
+            delta += f", wall {m['batch_seconds'] - before['batch_seconds']:+.3f}s"
+        lines.append(
+            f"{name:<16} {m['recall_at_k']:>8.3f} {m['mrr']:>6.3f} {cell(m, 'ann_recall', 7, 3)} "
+            f"{cell(m, 'p50_ms', 8, 2)} {cell(m, 'p95_ms', 8, 2)} {cell(m, 'p99_ms', 8, 2)} "
+            f"{m['qps']:>9.1f} {m['rss_mb']:>7.1f}  {delta}"
+        )
+        if "batch_seconds" in m:
+            lines.append(f"{'':<16} batch wall time {m['batch_seconds']:.3f}s for {record['n_queries']} queries")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Retrieval quality / latency / cost benchmark")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--configs", nargs="+", choices=CONFIGS, default=list(CONFIGS))
+    parser.add_argument("--queries", type=Path, default=DEFAULT_QUERIES, help="JSONL labelled query set")
+    parser.add_argument("--generated", action="store_true", help="Use queries generated from the KB text instead")
+    parser.add_argument("--save-queries", type=Path, default=None, help="Write the query set used to this JSONL file")
+    parser.add_argument("--kb-folder", type=Path, default=KB_FOLDER)
+    parser.add_argument("--cached", action="store_true", help="Keep the embedding cache enabled")
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH)
+    parser.add_argument("--no-history", action="store_true", help="Do not record this run")
+    args = parser.parse_args()
+
+    queries = generate_queries(args.kb_folder) if args.generated else load_queries(args.queries, args.kb_folder)
+    if not queries:
+        raise ValueError("No labelled queries to evaluate")
+    if args.save_queries:
+        args.save_queries.write_text("".join(json.dumps(q) + "\n" for q in queries), encoding="utf-8")
+
+    result = run_suite(queries, args.configs, k=args.k, kb_folder=args.kb_folder, cached=args.cached)
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "k": args.k,
+        "n_queries": len(queries),
+        "query_set": "generated" if args.generated else str(args.queries),
+        "cached": args.cached,
+        **result,
+    }
+
+    print(format_results(record, last_runs(args.history)))
+    if not args.no_history:
+        append_history(record, args.history)
+        print(f"Recorded in {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# retrieve_many.py
+
+"""
+Benchmark: retrieve_many (one batched embed + one matrix search) vs a
+loop of retrieve_from_kb calls.
+
+Queries come from --queries (one per line) or are generated from the
+titles of the KB's FAQ entries. The embedding cache is bypassed by
+default so both sides pay for real forward passes.
+
+Usage (from Project_2/):
+    python -m benchmarks.retrieve_many --n 256 --k 3
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+from knowledge import (
+    get_embeddings,
+    load_faq_parents,
+    load_saved_vectorstore,
+    retrieve_from_kb,
+    retrieve_many,
+)
+from knowledge.config import HF_MODEL_NAME, KB_FOLDER
+
+_TEMPLATES = [
+    "{}",
+    "How do I fix: {}",
+    "Question about {}",
+    "I need help with {}",
+]
+
+
+def make_queries(n: int, queries_file: Path = None) -> List[str]:
+    """n queries from a file, or generated from FAQ entry titles."""
+    if queries_file:
+        base = [line.strip() for line in queries_file.read_text(encoding="utf-8").splitlines() if line.strip()]
+    else:
+        titles = [doc.metadata.get("title") for doc in load_faq_parents(KB_FOLDER).values()]
+        base = [template.format(title) for template in _TEMPLATES for title in titles if title]
+    if not base:
+        raise ValueError("No queries to benchmark")
+    return [base[i % len(base)] + ("" if i < len(base) else f" #{i}") for i in range(n)]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="retrieve_many vs retrieve_from_kb loop")
+    parser.add_argument("--n", type=int, default=256, help="Number of queries")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=Path, default=None, help="File with one query per line")
+    parser.add_argument("--cached", action="store_true", help="Keep the embedding cache enabled")
+    args = parser.parse_args()
+
+    vectorstore = load_saved_vectorstore()
+    if not args.cached:
+        vectorstore.embedding_function = get_embeddings(HF_MODEL_NAME, cached=False)
+
+    queries = make_queries(args.n, args.queries)
+
+    # Warm up the model and index pages
+    retrieve_many(queries[:8], vectorstore, k=args.k)
+    for q in queries[:8]:
+        retrieve_from_kb(q, vectorstore, k=args.k)
+
+    looped, loop_seconds = timed(lambda: [retrieve_from_kb(q, vectorstore, k=args.k) for q in queries])
+    batched, batch_seconds = timed(lambda: retrieve_many(queries, vectorstore, k=args.k))
+
+    same_top1 = sum(
+        bool(a) and bool(b) and a[0]["snippet"] == b[0]["snippet"]
+        for a, b in zip(looped, batched)
+    )
+
+    print(f"queries={len(queries)} k={args.k} vectors={vectorstore.index.ntotal} cached={args.cached}")
+    print(f"{'loop retrieve_from_kb':<24} {loop_seconds:8.3f}s  {len(queries) / loop_seconds:9.1f} q/s")
+    print(f"{'retrieve_many':<24} {batch_seconds:8.3f}s  {len(queries) / batch_seconds:9.1f} q/s")
+    print(f"speedup x{loop_seconds / batch_seconds:.1f} | same top-1 for {same_top1}/{len(queries)} queries")
+
+
+if __name__ == "__main__":
+    main()
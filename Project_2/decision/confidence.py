@@ -0,0 +1,241 @@
+"""
+confidence.py
+
+Purpose:
+--------
+Confidence that a ticket can be auto-resolved, computed from signals that
+retrieval already produced — no extra LLM call.
+
+Features (one row per ticket):
+    top1        best KB relevance score (0..1)
+    margin      top1 - top2 (a clear winner vs. several lookalikes)
+    mean_topk   mean relevance of the top-k KB results
+    overlap     share of the ticket's fact/text terms found in the snippets
+    past_rate   similarity-weighted share of similar past tickets that were answered
+    has_facts   1 if any facts were extracted
+
+Score = sigmoid(features @ weights + bias). Scoring a batch is one numpy
+matrix-vector product. Weights start hand-set and can be fitted from
+labelled outcomes (was the auto-answer accepted?) with fit().
+
+sentence_support scores one generated sentence against the retrieved
+snippets (and the user's own words); the streaming responder uses it as
+a per-sentence guardrail.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from knowledge.lexical import result_relevance, tokenize
+
+FEATURES = ("top1", "margin", "mean_topk", "overlap", "past_rate", "has_facts")
+
+# Hand-set starting point: retrieval quality dominates, history refines
+DEFAULT_WEIGHTS = {
+    "top1": 4.0,
+    "margin": 2.0,
+    "mean_topk": 1.0,
+    "overlap": 2.5,
+    "past_rate": 1.5,
+    "has_facts": 0.5,
+}
+DEFAULT_BIAS = -5.0
+
+# Answer support: share of a generated sentence's content terms found in the
+# snippets. Calibrated on sample answers against kb.txt (tests/test_guardrail.py):
+# grounded sentences score >= 0.7, invented ones <= 0.25.
+SUPPORT_THRESHOLD = 0.5
+MIN_SUPPORT_TERMS = 1  # sentences without a content term are not judged
+
+# Courtesy and framing words ("Sorry to hear that", "Try these steps:",
+# "Let me know if that helps!") carry no claim and are left out of support
+FRAMING_TERMS = frozenset(
+    "about again also any anything assist below could else feel first follow following free further glad "
+    "happy hear help helps hope just know let like me might more next note once out please questions "
+    "reach see should sorry steps still sure thank thanks then these this those try understand us would".split()
+)
+
+_NUMBER = re.compile(r"^\d+(?:[.,]\d+)*$")
+
+
+# -------------------------
+# Features
+# -------------------------
+def snippet_terms(snippets: Sequence[str]) -> set:
+    """Union of the terms of all snippets."""
+    terms = set()
+    for snippet in snippets:
+        terms.update(tokenize(snippet))
+    return terms
+
+
+def lexical_overlap(query_terms: set, snippets: Sequence[str]) -> float:
+    """Share of query terms that appear in any snippet."""
+    if not query_terms:
+        return 0.0
+    return len(query_terms & snippet_terms(snippets)) / len(query_terms)
+
+
+def sentence_support(sentence: str, terms: set, min_terms: int = MIN_SUPPORT_TERMS) -> Optional[float]:
+    """
+    How well the retrieved snippets back one generated sentence.
+
+    Args:
+        sentence (str): One complete sentence of the answer.
+        terms (set): snippet_terms of the retrieved snippets, plus the
+            terms of the ticket text and facts (the user's own words
+            are not invented).
+        min_terms (int): Sentences with fewer distinct content terms
+            (terms outside FRAMING_TERMS) are not judged.
+
+    Returns:
+        float: Share of the sentence's content terms found in terms (0..1);
+        0.0 if it states a number not in terms (an invented limit, price
+        or timeline). None for courtesy / framing sentences.
+    """
+    sentence_terms = set(tokenize(sentence))
+    if any(_NUMBER.match(t) and t not in terms for t in sentence_terms):
+        return 0.0
+    content = sentence_terms - FRAMING_TERMS
+    if len(content) < min_terms:
+        return None
+    return len(content & terms) / len(content)
+
+
+def past_resolution_rate(past_tickets: Sequence[dict]) -> float:
+    """Similarity-weighted share of similar past tickets answered automatically (verdict A)."""
+    if not past_tickets:
+        return 0.0
+    weights = np.array([result_relevance(t) for t in past_tickets])
+    answered = np.array([t.get("final_verdict") == "A" for t in past_tickets], dtype=float)
+    total = weights.sum()
+    return float((weights * answered).sum() / total) if total > 0 else float(answered.mean())
+
+
+def extract_features(
+    kb_results: Sequence[dict],
+    ticket_text: str = "",
+    info_list: Sequence[str] = (),
+    past_tickets: Sequence[dict] = (),
+) -> np.ndarray:
+    """
+    Feature row for one ticket.
+
+    Args:
+        kb_results: retrieve_many / retrieve_hybrid results (with 'score';
+            hybrid scores are mapped to 0..1 by knowledge.lexical.result_relevance).
+        ticket_text: Latest user message.
+        info_list: Extracted facts.
+        past_tickets: TicketMemory.search results.
+
+    Returns:
+        np.ndarray: float32 vector ordered as FEATURES.
+    """
+    scores = np.sort(np.array([result_relevance(r) for r in kb_results], dtype=np.float32))[::-1]
+    top1 = float(scores[0]) if scores.size else 0.0
+    top2 = float(scores[1]) if scores.size > 1 else 0.0
+    query_terms = set(tokenize(" ".join([ticket_text, *info_list])))
+
+    return np.array([
+        top1,
+        top1 - top2,
+        float(scores.mean()) if scores.size else 0.0,
+        lexical_overlap(query_terms, [r.get("snippet", "") for r in kb_results]),
+        past_resolution_rate(past_tickets),
+        1.0 if info_list else 0.0,
+    ], dtype=np.float32)
+
+
+def features_from_state(state, past_tickets: Sequence[dict] = ()) -> np.ndarray:
+    """Feature row from a SupportTicketState (KB results in retrieved_from_kb)."""
+    kb_results = [r for r in state.retrieved_from_kb if isinstance(r, dict) and r.get("category") != "PAST_TICKET"]
+    past = list(past_tickets) or [r for r in state.retrieved_from_kb if isinstance(r, dict) and r.get("category") == "PAST_TICKET"]
+    return extract_features(kb_results, state.ticket_text, state.info_list, past)
+
+
+# -------------------------
+# Model
+# -------------------------
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+@dataclass
+class ConfidenceModel:
+    """Logistic confidence model over FEATURES."""
+
+    weights: np.ndarray = field(default_factory=lambda: np.array([DEFAULT_WEIGHTS[f] for f in FEATURES], dtype=np.float32))
+    bias: float = DEFAULT_BIAS
+
+    def score_batch(self, features: np.ndarray) -> np.ndarray:
+        """Confidence for each row of an (n, len(FEATURES)) matrix."""
+        return _sigmoid(np.asarray(features, dtype=np.float32) @ self.weights + self.bias)
+
+    def score(self, features: np.ndarray) -> float:
+        return float(self.score_batch(np.asarray(features)[None, :])[0])
+
+    def fit(
+        self,
+        features: np.ndarray,
+        labels: np.ndarray,
+        l2: float = 1e-2,
+        learning_rate: float = 0.5,
+        epochs: int = 500,
+    ) -> Dict[str, float]:
+        """
+        Fit weights from labelled outcomes with full-batch gradient descent.
+
+        Args:
+            features: (n, len(FEATURES)) matrix.
+            labels: (n,) 1 if the auto-answer resolved the ticket, else 0.
+            l2: Ridge penalty (keeps small datasets from overfitting).
+
+        Returns:
+            dict: Training log-loss and accuracy at 0.5.
+        """
+        X = np.asarray(features, dtype=np.float64)
+        y = np.asarray(labels, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(FEATURES) or len(X) != len(y):
+            raise ValueError(f"Expected features of shape (n, {len(FEATURES)}) and n labels")
+
+        w, b = self.weights.astype(np.float64), float(self.bias)
+        n = len(y)
+        for _ in range(epochs):
+            p = _sigmoid(X @ w + b)
+            error = p - y
+            w -= learning_rate * (X.T @ error / n + l2 * w)
+            b -= learning_rate * float(error.mean())
+
+        self.weights, self.bias = w.astype(np.float32), b
+        p = np.clip(_sigmoid(X @ w + b), 1e-7, 1 - 1e-7)
+        return {
+            "log_loss": float(-(y * np.log(p) + (1 - y) * np.log(1 - p)).mean()),
+            "accuracy": float(((p >= 0.5) == (y == 1)).mean()),
+        }
+
+    def to_dict(self) -> dict:
+        return {"weights": dict(zip(FEATURES, map(float, self.weights))), "bias": float(self.bias)}
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "ConfidenceModel":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(
+            weights=np.array([data["weights"][f] for f in FEATURES], dtype=np.float32),
+            bias=float(data["bias"]),
+        )
+
+
+def score_tickets(states: List, model: Optional[ConfidenceModel] = None) -> np.ndarray:
+    """Confidence for many SupportTicketState objects in one vectorized pass."""
+    model = model or ConfidenceModel()
+    if not states:
+        return np.zeros(0, dtype=np.float32)
+    return model.score_batch(np.vstack([features_from_state(s) for s in states]))
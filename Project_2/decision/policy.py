@@ -0,0 +1,83 @@
+"""
+policy.py
+
+Purpose:
+--------
+Claims the support agent must never make on its own, checked with plain
+regular expressions so they can run on every streamed token.
+
+Each rule covers a commitment only a human may give (refunds, credits,
+guarantees, legal advice), an action the agent cannot have performed, or
+a request for secrets. A match means the answer is escalated, not edited.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional, Pattern, Sequence
+
+
+@dataclass(frozen=True)
+class PolicyRule:
+    name: str
+    pattern: Pattern
+    description: str
+
+
+@dataclass(frozen=True)
+class PolicyViolation:
+    rule: str
+    match: str
+    description: str
+
+
+def _rule(name: str, pattern: str, description: str) -> PolicyRule:
+    return PolicyRule(name, re.compile(pattern, re.IGNORECASE), description)
+
+
+FORBIDDEN_CLAIMS = (
+    _rule(
+        "refund_promise",
+        r"\b(?:we|i)(?:'ll| will| have| can| are going to)?\s+(?:issue|process|give|grant|approve)\w*\s+(?:you\s+)?(?:a\s+|an?\s+)?(?:full\s+|partial\s+)?(?:refund|credit|reimbursement|compensation)",
+        "Promises a refund or credit",
+    ),
+    _rule(
+        "guarantee",
+        r"\b(?:guarantee[ds]?|100\s?%\s+(?:sure|certain|fixed)|will definitely (?:fix|resolve|work))\b",
+        "Guarantees an outcome",
+    ),
+    _rule(
+        "action_claimed",
+        r"\b(?:i|we)(?:'ve| have)\s+(?:now\s+)?(?:reset|deleted|restored|unlocked|upgraded|refunded|escalated|changed|cancell?ed)\s+your\b",
+        "Claims an account action the agent did not perform",
+    ),
+    _rule(
+        "credential_request",
+        r"\b(?:send|share|give|provide|tell)\s+(?:us|me)\s+(?:your\s+)?(?:password|passcode|mfa code|2fa code|verification code|full card number|cvv)\b",
+        "Asks the user for a secret",
+    ),
+    _rule(
+        "legal_advice",
+        r"\b(?:legally|you (?:can|should) sue|liable|breach of contract|gdpr (?:requires|allows) (?:you|us))\b",
+        "Gives legal advice",
+    ),
+    _rule(
+        "timeline_promise",
+        r"\b(?:within|in)\s+(?:the\s+next\s+)?\d+\s+(?:minutes?|hours?|business days?|days?)\s*,?\s+(?:we|i|our team)\s+will\b|\bwe will (?:fix|resolve|ship|release)\b.*\bby\b",
+        "Commits to a resolution timeline",
+    ),
+)
+
+
+def check_forbidden(text: str, rules: Sequence[PolicyRule] = FORBIDDEN_CLAIMS) -> Optional[PolicyViolation]:
+    """
+    First forbidden claim in text, or None.
+
+    Args:
+        text (str): Answer text so far (a sentence or the unfinished tail).
+        rules: Rules to apply (default: FORBIDDEN_CLAIMS).
+    """
+    for rule in rules:
+        match = rule.pattern.search(text)
+        if match:
+            return PolicyViolation(rule=rule.name, match=match.group(0), description=rule.description)
+    return None
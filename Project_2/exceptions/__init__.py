@@ -0,0 +1,59 @@
+"""
+Custom exceptions for the support resolution agent.
+
+These are DOMAIN-LEVEL errors: they drive retries, fallbacks and
+escalation, not just crash the system.
+"""
+
+# =========================
+# Base Exception
+# =========================
+
+class SupportAgentError(Exception):
+    """
+    Base class for all agent-level exceptions.
+    Catch ONLY this at the orchestration boundary.
+    """
+
+    error_code = "AGENT_ERROR"
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+# =========================
+# Model / LLM Errors
+# =========================
+
+class FactExtractionError(SupportAgentError):
+    """Raised when the fact extraction LLM call fails or returns invalid output."""
+    error_code = "FACT_EXTRACTION_FAILED"
+
+
+class AnswerGenerationError(SupportAgentError):
+    """Raised when the responder LLM call fails."""
+    error_code = "ANSWER_GENERATION_FAILED"
+
+
+# =========================
+# Guardrail Errors
+# =========================
+
+class GuardrailViolationError(SupportAgentError):
+    """Raised when a generated answer fails a guardrail check (unsupported or forbidden claim)."""
+    error_code = "GUARDRAIL_VIOLATION"
+
+    def __init__(self, message: str, check: str, sentence: str = ""):
+        super().__init__(message)
+        self.check = check
+        self.sentence = sentence
+
+
+# =========================
+# State Errors
+# =========================
+
+class SessionConflictError(SupportAgentError):
+    """Raised when a ticket keeps changing under a save (other writers on the same session DB)."""
+    error_code = "SESSION_CONFLICT"
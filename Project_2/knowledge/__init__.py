@@ -3,16 +3,133 @@
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_classic.schema import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from functools import lru_cache
 from pathlib import Path
-import pickle
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import re
+
+import faiss
+import numpy as np
+
+from knowledge.config import (
+    KB_FOLDER,
+    VECTORSTORE_PATH,
+    LEGACY_VECTORSTORE_PATH,
+    HF_MODEL_NAME,
+    EMBEDDING_CACHE_DIR,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+)
+from knowledge.embedding_cache import CachedEmbeddings
+from knowledge.docstore import (
+    is_saved_vectorstore,
+    save_vectorstore,
+    load_vectorstore,
+    staging_path,
+    publish_vectorstore,
+    build_lock,
+    resolve_store,
+)
+from knowledge.tokens import count_tokens, truncate_to_tokens
+from knowledge.lexical import hybrid_search
+from knowledge.ann import load_ann_index, refresh_ann_index
+
 
 # -------------------------
-# CONFIG
+# Shared helpers
 # -------------------------
-KB_FOLDER = Path("knowledge/Knowledge Base")
-VECTORSTORE_PATH = KB_FOLDER / "kb_vectorstore.faiss"
-DOCSTORE_PATH = KB_FOLDER / "kb_docstore.pkl"
-HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+@lru_cache(maxsize=None)
+def get_embeddings(hf_model_name: str = HF_MODEL_NAME, cached: bool = True):
+    """
+    Load an embedding model once per process and reuse it.
+
+    Args:
+        hf_model_name (str): HuggingFace embedding model name.
+        cached (bool): Wrap the model in the persistent embedding cache,
+            so previously embedded text and repeated queries skip the
+            transformer forward pass.
+    """
+    hf_embeddings = HuggingFaceEmbeddings(model_name=hf_model_name)
+    if not cached:
+        return hf_embeddings
+    return open_embedding_cache(hf_model_name, base=hf_embeddings)
+
+
+def open_embedding_cache(hf_model_name: str = HF_MODEL_NAME, base=None) -> CachedEmbeddings:
+    """
+    Open a model's persistent embedding cache.
+
+    Without `base` the model is not loaded: the cache serves lookup() and
+    store() only (e.g. a build parent whose worker processes embed).
+    """
+    cache_dir = EMBEDDING_CACHE_DIR / hf_model_name.replace("/", "__")
+    # sentence-transformers embeds a query exactly like a document, so query misses batch
+    return CachedEmbeddings(base, cache_dir=cache_dir, model_name=hf_model_name, query_prefix="")
+
+
+# FAQ entries are separated by markdown rules ("---")
+_SECTION_BREAK = re.compile(r"\n\s*-{3,}\s*\n")
+_TITLE_LINE = re.compile(r"^\**Title:\**\s*(.+)$", re.MULTILINE)
+
+
+def chunk_file(file_path: Path) -> Tuple[List[Document], List[Document]]:
+    """
+    Split one FAQ text file into parent sections and indexable chunks.
+
+    Each FAQ entry (separated by '---') becomes a parent. Parents are
+    split into overlapping passages; every passage records its
+    `parent_id`, so retrieval can return only the matching paragraphs
+    and expand to the full entry on request.
+
+    Args:
+        file_path (Path): Path to a .txt FAQ file.
+
+    Returns:
+        (parents, chunks): Parent Documents (with metadata['id']) and
+        chunk Documents with 'source', 'category', 'parent_id',
+        'title' and 'chunk_index' metadata.
+    """
+    content = file_path.read_text(encoding="utf-8")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    parents, chunks = [], []
+    for section in _SECTION_BREAK.split(content):
+        section = section.strip()
+        if not section:
+            continue
+
+        parent_id = "parent:" + hashlib.sha256(f"{file_path.name}\0{section}".encode("utf-8")).hexdigest()[:20]
+        title_match = _TITLE_LINE.search(section)
+        title = title_match.group(1).strip() if title_match else section.splitlines()[0].strip("*# ").strip()
+        metadata = {"source": file_path.name, "category": "FAQ", "title": title}
+        parents.append(Document(page_content=section, metadata={**metadata, "id": parent_id}))
+
+        for i, passage in enumerate(splitter.split_text(section)):
+            chunks.append(Document(
+                page_content=passage,
+                metadata={**metadata, "parent_id": parent_id, "chunk_index": i},
+            ))
+    return parents, chunks
+
+
+def documents_from_file(file_path: Path) -> list:
+    """
+    Turn one FAQ text file into the chunk Documents that get embedded.
+
+    Args:
+        file_path (Path): Path to a .txt FAQ file.
+
+    Returns:
+        List[Document]: Chunk documents with 'source', 'category' and 'parent_id' metadata.
+    """
+    return chunk_file(file_path)[1]
+
+
+def parents_from_file(file_path: Path) -> Dict[str, Document]:
+    """Parent (full FAQ entry) documents of one file, keyed by parent_id."""
+    return {doc.metadata["id"]: doc for doc in chunk_file(file_path)[0]}
 
 
 # -------------------------
@@ -37,29 +154,40 @@ def load_faq_docs(kb_folder: Path = KB_FOLDER) -> list:
 
     faq_docs = []
     for file_path in kb_folder.glob("*.txt"):
-        content = file_path.read_text(encoding="utf-8")
-        faq_docs.append(
-            Document(
-                page_content=content,
-                metadata={"source": file_path.name, "category": "FAQ"}
-            )
-        )
+        faq_docs.extend(documents_from_file(file_path))
 
     if not faq_docs:
         raise ValueError(f"No .txt files found in {kb_folder}")
 
-    # Save docstore
-    with open(DOCSTORE_PATH, "wb") as f:
-        pickle.dump(faq_docs, f)
-
-    print(f"Docstore saved to {DOCSTORE_PATH} ({len(faq_docs)} documents).")
+    print(f"Loaded {len(faq_docs)} chunks from {kb_folder}.")
     return faq_docs
 
 
+def load_faq_parents(kb_folder: Path = KB_FOLDER) -> Dict[str, Document]:
+    """
+    Load the parent FAQ entries for every .txt file, keyed by parent_id.
+
+    Args:
+        kb_folder (Path): Folder containing FAQ text files.
+
+    Returns:
+        Dict[str, Document]: Parent documents.
+    """
+    parents = {}
+    for file_path in kb_folder.glob("*.txt"):
+        parents.update(parents_from_file(file_path))
+    return parents
+
+
 # -------------------------
 # 2️⃣ Vectorstore Builder
 # -------------------------
-def build_vectorstore(documents: list, hf_model_name: str = HF_MODEL_NAME, vectorstore_path: Path = VECTORSTORE_PATH) -> FAISS:
+def build_vectorstore(
+    documents: list,
+    hf_model_name: str = HF_MODEL_NAME,
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    parents: Optional[Dict[str, Document]] = None,
+) -> FAISS:
     """
     Build a FAISS vectorstore from a list of Document objects using HuggingFace embeddings.
 
@@ -67,13 +195,19 @@ def build_vectorstore(documents: list, hf_model_name: str = HF_MODEL_NAME, vecto
         documents (list): List of Document objects.
         hf_model_name (str): HuggingFace embedding model name.
         vectorstore_path (Path): Path to save the FAISS vectorstore locally.
+        parents (dict): Parent documents (see load_faq_parents) saved
+            alongside, used by retrieve_from_kb(expand_parent=True).
     
     Returns:
         FAISS: The built vectorstore.
     """
-    hf_embeddings = HuggingFaceEmbeddings(model_name=hf_model_name)
+    hf_embeddings = get_embeddings(hf_model_name)
     vectorstore = FAISS.from_documents(documents, hf_embeddings)
-    vectorstore.save_local(str(vectorstore_path))
+    with build_lock(vectorstore_path):
+        staging = staging_path(vectorstore_path)
+        save_vectorstore(vectorstore, staging, parents=parents)
+        refresh_ann_index(staging)
+        publish_vectorstore(staging, vectorstore_path)
     print(f"Vectorstore saved to {vectorstore_path}")
     return vectorstore
 
@@ -81,38 +215,237 @@ def build_vectorstore(documents: list, hf_model_name: str = HF_MODEL_NAME, vecto
 # -------------------------
 # 3️⃣ KB Retriever
 # -------------------------
-def retrieve_from_kb(query_text: str, vectorstore: FAISS, k: int = 3) -> list:
+def get_parent_documents(vectorstore: FAISS, parent_ids: List[str]) -> Dict[str, Document]:
+    """Fetch parent documents from the store (empty for stores without parents)."""
+    docstore = vectorstore.docstore
+    if not parent_ids or not hasattr(docstore, "get_parents"):
+        return {}
+    return docstore.get_parents(list(dict.fromkeys(parent_ids)))
+
+
+def apply_token_budget(results: list, token_budget: Optional[int]) -> list:
+    """
+    Keep results in rank order while they fit in token_budget.
+
+    The top result is truncated rather than dropped if it alone is too long.
+    """
+    if token_budget is None:
+        return results
+
+    packed, used = [], 0
+    for r in results:
+        tokens = count_tokens(r["snippet"])
+        if used + tokens <= token_budget:
+            packed.append(r)
+            used += tokens
+        elif not packed:
+            packed.append({**r, "snippet": truncate_to_tokens(r["snippet"], token_budget), "truncated": True})
+            break
+    return packed
+
+
+def to_structured_results(
+    docs: list,
+    vectorstore: FAISS,
+    expand_parent: bool = False,
+    scores: Optional[List[float]] = None,
+) -> list:
+    """
+    Shape retrieved chunk Documents into result dicts.
+
+    With expand_parent=True each chunk is replaced by its full parent
+    entry, and several chunks of the same parent collapse into one result.
+    When `scores` is given (aligned with docs) each result gets a 'score'.
+    """
+    parents = (
+        get_parent_documents(vectorstore, [d.metadata.get("parent_id") for d in docs if d.metadata.get("parent_id")])
+        if expand_parent else {}
+    )
+
+    structured_results, seen_parents = [], set()
+    for i, r in enumerate(docs):
+        parent_id = r.metadata.get("parent_id")
+        snippet = r.page_content
+        if expand_parent and parent_id in parents:
+            if parent_id in seen_parents:
+                continue
+            seen_parents.add(parent_id)
+            snippet = parents[parent_id].page_content
+
+        result = {
+            "source": r.metadata.get("source"),
+            "category": r.metadata.get("category"),
+            "title": r.metadata.get("title"),
+            "parent_id": parent_id,
+            "snippet": snippet
+        }
+        if scores is not None:
+            result["score"] = scores[i]
+        structured_results.append(result)
+    return structured_results
+
+
+def retrieve_from_kb(
+    query_text: str,
+    vectorstore: FAISS,
+    k: int = 3,
+    token_budget: Optional[int] = None,
+    expand_parent: bool = False,
+) -> list:
     """
     Retrieve top-k most relevant documents from a FAISS vectorstore based on a query.
 
+    The index holds passage-level chunks, so snippets carry only the
+    matching paragraphs instead of whole FAQ files.
+
     Args:
         query_text (str): User query to search in KB.
         vectorstore (FAISS): FAISS vectorstore object.
         k (int): Number of top documents to return.
+        token_budget (int): Max total tokens across returned snippets.
+        expand_parent (bool): Return the full parent FAQ entry of each
+            matching chunk instead of the chunk itself.
     
     Returns:
-        list: List of dictionaries with 'source', 'category', and 'snippet'.
+        list: List of dictionaries with 'source', 'category', 'title',
+        'parent_id' and 'snippet'.
     """
     results = vectorstore.similarity_search(query_text, k=k)
-    structured_results = []
-    for r in results:
-        structured_results.append({
-            "source": r.metadata.get("source"),
-            "category": r.metadata.get("category"),
-            "snippet": r.page_content
-        })
-    return structured_results
+    structured_results = to_structured_results(results, vectorstore, expand_parent=expand_parent)
+    return apply_token_budget(structured_results, token_budget)
+
+
+def embed_queries(queries: List[str], vectorstore: FAISS) -> np.ndarray:
+    """Embed all queries in one batched forward pass (cache-aware when available)."""
+    embeddings = vectorstore.embedding_function
+    if hasattr(embeddings, "embed_documents_array"):
+        return embeddings.embed_documents_array(queries, kind="query")
+    return np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+
+
+def retrieve_many(
+    queries: List[str],
+    vectorstore: FAISS,
+    k: int = 3,
+    expand_parent: bool = False,
+) -> List[list]:
+    """
+    Retrieve top-k documents for many queries at once.
+
+    All queries are embedded in one batch and searched with a single
+    matrix FAISS call; ID and document lookups are batched across
+    queries too. Use this for triaging a backlog instead of calling
+    retrieve_from_kb in a loop.
+
+    Args:
+        queries (list): Query texts.
+        vectorstore (FAISS): FAISS vectorstore object.
+        k (int): Number of top documents per query.
+        expand_parent (bool): Return full parent FAQ entries.
+
+    Returns:
+        List[list]: One result list per query (same order), each entry
+        like retrieve_from_kb's plus 'score' (relevance in [0, 1],
+        higher is better).
+    """
+    if not queries:
+        return []
+
+    vectors = np.ascontiguousarray(embed_queries(queries, vectorstore), dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vectors)
+    distances, positions = vectorstore.index.search(vectors, k)
+
+    # Resolve positions -> ids -> documents once for the whole batch
+    mapping = vectorstore.index_to_docstore_id
+    unique_positions = sorted({int(p) for p in positions.ravel() if p != -1})
+    if hasattr(mapping, "mget"):
+        ids_by_position = mapping.mget(unique_positions)
+    else:
+        ids_by_position = {p: mapping[p] for p in unique_positions if p in mapping}
+
+    docstore = vectorstore.docstore
+    unique_ids = list(dict.fromkeys(ids_by_position.values()))
+    if hasattr(docstore, "mget"):
+        docs_by_id = docstore.mget(unique_ids)
+    else:
+        docs_by_id = {id_: docstore.search(id_) for id_ in unique_ids}
+
+    relevance = vectorstore._select_relevance_score_fn()
+    all_results = []
+    for row_distances, row_positions in zip(distances, positions):
+        docs, scores = [], []
+        for distance, position in zip(row_distances, row_positions):
+            doc = docs_by_id.get(ids_by_position.get(int(position)))
+            if position == -1 or not isinstance(doc, Document):
+                continue
+            docs.append(doc)
+            # LangChain's L2 conversion goes negative for distant matches
+            scores.append(min(1.0, max(0.0, float(relevance(float(distance))))))
+
+        all_results.append(to_structured_results(docs, vectorstore, expand_parent=expand_parent, scores=scores))
+    return all_results
+
+
+def retrieve_hybrid(
+    query_text: str,
+    vectorstore: FAISS,
+    k: int = 3,
+    token_budget: Optional[int] = None,
+    expand_parent: bool = False,
+    lexical_fast_path: bool = True,
+) -> list:
+    """
+    Retrieve top-k documents with BM25 + dense search (reciprocal rank fusion).
+
+    Exact tokens such as error codes, OS versions and product names are
+    matched lexically; paraphrases are matched by the embeddings. A query
+    whose terms all hit one document clearly ahead of the rest is answered
+    from the inverted index alone, without embedding the query.
+
+    Args:
+        query_text (str): User query to search in KB.
+        vectorstore (FAISS): FAISS vectorstore object.
+        k (int): Number of top documents to return.
+        token_budget (int): Max total tokens across returned snippets.
+        expand_parent (bool): Return full parent FAQ entries.
+        lexical_fast_path (bool): Allow skipping the dense search.
+
+    Returns:
+        list: Same dictionaries as retrieve_from_kb, plus 'score' (RRF,
+        BM25 or L2 distance) and 'retriever' ("hybrid", "lexical" or "dense").
+    """
+    docs, scores, retriever = hybrid_search(query_text, vectorstore, k=k, lexical_fast_path=lexical_fast_path)
+    structured_results = to_structured_results(docs, vectorstore, expand_parent=expand_parent, scores=scores)
+    for r in structured_results:
+        r["retriever"] = retriever
+    return apply_token_budget(structured_results, token_budget)
 
 
 # -------------------------
 # 4️⃣ Load saved vectorstore
 # -------------------------
-def load_saved_vectorstore(vectorstore_path: Path = VECTORSTORE_PATH) -> FAISS:
+def load_saved_vectorstore(
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    hf_model_name: str = HF_MODEL_NAME,
+    mmap: bool = True,
+    ann: bool = True,
+) -> FAISS:
     """
     Load a previously saved FAISS vectorstore from disk.
 
+    The FAISS index is memory-mapped and documents are fetched lazily
+    from SQLite, so startup cost does not grow with the KB. Stores in
+    the old pickle-based `save_local` format are still readable.
+
     Args:
         vectorstore_path (Path): Path to the saved FAISS vectorstore.
+        hf_model_name (str): Embedding model the store was built with.
+        mmap (bool): Memory-map the index (read-only). Pass False to
+            modify the loaded store.
+        ann (bool): Search the ANN index (knowledge.ann) when one is
+            saved and up to date. Ignored when mmap=False, since updates
+            must edit the exact index.
     
     Returns:
         FAISS: Loaded vectorstore.
@@ -120,17 +453,36 @@ def load_saved_vectorstore(vectorstore_path: Path = VECTORSTORE_PATH) -> FAISS:
     Raises:
         FileNotFoundError: If the vectorstore file does not exist.
     """
-    if not vectorstore_path.exists():
-        raise FileNotFoundError(f"Vectorstore not found. Run KB loader first: {vectorstore_path}")
-    return FAISS.load_local(str(vectorstore_path))
+    embeddings = get_embeddings(hf_model_name)
+    if is_saved_vectorstore(vectorstore_path):
+        # One published version for both the index and the ANN index
+        vectorstore_path = resolve_store(vectorstore_path)
+        vectorstore = load_vectorstore(vectorstore_path, embeddings, mmap=mmap)
+        ann_index = load_ann_index(vectorstore_path) if ann and mmap else None
+        if ann_index is not None:
+            vectorstore.index = ann_index
+        return vectorstore
+
+    if LEGACY_VECTORSTORE_PATH.exists():
+        print(f"Loading legacy pickle vectorstore from {LEGACY_VECTORSTORE_PATH}; rebuild to migrate.")
+        return FAISS.load_local(
+            str(LEGACY_VECTORSTORE_PATH),
+            embeddings,
+            allow_dangerous_deserialization=True,
+        )
+
+    raise FileNotFoundError(f"Vectorstore not found. Run KB loader first: {vectorstore_path}")
 
 
 # -------------------------
 # 5️⃣ Example test
 # -------------------------
 if __name__ == "__main__":
-    docs = load_faq_docs()
-    vs = build_vectorstore(docs)
+    # Incremental refresh: only new/edited FAQ files are embedded
+    from knowledge.indexer import update_vectorstore
+
+    update_vectorstore()
+    vs = load_saved_vectorstore()
     results = retrieve_from_kb("App crashes on macOS Ventura", vs)
     for i, doc in enumerate(results, 1):
         print(f"\nResult {i}:")
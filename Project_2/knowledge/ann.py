@@ -0,0 +1,519 @@
+# ann.py
+
+"""
+Approximate nearest-neighbour index options for large corpora.
+
+The exact flat index (`index.faiss`) stays the source of truth: it is
+what incremental updates edit. An ANN index is built from it and saved
+next to it:
+    index.ann.faiss   IVF-Flat, IVF-PQ or HNSW, same positions as the flat index
+    ann.json          type, build/search params, and the flat index it was built from
+
+Read-only loads (load_saved_vectorstore with mmap=True) search the ANN
+index when it is up to date with the flat one, so positions -> doc IDs
+stay valid. A stale ANN index is ignored (exact search) until rebuilt.
+
+Incremental KB updates edit the ANN index the same way they edit the
+flat one (update_ann_index): removed positions are dropped and the
+remaining ones renumbered (IVF), new vectors are appended. IVF/PQ is
+retrained only once the corpus size moved by ANN_RETRAIN_GROWTH since
+training or new vectors drift away from the trained centroids; HNSW,
+which cannot remove vectors, is rebuilt when a removal is needed.
+
+Index types:
+    flat      exact, O(N) per query; best up to ~20k vectors
+    hnsw      graph search, very fast and accurate, more RAM; up to ~1M
+    ivf_flat  k-means buckets + exact vectors, nprobe buckets searched
+    ivf_pq    IVF with product-quantized vectors (~dim/8 bytes per vector); 1M+
+
+Usage:
+    python -m knowledge.ann build --type auto
+    python -m knowledge.ann report --k 10
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from knowledge.config import (
+    VECTORSTORE_PATH,
+    ANN_INDEX_TYPE,
+    ANN_FLAT_MAX,
+    ANN_HNSW_MAX,
+    ANN_TRAIN_SAMPLE,
+    ANN_NPROBE,
+    ANN_EF_SEARCH,
+    ANN_RETRAIN_GROWTH,
+    ANN_DRIFT_TOLERANCE,
+    ANN_DRIFT_MIN_VECTORS,
+)
+from logger import logger
+
+SOURCE_INDEX_FILE = "index.faiss"  # written by knowledge.docstore.save_vectorstore
+ANN_INDEX_FILE = "index.ann.faiss"
+ANN_META_FILE = "ann.json"
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Params kept across rebuilds; nlist is re-sized to the corpus every time
+_STICKY_PARAMS = ("M", "ef_construction", "ef_search", "m", "nbits", "nprobe")
+
+
+# -------------------------
+# Index construction
+# -------------------------
+def choose_index_type(n_vectors: int) -> str:
+    """Pick an index type for a corpus size."""
+    if n_vectors <= ANN_FLAT_MAX:
+        return "flat"
+    if n_vectors <= ANN_HNSW_MAX:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def default_params(index_type: str, n_vectors: int, dim: int) -> dict:
+    """Build parameters sized to the corpus."""
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # ~4 * sqrt(N) lists, and at least 39 training points per list
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39 or 1))
+        params = {"nlist": nlist, "nprobe": min(ANN_NPROBE, nlist)}
+        if index_type == "ivf_pq":
+            m = next(m for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1) if dim % m == 0 and m <= dim)
+            params.update({"m": m, "nbits": 8})
+        return params
+    if index_type == "hnsw":
+        return {"M": 32, "ef_construction": 200, "ef_search": ANN_EF_SEARCH}
+    return {}
+
+
+def make_index(index_type: str, dim: int, params: dict) -> faiss.Index:
+    """Create an empty (untrained) L2 index."""
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        return index
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, params["nlist"], faiss.METRIC_L2)
+    elif index_type == "ivf_pq":
+        index = faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["m"], params["nbits"])
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    return index
+
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """Apply query-time knobs (no-op for index types they don't apply to)."""
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
+def iter_vectors(index: faiss.Index, batch_size: int = 65536):
+    """Stream the stored vectors of a flat index in position order."""
+    for start in range(0, index.ntotal, batch_size):
+        yield index.reconstruct_n(start, min(batch_size, index.ntotal - start))
+
+
+def sample_vectors(index: faiss.Index, size: int, seed: int = 0) -> np.ndarray:
+    """Uniform random sample of stored vectors, for training."""
+    rng = np.random.default_rng(seed)
+    positions = np.sort(rng.choice(index.ntotal, size=min(size, index.ntotal), replace=False))
+    return np.vstack([index.reconstruct(int(p)) for p in positions]).astype(np.float32)
+
+
+def build_ann_from_flat(
+    flat: faiss.Index,
+    index_type: str,
+    params: Optional[dict] = None,
+    train_sample: int = ANN_TRAIN_SAMPLE,
+) -> faiss.Index:
+    """
+    Build an ANN index holding the same vectors at the same positions.
+
+    Training (IVF/PQ) uses a random sample of at most `train_sample`
+    vectors, so build cost does not grow with training on the full corpus.
+    """
+    params = params or default_params(index_type, flat.ntotal, flat.d)
+    index = make_index(index_type, flat.d, params)
+    if not index.is_trained:
+        started = time.perf_counter()
+        index.train(sample_vectors(flat, train_sample))
+        logger.info("ANN %s trained in %.1fs | sample=%d", index_type, time.perf_counter() - started, min(train_sample, flat.ntotal))
+    for vectors in iter_vectors(flat):
+        index.add(vectors)
+    set_search_params(index, params.get("nprobe"), params.get("ef_search"))
+    return index
+
+
+def coarse_residual(index: faiss.Index, vectors: np.ndarray) -> Optional[float]:
+    """Mean squared distance of vectors to their nearest IVF centroid (None for non-IVF)."""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+    if not len(vectors):
+        return None
+    distances, _ = ivf.quantizer.search(np.ascontiguousarray(vectors, dtype=np.float32), 1)
+    return float(distances.mean())
+
+
+def remove_positions(index: faiss.Index, positions: np.ndarray) -> None:
+    """
+    Remove positions the way IndexFlat.remove_ids does: later positions shift down.
+
+    IVF removal leaves the remaining ids as they were, so they are
+    renumbered list by list to stay equal to the flat index positions.
+    """
+    removed = np.unique(np.asarray(positions, dtype=np.int64))
+    ivf = faiss.extract_index_ivf(index)
+    ivf.remove_ids(removed)
+    invlists = ivf.invlists
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if not size:
+            continue
+        ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+        codes = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * invlists.code_size).copy()
+        shifted = (ids - np.searchsorted(removed, ids)).astype(np.int64)
+        invlists.update_entries(list_no, 0, size, faiss.swig_ptr(shifted), faiss.swig_ptr(codes))
+
+
+# -------------------------
+# Persistence
+# -------------------------
+def _source_fingerprint(path: Path) -> dict:
+    stat = (Path(path) / SOURCE_INDEX_FILE).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _write_ann(path: Path, index: faiss.Index, meta: dict) -> dict:
+    tmp_index = path / (ANN_INDEX_FILE + ".tmp")
+    faiss.write_index(index, str(tmp_index))
+    os.replace(tmp_index, path / ANN_INDEX_FILE)
+    meta = {**meta, "ntotal": index.ntotal, "source": _source_fingerprint(path)}
+    # Replaced, never rewritten in place: staging directories hard-link it
+    tmp_meta = path / (ANN_META_FILE + ".tmp")
+    tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp_meta, path / ANN_META_FILE)
+    return meta
+
+
+def build_ann_index(
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    index_type: str = ANN_INDEX_TYPE,
+    params: Optional[dict] = None,
+) -> Optional[dict]:
+    """
+    Build and save the ANN index of a saved vectorstore.
+
+    Args:
+        vectorstore_path (Path): Directory written by save_vectorstore.
+        index_type (str): One of INDEX_TYPES, or "auto" to choose by size.
+        params (dict): Overrides for default_params.
+
+    Returns:
+        dict: The saved metadata, or None when "flat" was chosen (any
+        previous ANN index is removed, searches stay exact).
+    """
+    path = Path(vectorstore_path)
+    flat = faiss.read_index(str(path / SOURCE_INDEX_FILE), faiss.IO_FLAG_MMAP)
+
+    if index_type == "auto":
+        index_type = choose_index_type(flat.ntotal)
+    if index_type == "flat":
+        for name in (ANN_INDEX_FILE, ANN_META_FILE):
+            (path / name).unlink(missing_ok=True)
+        return None
+
+    params = {**default_params(index_type, flat.ntotal, flat.d), **(params or {})}
+    started = time.perf_counter()
+    index = build_ann_from_flat(flat, index_type, params)
+
+    meta = _write_ann(path, index, {
+        "type": index_type,
+        "params": params,
+        "build_seconds": round(time.perf_counter() - started, 3),
+        # Baseline for update_ann_index's retrain checks
+        "trained_ntotal": flat.ntotal,
+        "residual": coarse_residual(index, sample_vectors(flat, min(ANN_TRAIN_SAMPLE, 10_000))),
+        "added_since_training": 0,
+        "added_residual": None,
+    })
+    logger.info("ANN index saved | type=%s vectors=%d params=%s", index_type, index.ntotal, params)
+    return meta
+
+
+def publish_ann_index(
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    index_type: str = ANN_INDEX_TYPE,
+    params: Optional[dict] = None,
+) -> Optional[dict]:
+    """
+    build_ann_index for a published store: the index is built on a staging
+    copy under the store's build lock and published as a new version, so
+    neither a running IndexHolder nor an incremental update sees it half-built.
+
+    Raises:
+        FileNotFoundError: If no vectorstore is saved at vectorstore_path.
+    """
+    # Imported here: knowledge.docstore imports this module
+    from knowledge.docstore import build_lock, is_saved_vectorstore, publish_vectorstore, staging_path
+
+    if not is_saved_vectorstore(vectorstore_path):
+        raise FileNotFoundError(f"Vectorstore not found: {vectorstore_path}")
+    with build_lock(vectorstore_path):
+        staging = staging_path(vectorstore_path, copy_current=True)
+        meta = build_ann_index(staging, index_type, params)
+        publish_vectorstore(staging, vectorstore_path)
+    return meta
+
+
+def refresh_ann_index(vectorstore_path: Path = VECTORSTORE_PATH) -> Optional[dict]:
+    """
+    Rebuild the ANN index after the flat index changed.
+
+    Keeps the configured type of an existing ANN index (including
+    explicit params); otherwise applies ANN_INDEX_TYPE, which by default
+    only builds one once the corpus outgrows a flat index.
+    """
+    path = Path(vectorstore_path)
+    meta_path = path / ANN_META_FILE
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        params = {key: value for key, value in meta["params"].items() if key in _STICKY_PARAMS}
+        return build_ann_index(path, meta["type"], params)
+    return build_ann_index(path, ANN_INDEX_TYPE)
+
+
+def _rebuild_reason(meta: dict, flat: faiss.Index, n_removed: int) -> Optional[str]:
+    """Why the ANN index cannot simply be edited, or None."""
+    if meta["ntotal"] - n_removed < 0 or meta["ntotal"] - n_removed > flat.ntotal:
+        return "out of sync with the flat index"
+    if meta["type"] == "hnsw" and n_removed:
+        return "HNSW cannot remove vectors"
+    if meta["type"] in ("ivf_flat", "ivf_pq"):
+        trained = meta.get("trained_ntotal")
+        if not trained:
+            return "no training baseline"
+        if abs(flat.ntotal - trained) > ANN_RETRAIN_GROWTH * trained:
+            return f"corpus moved from {trained} to {flat.ntotal} vectors since training"
+    return None
+
+
+def update_ann_index(vectorstore_path: Path = VECTORSTORE_PATH, removed_positions=()) -> Optional[dict]:
+    """
+    Apply an incremental flat-index edit to the ANN index instead of rebuilding it.
+
+    Mirrors what the indexer did to the flat index: `removed_positions`
+    (positions before the edit) were removed, then the vectors now at the
+    end of the flat index were appended. Falls back to refresh_ann_index
+    when there is no ANN index yet, the edit cannot be mirrored, or an
+    IVF index needs retraining (size change or centroid drift).
+
+    Returns:
+        dict: The saved metadata, or None when searches stay exact.
+    """
+    path = Path(vectorstore_path)
+    meta_path = path / ANN_META_FILE
+    if not (meta_path.exists() and (path / ANN_INDEX_FILE).exists()):
+        return refresh_ann_index(path)
+
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    flat = faiss.read_index(str(path / SOURCE_INDEX_FILE), faiss.IO_FLAG_MMAP)
+    removed = np.unique(np.asarray(removed_positions, dtype=np.int64))
+    reason = _rebuild_reason(meta, flat, len(removed))
+
+    if reason is None:
+        index = faiss.read_index(str(path / ANN_INDEX_FILE))
+        kept = meta["ntotal"] - len(removed)
+        if index.ntotal != meta["ntotal"]:
+            reason = "index size does not match its metadata"
+        else:
+            added = flat.reconstruct_n(kept, flat.ntotal - kept) if flat.ntotal > kept else np.zeros((0, flat.d), np.float32)
+            residual = coarse_residual(index, added)
+            if residual is not None:
+                # Running mean over everything added since training
+                count = meta.get("added_since_training", 0)
+                previous = meta.get("added_residual") or 0.0
+                meta["added_residual"] = (previous * count + residual * len(added)) / (count + len(added))
+                meta["added_since_training"] = count + len(added)
+                if (
+                    meta["added_since_training"] >= ANN_DRIFT_MIN_VECTORS
+                    and meta.get("residual")
+                    and meta["added_residual"] > meta["residual"] * (1 + ANN_DRIFT_TOLERANCE)
+                ):
+                    reason = "added vectors drifted from the trained centroids"
+
+    if reason is not None:
+        logger.info("ANN index rebuilt | reason=%s", reason)
+        return refresh_ann_index(path)
+
+    if len(removed):
+        remove_positions(index, removed)
+    if len(added):
+        index.add(np.ascontiguousarray(added, dtype=np.float32))
+    meta = _write_ann(path, index, meta)
+    logger.info("ANN index updated | type=%s removed=%d added=%d vectors=%d", meta["type"], len(removed), len(added), index.ntotal)
+    return meta
+
+
+def load_ann_index(
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Optional[faiss.Index]:
+    """
+    Load the ANN index if it exists and matches the flat index, else None.
+
+    Args:
+        nprobe / ef_search: Override the saved search params.
+    """
+    path = Path(vectorstore_path)
+    meta_path = path / ANN_META_FILE
+    if not (meta_path.exists() and (path / ANN_INDEX_FILE).exists()):
+        return None
+
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if meta.get("source") != _source_fingerprint(path):
+        logger.warning("ANN index at %s is stale; using exact search until it is rebuilt", path)
+        return None
+
+    try:
+        index = faiss.read_index(str(path / ANN_INDEX_FILE), faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        # Not every index type can be memory-mapped
+        index = faiss.read_index(str(path / ANN_INDEX_FILE))
+
+    params = meta.get("params", {})
+    set_search_params(
+        index,
+        nprobe if nprobe is not None else params.get("nprobe"),
+        ef_search if ef_search is not None else params.get("ef_search"),
+    )
+    return index
+
+
+# -------------------------
+# Recall / latency report
+# -------------------------
+def _queries_from_index(flat: faiss.Index, n_queries: int, seed: int = 1) -> np.ndarray:
+    """Stored vectors plus small noise, as stand-in queries."""
+    rng = np.random.default_rng(seed)
+    queries = sample_vectors(flat, n_queries, seed=seed)
+    noise = rng.normal(scale=0.05 * float(np.std(queries)), size=queries.shape).astype(np.float32)
+    return queries + noise
+
+
+def _time_search(index: faiss.Index, queries: np.ndarray, k: int):
+    started = time.perf_counter()
+    _, positions = index.search(queries, k)
+    return positions, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def recall_at_k(exact: np.ndarray, approx: np.ndarray) -> float:
+    """Share of the exact top-k found in the approximate top-k."""
+    k = exact.shape[1]
+    hits = sum(len(set(e[e != -1]) & set(a[a != -1])) for e, a in zip(exact, approx))
+    return hits / (len(exact) * k)
+
+
+def recall_latency_report(
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    k: int = 10,
+    n_queries: int = 500,
+    queries: Optional[np.ndarray] = None,
+    index_types: tuple = ("ivf_flat", "ivf_pq", "hnsw"),
+) -> List[Dict]:
+    """
+    Recall@k and per-query latency of each index type and search setting,
+    measured against the exact flat index.
+
+    Args:
+        queries: Query vectors; defaults to perturbed stored vectors.
+
+    Returns:
+        List of rows {type, setting, recall, ms_per_query, build_seconds}.
+        The first row is the exact baseline.
+    """
+    flat = faiss.read_index(str(Path(vectorstore_path) / SOURCE_INDEX_FILE))
+    if queries is None:
+        queries = _queries_from_index(flat, n_queries)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    k = min(k, flat.ntotal)
+
+    exact, exact_ms = _time_search(flat, queries, k)
+    rows = [{"type": "flat", "setting": "-", "recall": 1.0, "ms_per_query": exact_ms, "build_seconds": 0.0}]
+
+    for index_type in index_types:
+        params = default_params(index_type, flat.ntotal, flat.d)
+        if index_type == "ivf_pq" and flat.ntotal < 4 * 2 ** params["nbits"]:
+            logger.info("Skipping ivf_pq: %d vectors are too few to train the codebooks", flat.ntotal)
+            continue
+        started = time.perf_counter()
+        index = build_ann_from_flat(flat, index_type, params)
+        build_seconds = time.perf_counter() - started
+
+        if index_type == "hnsw":
+            settings = [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)]
+        else:
+            settings = [{"nprobe": p} for p in (1, 4, 16, 64, 256) if p <= params["nlist"]]
+
+        for setting in settings:
+            set_search_params(index, setting.get("nprobe"), setting.get("ef_search"))
+            approx, ms = _time_search(index, queries, k)
+            rows.append({
+                "type": index_type,
+                "setting": ", ".join(f"{key}={value}" for key, value in setting.items()),
+                "recall": recall_at_k(exact, approx),
+                "ms_per_query": ms,
+                "build_seconds": build_seconds,
+            })
+    return rows
+
+
+def format_report(rows: List[Dict], k: int) -> str:
+    lines = [f"{'index':<10} {'setting':<16} {f'recall@{k}':>10} {'ms/query':>10} {'build s':>8}"]
+    for row in rows:
+        lines.append(
+            f"{row['type']:<10} {row['setting']:<16} {row['recall']:>10.3f} "
+            f"{row['ms_per_query']:>10.3f} {row['build_seconds']:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or evaluate ANN indexes for the KB vectorstore.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the ANN index and publish it as a new store version")
+    build.add_argument("--path", type=Path, default=VECTORSTORE_PATH)
+    build.add_argument("--type", default=ANN_INDEX_TYPE, choices=("auto",) + INDEX_TYPES)
+    build.add_argument("--nlist", type=int)
+    build.add_argument("--nprobe", type=int)
+    build.add_argument("--ef-search", type=int)
+
+    report = sub.add_parser("report", help="Recall@k vs latency against exact search")
+    report.add_argument("--path", type=Path, default=VECTORSTORE_PATH)
+    report.add_argument("--k", type=int, default=10)
+    report.add_argument("--queries", type=int, default=500)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        overrides = {key: value for key, value in (("nlist", args.nlist), ("nprobe", args.nprobe), ("ef_search", args.ef_search)) if value is not None}
+        print(publish_ann_index(args.path, args.type, overrides) or "Flat index selected; searches stay exact.")
+    else:
+        print(format_report(recall_latency_report(args.path, k=args.k, n_queries=args.queries), args.k))
@@ -0,0 +1,279 @@
+# answer_cache.py
+
+"""
+Semantic answer cache for repeated support questions.
+
+A validated answer (final verdict "A") is stored with the embedding of
+the ticket text that produced it. A new ticket whose embedding is within
+the cosine-similarity threshold of a cached one reuses its `answer` and
+`retrieved_from_kb` and skips fact extraction, retrieval and generation.
+
+Entries expire after a TTL and are dropped whenever the KB content
+changes (knowledge.indexer.kb_version) or a new store version is
+published (a full build_vectorstore rebuild does not write the
+manifest), so answers never outlive the documents they were grounded on. A lookup checks the few nearest entries,
+so an expired nearest neighbour does not hide a valid one behind it, and
+expired rows are purged from SQLite and the index periodically.
+
+Storage: one SQLite file; the vectors of live entries are kept in an
+in-memory inner-product index (normalized vectors = cosine similarity).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, List, Optional
+
+import faiss
+import numpy as np
+
+from knowledge import get_embeddings
+from knowledge.config import (
+    HF_MODEL_NAME,
+    MANIFEST_PATH,
+    VECTORSTORE_PATH,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_CANDIDATES,
+    ANSWER_CACHE_PURGE_INTERVAL_SECONDS,
+)
+from knowledge.docstore import resolve_store
+from knowledge.indexer import kb_version
+from logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    kb_version TEXT NOT NULL,
+    query_text TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    retrieved_from_kb TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+@dataclass
+class CachedAnswer:
+    """A cache hit."""
+    answer: str
+    retrieved_from_kb: List[Any]
+    similarity: float
+    query_text: str
+    age_seconds: float
+
+
+class AnswerCache:
+    """
+    Embedding-keyed answer cache with threshold, TTL and KB-version checks.
+
+    Args:
+        db_path (Path): SQLite file.
+        threshold (float): Minimum cosine similarity for a hit.
+        ttl_seconds (float): Entry lifetime.
+        embeddings: LangChain embeddings (default: the shared KB model).
+        manifest_path (Path): KB manifest whose version scopes the entries.
+        vectorstore_path (Path): Published store; a new version also scopes them.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = ANSWER_CACHE_PATH,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        embeddings=None,
+        manifest_path: Path = MANIFEST_PATH,
+        vectorstore_path: Path = VECTORSTORE_PATH,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.embeddings = embeddings or get_embeddings(HF_MODEL_NAME)
+        self.manifest_path = Path(manifest_path)
+        self.vectorstore_path = Path(vectorstore_path)
+
+        self._lock = threading.RLock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        self._index: Optional[faiss.IndexIDMap2] = None
+        self._kb_version: Optional[str] = None
+        self._version_marker: Optional[tuple] = None
+        self._last_purge = time.time()
+
+        self.hits = 0
+        self.misses = 0
+
+        with self._lock:
+            self._sync_kb_version()
+
+    # -------------------------
+    # KB version scoping
+    # -------------------------
+    def _sync_kb_version(self) -> None:
+        """Drop entries from another KB version (re-hashes only when the manifest or store changes)."""
+        mtime = self.manifest_path.stat().st_mtime_ns if self.manifest_path.exists() else None
+        store = resolve_store(self.vectorstore_path).name
+        if self._kb_version is not None and (mtime, store) == self._version_marker:
+            return
+
+        version = f"{kb_version(self.manifest_path)}@{store}"
+        self._version_marker = (mtime, store)
+        if version == self._kb_version:
+            return
+
+        dropped = self._conn.execute("DELETE FROM answers WHERE kb_version != ?", (version,)).rowcount
+        self._conn.commit()
+        if dropped:
+            logger.info("Answer cache invalidated | kb_version=%s dropped=%d", version, dropped)
+        self._kb_version = version
+        self._load_index()
+
+    def _load_index(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        self._conn.execute("DELETE FROM answers WHERE created_at < ?", (cutoff,))
+        self._conn.commit()
+        self._last_purge = time.time()
+        rows = self._conn.execute("SELECT id, embedding FROM answers").fetchall()
+
+        self._index = None
+        if rows:
+            vectors = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            self._index.add_with_ids(vectors, np.array([id_ for id_, _ in rows], dtype=np.int64))
+
+    def _maybe_purge(self) -> None:
+        """Delete expired entries at most once per purge interval (lock held)."""
+        now = time.time()
+        if now - self._last_purge < ANSWER_CACHE_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        expired = [id_ for (id_,) in self._conn.execute(
+            "SELECT id FROM answers WHERE created_at < ?", (now - self.ttl_seconds,)
+        )]
+        if expired:
+            self._remove(expired)
+            logger.info("Answer cache purged | expired=%d", len(expired))
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray([self.embeddings.embed_query(text)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    # -------------------------
+    # API
+    # -------------------------
+    def lookup(self, query_text: str) -> Optional[CachedAnswer]:
+        """
+        Cached answer for a near-identical question, or None.
+
+        Args:
+            query_text (str): The new ticket text.
+        """
+        vector = self._embed(query_text)
+        with self._lock:
+            self._sync_kb_version()
+            self._maybe_purge()
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            similarities, ids = self._index.search(vector, min(ANSWER_CACHE_CANDIDATES, self._index.ntotal))
+            candidates = [
+                (float(similarity), int(id_))
+                for similarity, id_ in zip(similarities[0], ids[0])
+                if id_ != -1 and similarity >= self.threshold
+            ]
+            rows = {}
+            if candidates:
+                placeholders = ",".join("?" * len(candidates))
+                rows = {row[0]: row[1:] for row in self._conn.execute(
+                    "SELECT id, created_at, kb_version, query_text, answer, retrieved_from_kb "
+                    f"FROM answers WHERE id IN ({placeholders})",
+                    [id_ for _, id_ in candidates],
+                )}
+
+            now, dead = time.time(), []
+            for similarity, id_ in candidates:
+                row = rows.get(id_)
+                if row is None or now - row[0] > self.ttl_seconds or row[1] != self._kb_version:
+                    dead.append(id_)
+                    continue
+
+                if dead:
+                    self._remove(dead)
+                self._conn.execute("UPDATE answers SET hits = hits + 1 WHERE id = ?", (id_,))
+                self._conn.commit()
+                self.hits += 1
+                return CachedAnswer(
+                    answer=row[3],
+                    retrieved_from_kb=json.loads(row[4]),
+                    similarity=similarity,
+                    query_text=row[2],
+                    age_seconds=now - row[0],
+                )
+
+            if dead:
+                self._remove(dead)
+            self.misses += 1
+            return None
+
+    def store(self, query_text: str, answer: str, retrieved_from_kb: List[Any]) -> None:
+        """Cache a validated answer for query_text."""
+        vector = self._embed(query_text)
+        with self._lock:
+            self._sync_kb_version()
+            self._maybe_purge()
+            cursor = self._conn.execute(
+                "INSERT INTO answers (created_at, kb_version, query_text, answer, retrieved_from_kb, embedding) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), self._kb_version, query_text, answer, json.dumps(retrieved_from_kb, default=str), vector[0].tobytes()),
+            )
+            self._conn.commit()
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            self._index.add_with_ids(vector, np.array([cursor.lastrowid], dtype=np.int64))
+
+    def store_from_state(self, state) -> bool:
+        """
+        Cache a resolved SupportTicketState if it was answered.
+
+        Returns:
+            bool: True if stored (final_verdict "A" with an answer).
+        """
+        if state.final_verdict != "A" or not state.answer:
+            return False
+        self.store(state.ticket_text, state.answer, state.retrieved_from_kb)
+        return True
+
+    def _remove(self, ids: List[int]) -> None:
+        self._conn.executemany("DELETE FROM answers WHERE id = ?", [(i,) for i in ids])
+        self._conn.commit()
+        if self._index is not None:
+            self._index.remove_ids(np.array(ids, dtype=np.int64))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._index = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": self._index.ntotal if self._index else 0,
+                "kb_version": self._kb_version,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
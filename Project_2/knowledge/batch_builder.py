@@ -0,0 +1,336 @@
+# batch_builder.py
+
+"""
+Streaming, multi-process KB build for large corpora.
+
+Documents are read lazily, grouped into batches, embedded across a
+process pool (one model copy per worker, torch threads split between
+them) and appended to the FAISS index as each batch completes. Workers
+are spawned, not forked, and the parent opens only the embedding cache,
+so the model is never loaded in (or copied from) the parent.
+
+Peak memory is bounded by `max_pending` batches of text + vectors;
+documents go straight into the SQLite docstore instead of being held
+in RAM. Texts already in the embedding cache never reach a worker.
+
+Usage:
+    python -m knowledge.batch_builder --batch-size 256 --workers 8
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_classic.schema import Document
+from langchain_community.vectorstores import FAISS
+
+from knowledge import chunk_file, get_embeddings, load_saved_vectorstore, open_embedding_cache
+from knowledge.config import KB_FOLDER, VECTORSTORE_PATH, MANIFEST_PATH, HF_MODEL_NAME
+from knowledge.ann import refresh_ann_index
+from knowledge.docstore import (
+    DOCSTORE_FILE,
+    SQLiteDocstore,
+    SQLiteIndexMap,
+    _SQLiteConnection,
+    build_lock,
+    publish_vectorstore,
+    save_vectorstore,
+    staging_path,
+)
+from knowledge.indexer import MANIFEST_VERSION, file_sha256, save_manifest, vector_ids_for
+from logger import logger
+
+
+# -------------------------
+# Document streams
+# -------------------------
+def iter_kb_documents(
+    kb_folder: Path = KB_FOLDER,
+    manifest: Optional[dict] = None,
+    parents: Optional[Dict[str, Document]] = None,
+) -> Iterator[Tuple[str, Document]]:
+    """
+    Yield (vector_id, chunk Document) for every .txt file, one file at a time.
+
+    When `manifest` is given, file hashes, vector IDs and parent IDs are
+    recorded in it, so the result is compatible with knowledge.indexer.
+    When `parents` is given, each file's parent documents are put in it
+    (drained by the builder after every batch).
+    """
+    if not kb_folder.exists():
+        raise FileNotFoundError(f"Folder does not exist: {kb_folder}")
+
+    for path in sorted(kb_folder.glob("*.txt")):
+        rel = path.relative_to(kb_folder).as_posix()
+        sha = file_sha256(path)
+        file_parents, docs = chunk_file(path)
+        ids = vector_ids_for(rel, sha, len(docs))
+        parent_ids = [doc.metadata["id"] for doc in file_parents]
+        if manifest is not None:
+            manifest["files"][rel] = {"sha256": sha, "ids": ids, "parent_ids": parent_ids}
+        if parents is not None:
+            parents.update(zip(parent_ids, file_parents))
+        yield from zip(ids, docs)
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# -------------------------
+# Worker process
+# -------------------------
+_worker_model = None
+
+
+def load_hf_model(hf_model_name: str):
+    """Default worker model: the HuggingFace model the KB is built with."""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=hf_model_name)
+
+
+def _init_worker(hf_model_name: str, threads_per_worker: int, load_model: Callable = load_hf_model) -> None:
+    """Load one embedding model per worker process."""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    _worker_model = load_model(hf_model_name)
+
+
+def _embed_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+
+
+# -------------------------
+# Builder
+# -------------------------
+class _Progress:
+    def __init__(self, report_every: float):
+        self.started = time.perf_counter()
+        self.report_every = report_every
+        self.last_report = 0.0
+        self.docs = 0
+        self.embedded = 0
+
+    def update(self, docs: int, embedded: int, final: bool = False) -> None:
+        self.docs += docs
+        self.embedded += embedded
+        now = time.perf_counter()
+        if not final and now - self.last_report < self.report_every:
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        rate = self.docs / elapsed if elapsed > 0 else 0.0
+        sys.stderr.write(
+            f"\r{self.docs} docs indexed | {self.embedded} embedded (rest cached) | "
+            f"{rate:.1f} docs/s | {elapsed:.0f}s elapsed   "
+        )
+        if final:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+
+def build_vectorstore_streaming(
+    id_documents: Iterable[Tuple[str, Document]],
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    hf_model_name: str = HF_MODEL_NAME,
+    batch_size: int = 256,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    report_every: float = 2.0,
+    parents: Optional[Dict[str, Document]] = None,
+    load_model: Callable = load_hf_model,
+) -> FAISS:
+    """
+    Build and save a vectorstore from a stream of (id, Document) pairs.
+
+    The new store is written next to the target and swapped in only when
+    complete, so a crashed build never replaces a working index.
+
+    Args:
+        id_documents: Iterable of (vector_id, Document); consumed lazily.
+        vectorstore_path (Path): Where the finished store is saved.
+        hf_model_name (str): HuggingFace embedding model name.
+        batch_size (int): Documents per embedding batch.
+        workers (int): Embedding processes (default: available cores).
+            1 embeds in-process.
+        max_pending (int): Batches in flight at once (default: 2 x workers).
+        report_every (float): Seconds between progress lines.
+        parents (dict): Parent documents, filled by the stream as it is
+            consumed (see iter_kb_documents); written and cleared per batch.
+        load_model: Module-level callable hf_model_name -> Embeddings run
+            in each worker process (must be importable by spawned workers).
+
+    Returns:
+        FAISS: The built vectorstore.
+
+    Raises:
+        ValueError: If the stream yields no documents.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    # With workers, the parent only reads and fills the cache: no model copy here
+    cache = get_embeddings(hf_model_name) if workers == 1 else open_embedding_cache(hf_model_name)
+
+    with build_lock(vectorstore_path):
+        build_path = staging_path(vectorstore_path)
+        db = _SQLiteConnection(build_path / DOCSTORE_FILE)
+
+        vectorstore: Optional[FAISS] = None
+        progress = _Progress(report_every)
+
+        def add_batch(batch: List[Tuple[str, Document]], vectors: np.ndarray) -> None:
+            nonlocal vectorstore
+            if vectorstore is None:
+                vectorstore = FAISS(
+                    embedding_function=cache,
+                    index=faiss.IndexFlatL2(vectors.shape[1]),
+                    docstore=SQLiteDocstore(db),
+                    index_to_docstore_id=SQLiteIndexMap(db),
+                )
+            vectorstore.add_embeddings(
+                text_embeddings=[(doc.page_content, vector) for (_, doc), vector in zip(batch, vectors.tolist())],
+                metadatas=[doc.metadata for _, doc in batch],
+                ids=[id_ for id_, _ in batch],
+            )
+            if parents:
+                vectorstore.docstore.add_parents(parents)
+                parents.clear()
+            # The build directory is private until the final swap, so commit as we go
+            db.commit()
+
+        def split_cached(batch):
+            texts = [doc.page_content for _, doc in batch]
+            cached = cache.lookup(texts) if hasattr(cache, "lookup") else [None] * len(texts)
+            misses = [i for i, vector in enumerate(cached) if vector is None]
+            return texts, cached, misses
+
+        def finish(batch, texts, cached, misses, computed: np.ndarray) -> None:
+            if len(misses):
+                if hasattr(cache, "store"):
+                    cache.store([texts[i] for i in misses], computed)
+                for i, vector in zip(misses, computed):
+                    cached[i] = vector
+            add_batch(batch, np.vstack(cached).astype(np.float32))
+            progress.update(len(batch), len(misses))
+
+        batches = batched(id_documents, batch_size)
+
+        if workers == 1:
+            model = getattr(cache, "base", cache)
+            for batch in batches:
+                texts, cached, misses = split_cached(batch)
+                computed = np.asarray(model.embed_documents([texts[i] for i in misses]), dtype=np.float32) if misses else None
+                finish(batch, texts, cached, misses, computed)
+        else:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(hf_model_name, threads_per_worker, load_model),
+            ) as pool:
+                pending = {}
+                exhausted = False
+                while True:
+                    # Keep at most max_pending batches in flight
+                    while not exhausted and len(pending) < max_pending:
+                        batch = next(batches, None)
+                        if batch is None:
+                            exhausted = True
+                            break
+                        texts, cached, misses = split_cached(batch)
+                        if not misses:
+                            finish(batch, texts, cached, misses, None)
+                            continue
+                        future = pool.submit(_embed_batch, [texts[i] for i in misses])
+                        pending[future] = (batch, texts, cached, misses)
+
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch, texts, cached, misses = pending.pop(future)
+                        finish(batch, texts, cached, misses, future.result())
+
+        progress.update(0, 0, final=True)
+
+        if vectorstore is None:
+            shutil.rmtree(build_path, ignore_errors=True)
+            raise ValueError("No documents to index")
+
+        save_vectorstore(vectorstore, build_path)
+        db.close()
+
+        # Swap the finished build into place
+        refresh_ann_index(build_path)
+        publish_vectorstore(build_path, vectorstore_path)
+
+        logger.info(
+            "Streaming build finished | docs=%d embedded=%d elapsed=%.1fs workers=%d",
+            progress.docs, progress.embedded, time.perf_counter() - progress.started, workers,
+        )
+    return load_saved_vectorstore(vectorstore_path, hf_model_name)
+
+
+def build_kb_streaming(
+    kb_folder: Path = KB_FOLDER,
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    manifest_path: Path = MANIFEST_PATH,
+    hf_model_name: str = HF_MODEL_NAME,
+    **kwargs,
+) -> FAISS:
+    """
+    Full streaming build of the KB folder. Writes a manifest, so later
+    refreshes can use knowledge.indexer.update_vectorstore incrementally.
+    """
+    manifest = {"version": MANIFEST_VERSION, "model": hf_model_name, "files": {}}
+    parents: Dict[str, Document] = {}
+    # Held across the manifest write too, so an incremental update cannot interleave
+    with build_lock(vectorstore_path):
+        vectorstore = build_vectorstore_streaming(
+            iter_kb_documents(kb_folder, manifest, parents),
+            vectorstore_path=vectorstore_path,
+            hf_model_name=hf_model_name,
+            parents=parents,
+            **kwargs,
+        )
+        save_manifest(manifest, manifest_path)
+    return vectorstore
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming multi-process KB build.")
+    parser.add_argument("--kb-folder", type=Path, default=KB_FOLDER)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=None, help="Embedding processes (default: all cores)")
+    parser.add_argument("--max-pending", type=int, default=None, help="Batches in flight (default: 2 x workers)")
+    args = parser.parse_args()
+
+    vs = build_kb_streaming(
+        kb_folder=args.kb_folder,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        max_pending=args.max_pending,
+    )
+    print(f"Vectorstore saved to {VECTORSTORE_PATH} ({vs.index.ntotal} vectors)")
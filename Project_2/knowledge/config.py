@@ -0,0 +1,53 @@
+from pathlib import Path
+
+# -------------------------
+# CONFIG
+# -------------------------
+KB_FOLDER = Path("knowledge/Knowledge Base")
+VECTORSTORE_PATH = KB_FOLDER / "kb_index"  # index.faiss + docstore.sqlite
+LEGACY_VECTORSTORE_PATH = KB_FOLDER / "kb_vectorstore.faiss"  # pickle-based save_local format
+MANIFEST_PATH = KB_FOLDER / "kb_manifest.json"
+HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = KB_FOLDER / "embedding_cache"
+
+# Chunking: FAQ sections are parents, overlapping passages are indexed
+CHUNK_SIZE = 800  # characters
+CHUNK_OVERLAP = 100
+
+# Hybrid retrieval (BM25 + dense, reciprocal rank fusion)
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+LEXICAL_FAST_PATH_MARGIN = 1.5  # top BM25 score vs runner-up to skip the dense search
+
+# ANN index (see knowledge/ann.py); the flat index stays the editable source of truth
+ANN_INDEX_TYPE = "auto"  # auto | flat | ivf_flat | ivf_pq | hnsw
+ANN_FLAT_MAX = 20_000  # auto: exact search up to this many vectors
+ANN_HNSW_MAX = 1_000_000  # auto: HNSW up to this many, IVF-PQ beyond
+ANN_TRAIN_SAMPLE = 50_000  # vectors sampled to train IVF / PQ
+ANN_NPROBE = 16
+ANN_EF_SEARCH = 64
+ANN_RETRAIN_GROWTH = 0.5  # retrain IVF/PQ once the corpus grew or shrank by this share since training
+ANN_DRIFT_TOLERANCE = 0.25  # ...or once added vectors sit this much farther from their centroids
+ANN_DRIFT_MIN_VECTORS = 32  # added vectors needed before drift is judged
+
+# Semantic answer cache (see knowledge/answer_cache.py)
+ANSWER_CACHE_PATH = KB_FOLDER / "answer_cache.sqlite"
+ANSWER_CACHE_THRESHOLD = 0.92  # cosine similarity needed to reuse an answer
+ANSWER_CACHE_TTL_SECONDS = 7 * 24 * 3600
+ANSWER_CACHE_CANDIDATES = 5  # nearest entries checked per lookup (expired/stale ones are skipped)
+ANSWER_CACHE_PURGE_INTERVAL_SECONDS = 3600  # how often expired entries are deleted
+
+# Shared retrieval service (see knowledge/service.py)
+RETRIEVAL_SOCKET_PATH = Path("/tmp/kb_retrieval.sock")
+RETRIEVAL_MAX_BATCH = 64  # queries per embed + search call
+RETRIEVAL_MAX_WAIT_MS = 2.0  # how long the first query waits for others to join its batch
+RETRIEVAL_MAX_K = 50  # largest k a request may ask for
+RETRIEVAL_MAX_QUERIES = 1024  # queries per request
+RETRIEVAL_REQUEST_TIMEOUT_SECONDS = 30.0  # server-side wait for one request's results
+
+# Context assembly for the responder prompt (see knowledge/context.py)
+CONTEXT_TOKEN_BUDGET = 1500
+CONTEXT_MMR_LAMBDA = 0.7  # 1.0 = relevance only, 0.0 = diversity only
+CONTEXT_DUPLICATE_THRESHOLD = 0.85  # similarity at which a passage counts as a near-duplicate
+CONTEXT_PAST_TICKET_WEIGHT = 0.8  # relevance multiplier for past tickets vs KB passages
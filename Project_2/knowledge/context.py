@@ -0,0 +1,211 @@
+# context.py
+
+"""
+Token-budgeted, de-duplicated context for the responder prompt.
+
+KB passages and similar past tickets often repeat each other (overlapping
+FAQ chunks, tickets that quote the FAQ). The assembler merges both result
+lists and packs them greedily with Maximal Marginal Relevance:
+
+    pick argmax  lambda * relevance - (1 - lambda) * max_similarity_to_picked
+
+A candidate whose similarity to an already picked passage reaches the
+duplicate threshold is dropped outright. A candidate that does not fit
+the remaining token budget is skipped, and smaller ones may still fill the
+gap. Every dropped passage is recorded with the reason, so a prompt's
+content can be explained after the fact.
+
+Similarity is term-frequency cosine over knowledge.lexical.tokenize by
+default (no model call). With `embeddings` it uses embedding cosine
+instead; the embedding cache makes repeated snippets free.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from knowledge.config import (
+    CONTEXT_DUPLICATE_THRESHOLD,
+    CONTEXT_MMR_LAMBDA,
+    CONTEXT_PAST_TICKET_WEIGHT,
+    CONTEXT_TOKEN_BUDGET,
+)
+from knowledge.lexical import result_relevance, tokenize
+from knowledge.tokens import count_tokens, truncate_to_tokens
+from logger import logger
+
+DROP_DUPLICATE = "duplicate"
+DROP_OVER_BUDGET = "over_budget"
+DROP_MAX_PASSAGES = "max_passages"
+
+
+@dataclass
+class AssembledContext:
+    """Passages chosen for the prompt, and what was left out."""
+
+    passages: List[dict] = field(default_factory=list)
+    dropped: List[dict] = field(default_factory=list)
+    tokens_used: int = 0
+    tokens_candidates: int = 0
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_candidates - self.tokens_used
+
+    def as_text(self) -> str:
+        """Prompt block: one numbered passage per result, labelled with its source."""
+        blocks = []
+        for i, p in enumerate(self.passages, start=1):
+            label = p.get("title") or p.get("source") or "passage"
+            blocks.append(f"[{i}] ({p.get('category', 'KB')}) {label}\n{p['snippet']}")
+        return "\n\n".join(blocks)
+
+    def summary(self) -> dict:
+        reasons = Counter(d["reason"] for d in self.dropped)
+        return {
+            "passages": len(self.passages),
+            "dropped": dict(reasons),
+            "tokens_used": self.tokens_used,
+            "tokens_saved": self.tokens_saved,
+            "token_budget": self.token_budget,
+        }
+
+
+# -------------------------
+# Similarity
+# -------------------------
+def lexical_similarity(texts: Sequence[str]) -> np.ndarray:
+    """Pairwise term-frequency cosine similarity."""
+    counts = [Counter(tokenize(t)) for t in texts]
+    vocab = {term: i for i, term in enumerate(sorted(set().union(*counts)))} if counts else {}
+    matrix = np.zeros((len(texts), max(len(vocab), 1)), dtype=np.float32)
+    for row, c in enumerate(counts):
+        for term, n in c.items():
+            matrix[row, vocab[term]] = n
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    return matrix @ matrix.T
+
+
+def embedding_similarity(texts: Sequence[str], embeddings) -> np.ndarray:
+    """Pairwise embedding cosine similarity (one batched, cache-aware embed call)."""
+    if hasattr(embeddings, "embed_documents_array"):
+        vectors = embeddings.embed_documents_array(list(texts))
+    else:
+        vectors = np.asarray(embeddings.embed_documents(list(texts)), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    return vectors @ vectors.T
+
+
+# -------------------------
+# Relevance
+# -------------------------
+def _relevance(results: Sequence[dict]) -> np.ndarray:
+    """
+    Relevance in 0..1 within one result list: result_relevance (which
+    turns L2 distances, BM25 and RRF scores into similarities) relative
+    to the best one, else by rank when results carry no score.
+    """
+    scores = np.array([result_relevance(r) for r in results], dtype=np.float32)
+    if scores.size and scores.max() > 0:
+        return scores / scores.max()
+    return 1.0 / (1.0 + np.arange(len(results), dtype=np.float32))
+
+
+def _describe(result: dict) -> dict:
+    return {k: result.get(k) for k in ("source", "category", "title", "parent_id", "ticket_id") if result.get(k) is not None}
+
+
+# -------------------------
+# Assembly
+# -------------------------
+def assemble_context(
+    kb_results: Sequence[dict],
+    past_tickets: Sequence[dict] = (),
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+    duplicate_threshold: float = CONTEXT_DUPLICATE_THRESHOLD,
+    past_ticket_weight: float = CONTEXT_PAST_TICKET_WEIGHT,
+    max_passages: Optional[int] = None,
+    embeddings=None,
+) -> AssembledContext:
+    """
+    Pick the passages for the responder prompt.
+
+    Args:
+        kb_results: retrieve_from_kb / retrieve_hybrid / retrieve_many results.
+        past_tickets: TicketMemory.search results.
+        token_budget (int): Max total tokens across chosen snippets.
+        mmr_lambda (float): Relevance vs diversity trade-off.
+        duplicate_threshold (float): Similarity at which a candidate is dropped.
+        past_ticket_weight (float): Relevance multiplier for past tickets.
+        max_passages (int): Optional cap on the number of passages.
+        embeddings: Use embedding similarity instead of lexical.
+
+    Returns:
+        AssembledContext: Chosen passages in pick order, plus dropped ones
+        with 'reason' (and 'similar_to' for duplicates).
+    """
+    candidates = [r for r in [*kb_results, *past_tickets] if r.get("snippet")]
+    context = AssembledContext(token_budget=token_budget)
+    if not candidates:
+        return context
+
+    relevance = np.concatenate([
+        _relevance([r for r in kb_results if r.get("snippet")]),
+        _relevance([r for r in past_tickets if r.get("snippet")]) * past_ticket_weight,
+    ])
+    snippets = [r["snippet"] for r in candidates]
+    tokens = [count_tokens(s) for s in snippets]
+    similarity = embedding_similarity(snippets, embeddings) if embeddings is not None else lexical_similarity(snippets)
+    context.tokens_candidates = sum(tokens)
+
+    remaining = list(range(len(candidates)))
+    picked: List[int] = []
+    max_sim = np.zeros(len(candidates), dtype=np.float32)
+
+    while remaining:
+        mmr = [mmr_lambda * relevance[i] - (1 - mmr_lambda) * max_sim[i] for i in remaining]
+        i = remaining.pop(int(np.argmax(mmr)))
+        result = candidates[i]
+
+        if picked and max_sim[i] >= duplicate_threshold:
+            twin = picked[int(np.argmax(similarity[i, picked]))]
+            context.dropped.append({
+                **_describe(result), "reason": DROP_DUPLICATE, "tokens": tokens[i],
+                "similarity": round(float(max_sim[i]), 3), "similar_to": _describe(candidates[twin]),
+            })
+            continue
+        if max_passages is not None and len(picked) >= max_passages:
+            context.dropped.append({**_describe(result), "reason": DROP_MAX_PASSAGES, "tokens": tokens[i]})
+            continue
+
+        room = token_budget - context.tokens_used
+        if tokens[i] > room:
+            if picked:
+                context.dropped.append({**_describe(result), "reason": DROP_OVER_BUDGET, "tokens": tokens[i]})
+                continue
+            # Best passage alone is too long: truncate rather than send nothing
+            result = {**result, "snippet": truncate_to_tokens(result["snippet"], room), "truncated": True}
+            tokens[i] = count_tokens(result["snippet"])
+
+        context.passages.append(result)
+        context.tokens_used += tokens[i]
+        picked.append(i)
+        max_sim = np.maximum(max_sim, similarity[i])
+
+    if context.dropped:
+        logger.info("Context assembled | %s", context.summary())
+    return context
+
+
+def assemble_for_state(state, past_tickets: Sequence[dict] = (), **kwargs) -> AssembledContext:
+    """assemble_context over a SupportTicketState's retrieved_from_kb (KB and PAST_TICKET entries)."""
+    results = [r for r in state.retrieved_from_kb if isinstance(r, dict)]
+    kb_results = [r for r in results if r.get("category") != "PAST_TICKET"]
+    past = list(past_tickets) or [r for r in results if r.get("category") == "PAST_TICKET"]
+    return assemble_context(kb_results, past, **kwargs)
@@ -0,0 +1,454 @@
+# docstore.py
+
+"""
+Pickle-free vectorstore persistence.
+
+On-disk layout (one directory):
+    index.faiss      raw FAISS index, written with faiss.write_index and
+                     memory-mapped on load (faiss.IO_FLAG_MMAP)
+    docstore.sqlite  documents(id, page_content, metadata)
+                     index_map(position, doc_id)
+                     parents(id, page_content, metadata)   not embedded;
+                     expanded from a chunk's `parent_id` on request
+                     lex_*  BM25 inverted index (see knowledge.lexical)
+
+Documents and the FAISS-position -> doc-id map are fetched lazily by ID
+from SQLite, so cold start time and resident memory stay flat as the
+KB grows. Nothing is unpickled.
+
+Builds never modify a live store directory. The store path is a
+symlink to a versioned directory (kb_index -> kb_index.v<ns>); a build
+holds build_lock(), writes a private staging directory (staging_path)
+and publish_vectorstore() renames it to a new version and swaps the
+symlink atomically. Incremental builds hard-link the files that are only
+ever replaced (FAISS indexes) and reflink-or-copy only the SQLite file.
+A process still searching the previous version (see knowledge.hot_reload)
+keeps a consistent index + docstore pair: loads resolve the symlink once,
+and the previous KEEP_VERSIONS - 1 versions stay on disk.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import faiss
+from langchain_classic.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+
+from knowledge.ann import ANN_INDEX_FILE, ANN_META_FILE
+from knowledge.filelock import file_lock
+from knowledge.lexical import LEXICAL_SCHEMA, LexicalIndex
+from logger import logger
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+
+# Only ever replaced by rename (never edited in place), so staging can hard-link them
+REPLACED_FILES = (INDEX_FILE, ANN_INDEX_FILE, ANN_META_FILE)
+KEEP_VERSIONS = 2  # published versions kept on disk: the live one and the previous one
+_FICLONE = 0x40049409  # Linux ioctl: copy-on-write clone (btrfs, XFS)
+
+_build_locks = threading.local()  # store paths whose build lock this thread holds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    page_content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS index_map (
+    position INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parents (
+    id TEXT PRIMARY KEY,
+    page_content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+""" + LEXICAL_SCHEMA
+
+
+class _SQLiteConnection:
+    """One shared, lock-guarded SQLite connection per database file."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        self.lock = threading.RLock()
+
+    def commit(self) -> None:
+        with self.lock:
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    LangChain docstore backed by SQLite. Documents are loaded on demand.
+
+    Writes are not committed until `commit()` (called by save_vectorstore
+    just before the new index replaces the old one), so a crashed update
+    never leaves the index pointing at uncommitted documents.
+    The BM25 index (`self.lexical`) is updated in the same transaction.
+    """
+
+    def __init__(self, connection: _SQLiteConnection):
+        self._db = connection
+        self.lexical = LexicalIndex(connection)
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._db.lock:
+            row = self._db.conn.execute(
+                "SELECT page_content, metadata FROM documents WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def mget(self, ids: List[str]) -> Dict[str, Document]:
+        """Fetch many documents in one query."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._db.lock:
+            rows = self._db.conn.execute(
+                f"SELECT id, page_content, metadata FROM documents WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {row[0]: Document(id=row[0], page_content=row[1], metadata=json.loads(row[2])) for row in rows}
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [(id_, doc.page_content, json.dumps(doc.metadata)) for id_, doc in texts.items()]
+        with self._db.lock:
+            try:
+                self._db.conn.executemany(
+                    "INSERT INTO documents (id, page_content, metadata) VALUES (?, ?, ?)", rows
+                )
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Tried to add ids that already exist: {e}")
+            self.lexical.add(texts)
+
+    def delete(self, ids: List) -> None:
+        with self._db.lock:
+            self._db.conn.executemany("DELETE FROM documents WHERE id = ?", [(id_,) for id_ in ids])
+            self.lexical.delete(list(ids))
+
+    def __len__(self) -> int:
+        with self._db.lock:
+            return self._db.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    # -------------------------
+    # Parent documents
+    # -------------------------
+    def add_parents(self, parents: Dict[str, Document]) -> None:
+        """Store (or replace) parent documents. Parent IDs are content-addressed."""
+        rows = [(id_, doc.page_content, json.dumps(doc.metadata)) for id_, doc in parents.items()]
+        with self._db.lock:
+            self._db.conn.executemany(
+                "INSERT OR REPLACE INTO parents (id, page_content, metadata) VALUES (?, ?, ?)", rows
+            )
+
+    def delete_parents(self, ids: List[str]) -> None:
+        with self._db.lock:
+            self._db.conn.executemany("DELETE FROM parents WHERE id = ?", [(id_,) for id_ in ids])
+
+    def get_parents(self, ids: List[str]) -> Dict[str, Document]:
+        """Fetch parent documents by ID (missing IDs are omitted)."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._db.lock:
+            rows = self._db.conn.execute(
+                f"SELECT id, page_content, metadata FROM parents WHERE id IN ({placeholders})", list(ids)
+            ).fetchall()
+        return {row[0]: Document(page_content=row[1], metadata=json.loads(row[2])) for row in rows}
+
+    def commit(self) -> None:
+        self._db.commit()
+
+
+class SQLiteIndexMap(MutableMapping):
+    """FAISS position -> document id mapping read lazily from SQLite."""
+
+    def __init__(self, connection: _SQLiteConnection):
+        self._db = connection
+
+    def __getitem__(self, position: int) -> str:
+        with self._db.lock:
+            row = self._db.conn.execute(
+                "SELECT doc_id FROM index_map WHERE position = ?", (int(position),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __setitem__(self, position: int, doc_id: str) -> None:
+        with self._db.lock:
+            self._db.conn.execute(
+                "INSERT OR REPLACE INTO index_map (position, doc_id) VALUES (?, ?)", (int(position), doc_id)
+            )
+
+    def __delitem__(self, position: int) -> None:
+        with self._db.lock:
+            self._db.conn.execute("DELETE FROM index_map WHERE position = ?", (int(position),))
+
+    def __iter__(self) -> Iterator[int]:
+        with self._db.lock:
+            positions = [row[0] for row in self._db.conn.execute("SELECT position FROM index_map ORDER BY position")]
+        return iter(positions)
+
+    def __len__(self) -> int:
+        with self._db.lock:
+            return self._db.conn.execute("SELECT COUNT(*) FROM index_map").fetchone()[0]
+
+    def items(self):
+        with self._db.lock:
+            return list(self._db.conn.execute("SELECT position, doc_id FROM index_map ORDER BY position"))
+
+    def values(self):
+        return [doc_id for _, doc_id in self.items()]
+
+    def update(self, other=(), **kwargs) -> None:
+        pairs = other.items() if hasattr(other, "items") else other
+        with self._db.lock:
+            self._db.conn.executemany(
+                "INSERT OR REPLACE INTO index_map (position, doc_id) VALUES (?, ?)",
+                [(int(position), doc_id) for position, doc_id in pairs],
+            )
+
+    def mget(self, positions: List[int]) -> Dict[int, str]:
+        """Resolve many positions in one query."""
+        if not positions:
+            return {}
+        placeholders = ",".join("?" * len(positions))
+        with self._db.lock:
+            rows = self._db.conn.execute(
+                f"SELECT position, doc_id FROM index_map WHERE position IN ({placeholders})",
+                [int(p) for p in positions],
+            ).fetchall()
+        return dict(rows)
+
+
+# -------------------------
+# Save / load
+# -------------------------
+def is_saved_vectorstore(path: Path) -> bool:
+    """True if path holds a vectorstore in this format."""
+    path = Path(path)
+    return (path / INDEX_FILE).exists() and (path / DOCSTORE_FILE).exists()
+
+
+def resolve_store(path: Path) -> Path:
+    """The version directory a published store path currently points to."""
+    return Path(os.path.realpath(path))
+
+
+@contextmanager
+def build_lock(path: Path, blocking: bool = True):
+    """
+    Hold the build lock of the store at `path` (one build at a time, across processes).
+
+    Re-entrant within a thread. Staging directories left behind by
+    crashed builds are removed once the lock is held.
+
+    Raises:
+        BlockingIOError: With blocking=False, if another build is running.
+    """
+    path = Path(path).absolute()
+    held = _build_locks.__dict__.setdefault("held", set())
+    if path in held:
+        yield
+        return
+    with file_lock(path.with_name(f".{path.name}.build.lock"), blocking=blocking):
+        held.add(path)
+        try:
+            for leftover in path.parent.glob(f".{path.name}.staging-*"):
+                shutil.rmtree(leftover, ignore_errors=True)
+            yield
+        finally:
+            held.discard(path)
+
+
+def _clone_file(source: Path, target: Path) -> None:
+    """Copy-on-write clone where the filesystem supports it, else a plain copy."""
+    try:
+        import fcntl
+
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        shutil.copystat(source, target)
+    except (ImportError, OSError):
+        shutil.copy2(source, target)
+
+
+def staging_path(path: Path, copy_current: bool = False) -> Path:
+    """
+    Fresh, uniquely named staging directory for a new version of the store at `path`.
+
+    Call under build_lock(path).
+
+    Args:
+        copy_current (bool): Start from the live store (for incremental
+            updates): files in REPLACED_FILES are hard-linked, the SQLite
+            docstore is cloned; otherwise start empty.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{path.name}.staging-", dir=path.parent))
+    if copy_current and is_saved_vectorstore(path):
+        for source in resolve_store(path).iterdir():
+            if not source.is_file():
+                continue
+            target = staging / source.name
+            if source.name in REPLACED_FILES:
+                try:
+                    os.link(source, target)
+                    continue
+                except OSError:
+                    pass
+            _clone_file(source, target)
+    return staging
+
+
+def publish_vectorstore(staging: Path, path: Path) -> None:
+    """
+    Make a fully written staging directory the live version of the store.
+
+    The staging directory becomes `<name>.v<ns>` and the `path` symlink is
+    replaced atomically. Versions older than the last KEEP_VERSIONS are
+    deleted (open file handles keep working on POSIX).
+    """
+    path = Path(path)
+    version = path.with_name(f"{path.name}.v{time.time_ns()}")
+    os.replace(staging, version)
+
+    if path.exists() and not path.is_symlink():
+        # Store from before versioned publishing: move it aside once
+        os.replace(path, path.with_name(f"{path.name}.v0"))
+
+    link = path.with_name(f".{path.name}.link-{os.getpid()}")
+    link.unlink(missing_ok=True)
+    os.symlink(version.name, link)
+    os.replace(link, path)
+    logger.info("Vectorstore published to %s -> %s", path, version.name)
+
+    versions = sorted(
+        (p for p in path.parent.glob(f"{path.name}.v*") if p.is_dir() and p.name[len(path.name) + 2:].isdigit()),
+        key=lambda p: int(p.name[len(path.name) + 2:]),
+    )
+    for old in versions[:-KEEP_VERSIONS]:
+        if old != version:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def close_vectorstore(vectorstore: FAISS) -> None:
+    """Close the SQLite connection behind a loaded store."""
+    docstore = vectorstore.docstore
+    if isinstance(docstore, SQLiteDocstore):
+        docstore._db.close()
+
+
+def save_vectorstore(vectorstore: FAISS, path: Path, parents: Optional[Dict[str, Document]] = None) -> None:
+    """
+    Persist a FAISS vectorstore without pickle.
+
+    Documents are copied into SQLite only when they are not already
+    there (i.e. the store was not loaded from this directory).
+
+    Args:
+        vectorstore (FAISS): Store to save.
+        path (Path): Target directory.
+        parents (dict): Optional parent documents to store alongside.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    db_path = path / DOCSTORE_FILE
+
+    docstore = vectorstore.docstore
+    if isinstance(docstore, SQLiteDocstore) and docstore._db.db_path.resolve() == db_path.resolve():
+        db = docstore._db
+    else:
+        db = _SQLiteConnection(db_path)
+        target = SQLiteDocstore(db)
+        with db.lock:
+            db.conn.execute("DELETE FROM documents")
+            db.conn.execute("DELETE FROM lex_postings")
+            db.conn.execute("DELETE FROM lex_docs")
+            db.conn.execute("DELETE FROM lex_stats")
+        ids = list(vectorstore.index_to_docstore_id.values())
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            if isinstance(docstore, SQLiteDocstore):
+                target.add(docstore.mget(batch))
+            else:
+                target.add({id_: docstore.search(id_) for id_ in batch})
+
+    mapping = vectorstore.index_to_docstore_id
+    if not (isinstance(mapping, SQLiteIndexMap) and mapping._db is db):
+        with db.lock:
+            db.conn.execute("DELETE FROM index_map")
+            db.conn.executemany(
+                "INSERT INTO index_map (position, doc_id) VALUES (?, ?)",
+                [(int(position), doc_id) for position, doc_id in mapping.items()],
+            )
+
+    if parents:
+        SQLiteDocstore(db).add_parents(parents)
+
+    # Commit the docstore before the index goes live: an index whose
+    # positions have no index_map rows yet breaks every search, while
+    # committed rows the old index never returns are harmless. Stores are
+    # built in a staging directory anyway (staging_path / publish_vectorstore).
+    tmp_index = path / (INDEX_FILE + ".tmp")
+    faiss.write_index(vectorstore.index, str(tmp_index))
+    db.commit()
+    os.replace(tmp_index, path / INDEX_FILE)
+
+    logger.info("Vectorstore saved to %s | vectors=%d", path, vectorstore.index.ntotal)
+
+
+def load_vectorstore(path: Path, embeddings, mmap: bool = True) -> FAISS:
+    """
+    Load a vectorstore saved by save_vectorstore.
+
+    Args:
+        path (Path): Directory written by save_vectorstore.
+        embeddings: Embedding model for query encoding.
+        mmap (bool): Memory-map the FAISS index instead of reading it into
+            RAM. Use False when the index will be modified (incremental
+            updates), since memory-mapped indexes are read-only.
+
+    Returns:
+        FAISS: Vectorstore with a lazily loaded SQLite docstore.
+    """
+    # Resolve once, so the index and docstore come from the same version
+    path = resolve_store(path)
+    if not is_saved_vectorstore(path):
+        raise FileNotFoundError(f"No saved vectorstore at {path}")
+
+    io_flags = faiss.IO_FLAG_MMAP if mmap else 0
+    index = faiss.read_index(str(path / INDEX_FILE), io_flags)
+
+    db = _SQLiteConnection(path / DOCSTORE_FILE)
+    docstore = SQLiteDocstore(db)
+    docstore.lexical.ensure_built()
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=SQLiteIndexMap(db),
+    )
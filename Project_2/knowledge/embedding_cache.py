@@ -0,0 +1,280 @@
+# embedding_cache.py
+
+"""
+Content-addressed, persistent embedding cache.
+
+Wraps any LangChain `Embeddings` model:
+- document vectors live in a memory-mapped float32 matrix on disk (`vectors.f32`)
+- row i belongs to the i-th hash in `keys.txt` (hash -> row index)
+- query vectors are kept in an in-memory LRU only: free-text queries
+  are unbounded, unlike document chunks, which the corpus bounds
+
+Re-indexing unchanged text and repeating recent queries never runs the
+transformer forward pass again. Keys are sha256(kind + text), so the
+same text embedded as a document and as a query are cached separately.
+
+Several processes may share a cache directory: appends happen under a
+file lock (knowledge.filelock), and each writer first picks up the rows
+other processes appended, so no key is stored twice and the two files
+stay row-aligned.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from knowledge.filelock import file_lock
+from logger import logger
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper backed by a disk cache and a query LRU.
+
+    Args:
+        base (Embeddings): The real embedding model; None for a cache that
+            only serves lookup() and store().
+        cache_dir (Path): Directory holding vectors.f32 / keys.txt / meta.json.
+        model_name (str): Model identifier; a cache built for another model is rejected.
+        query_cache_size (int): Entries kept in the in-memory query LRU.
+        query_prefix (str): How the model embeds queries, so query misses
+            can be embedded in one batch: the text it prepends to a query
+            before embedding it as a document ("" when embed_query is plain
+            embed_documents, as for sentence-transformers). None (unknown)
+            embeds each query with embed_query.
+    """
+
+    def __init__(
+        self,
+        base: Optional[Embeddings],
+        cache_dir: Path,
+        model_name: str,
+        query_cache_size: int = 4096,
+        query_prefix: Optional[str] = None,
+    ):
+        self.base = base
+        self.cache_dir = Path(cache_dir)
+        self.model_name = model_name
+        self.query_cache_size = query_cache_size
+        self.query_prefix = query_prefix
+
+        self._lock = threading.RLock()
+        self._vectors_path = self.cache_dir / "vectors.f32"
+        self._keys_path = self.cache_dir / "keys.txt"
+        self._meta_path = self.cache_dir / "meta.json"
+
+        self._lock_path = self.cache_dir / ".lock"
+
+        self._dim: Optional[int] = None
+        self._rows: dict = {}
+        self._count = 0  # rows on disk this instance has synced
+        self._keys_offset = 0  # bytes of keys.txt this instance has synced
+        self._mmap: Optional[np.memmap] = None
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._open()
+
+    # -------------------------
+    # Storage
+    # -------------------------
+    def _open(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with file_lock(self._lock_path):
+            self._sync()
+        if self._dim is not None:
+            logger.info("Embedding cache opened | dir=%s rows=%d dim=%d", self.cache_dir, self._count, self._dim)
+
+    def _sync(self) -> None:
+        """
+        Pick up rows appended since the last sync (by this or another process).
+
+        Caller holds the file lock. A crash between the two appends leaves
+        one file longer than the other (or a half-written last row); both
+        files are truncated back to the rows they have in common, so the
+        next append starts aligned.
+        """
+        if self._dim is None:
+            if not self._meta_path.exists():
+                return
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            if meta.get("model") != self.model_name:
+                raise ValueError(
+                    f"Embedding cache at {self.cache_dir} was built for {meta.get('model')}, not {self.model_name}"
+                )
+            self._dim = int(meta["dim"])
+
+        row_bytes = 4 * self._dim
+        keys, ends = [], []
+        if self._keys_path.exists():
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._keys_offset)
+                offset = self._keys_offset
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn last key
+                    offset += len(line)
+                    keys.append(line.decode("utf-8").strip())
+                    ends.append(offset)
+
+        vector_bytes = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        usable = max(0, min(len(keys), vector_bytes // row_bytes - self._count))
+        keys_end = ends[usable - 1] if usable > 0 else self._keys_offset
+        rows = self._count + usable
+
+        if self._keys_path.exists() and self._keys_path.stat().st_size != keys_end:
+            os.truncate(self._keys_path, keys_end)
+        if vector_bytes != rows * row_bytes:
+            os.truncate(self._vectors_path, rows * row_bytes)
+            logger.warning("Embedding cache repaired | dir=%s rows=%d", self.cache_dir, rows)
+
+        for offset, key in enumerate(keys[:usable]):
+            self._rows[key] = self._count + offset
+        self._count = rows
+        self._keys_offset = keys_end
+
+    def _matrix(self) -> np.ndarray:
+        """Memory-mapped view over every stored row (remapped when the file grows)."""
+        if self._mmap is None or self._mmap.shape[0] < self._count:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._count, self._dim))
+        return self._mmap
+
+    def _append(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Append new rows under the file lock, skipping keys another process stored first."""
+        with file_lock(self._lock_path):
+            self._sync()
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                self._meta_path.write_text(json.dumps({"model": self.model_name, "dim": self._dim}), encoding="utf-8")
+
+            fresh = [i for i, key in enumerate(keys) if key not in self._rows]
+            if not fresh:
+                return
+            keys = [keys[i] for i in fresh]
+            data = "".join(f"{key}\n" for key in keys).encode("utf-8")
+
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors[fresh], dtype=np.float32).tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write(data)
+
+            for offset, key in enumerate(keys):
+                self._rows[key] = self._count + offset
+            self._count += len(keys)
+            self._keys_offset += len(data)
+
+    def _embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed query texts, in one forward pass when the query form is known."""
+        if self.query_prefix is None:
+            return [self.base.embed_query(text) for text in texts]
+        return self.base.embed_documents([self.query_prefix + text for text in texts])
+
+    @staticmethod
+    def _key(kind: str, text: str) -> str:
+        return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return self._count
+
+    # -------------------------
+    # Embeddings API
+    # -------------------------
+    def embed_documents_array(self, texts: List[str], kind: str = "doc") -> np.ndarray:
+        """
+        Embed texts, computing only the ones not cached yet (in one batch).
+
+        Queries (kind="query") are looked up in and added to the LRU only.
+
+        Returns:
+            np.ndarray: float32 matrix of shape (len(texts), dim).
+        """
+        if not texts:
+            return np.zeros((0, self._dim or 0), dtype=np.float32)
+        if kind == "query":
+            return self._query_array(texts)
+
+        keys = [self._key(kind, text) for text in texts]
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self._rows and key not in missing:
+                    missing[key] = text
+
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+            if missing:
+                computed = self.base.embed_documents(list(missing.values()))
+                self._append(list(missing), np.asarray(computed, dtype=np.float32))
+
+            matrix = self._matrix()
+            return np.array(matrix[[self._rows[key] for key in keys]], dtype=np.float32)
+
+    def _query_array(self, texts: List[str]) -> np.ndarray:
+        keys = [self._key("query", text) for text in texts]
+        with self._lock:
+            found = {}
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+            missing = {key: text for key, text in zip(keys, texts) if key not in found}
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            computed = np.asarray(self._embed_queries(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(missing, computed):
+                    found[key] = self._lru[key] = vector
+                while len(self._lru) > self.query_cache_size:
+                    self._lru.popitem(last=False)
+        return np.array([found[key] for key in keys], dtype=np.float32)
+
+    def lookup(self, texts: List[str], kind: str = "doc") -> List[Optional[np.ndarray]]:
+        """Cached vectors for texts (None where not cached). Never calls the model."""
+        keys = [self._key(kind, text) for text in texts]
+        with self._lock:
+            if not self._rows:
+                return [None] * len(texts)
+            matrix = self._matrix()
+            found = [np.array(matrix[self._rows[key]]) if key in self._rows else None for key in keys]
+            hits = sum(vector is not None for vector in found)
+            self.hits += hits
+            self.misses += len(texts) - hits
+            return found
+
+    def store(self, texts: List[str], vectors: np.ndarray, kind: str = "doc") -> None:
+        """Add vectors computed elsewhere (e.g. by worker processes)."""
+        keys = [self._key(kind, text) for text in texts]
+        with self._lock:
+            fresh = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows and key not in fresh:
+                    fresh[key] = vector
+            if fresh:
+                self._append(list(fresh), np.asarray(list(fresh.values()), dtype=np.float32))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_array(texts, kind="doc").tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._query_array([text])[0].tolist()
+
+    def stats(self) -> dict:
+        return {
+            "rows": self._count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "query_lru": len(self._lru),
+        }
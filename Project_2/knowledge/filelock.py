@@ -0,0 +1,40 @@
+# filelock.py
+
+"""
+Advisory inter-process lock on a file (fcntl.flock).
+
+Used where several processes share one directory on disk: the embedding
+cache (every worker appends to it) and the index builder (one build per
+store at a time). Without fcntl (Windows) the lock is a no-op and a single
+writer process per directory is assumed.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: Path, blocking: bool = True):
+    """
+    Hold an exclusive lock on `path` (created if missing) for the block.
+
+    Args:
+        path (Path): Lock file.
+        blocking (bool): Wait for the lock; otherwise raise BlockingIOError
+            at once if another process holds it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
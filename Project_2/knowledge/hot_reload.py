@@ -0,0 +1,221 @@
+# hot_reload.py
+
+"""
+Zero-downtime reload of the KB vectorstore.
+
+IndexHolder keeps the live vectorstore version and reference-counts
+every search that uses it. A reload loads (and warms up) the new
+version in a background thread, then swaps it in atomically between
+searches. The previous version is closed once its last in-flight search
+finishes, so no request is dropped and none waits on index loading.
+
+Builds publish new versions by swapping the store symlink to a new
+version directory (see knowledge.docstore.publish_vectorstore); the
+holder detects them by polling the symlink target and index file
+identity, or an admin endpoint calls reload(). A version is loaded from
+its resolved directory, so a publish during a load cannot mix versions.
+
+Usage:
+    holder = IndexHolder().start_watching()
+    with holder.acquire() as vectorstore:
+        results = retrieve_from_kb(query, vectorstore)
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+
+from knowledge import load_saved_vectorstore, retrieve_from_kb
+from knowledge.ann import ANN_META_FILE
+from knowledge.config import VECTORSTORE_PATH, HF_MODEL_NAME, MANIFEST_PATH
+from knowledge.docstore import INDEX_FILE, close_vectorstore, resolve_store
+from knowledge.indexer import kb_version
+from logger import logger
+
+
+def store_fingerprint(vectorstore_path: Path) -> Optional[Tuple]:
+    """Identity of the published store (changes on every publish or ANN rebuild)."""
+    resolved = resolve_store(vectorstore_path)
+    try:
+        index_stat = os.stat(resolved / INDEX_FILE)
+    except FileNotFoundError:
+        return None
+    ann_path = resolved / ANN_META_FILE
+    ann_mtime = ann_path.stat().st_mtime_ns if ann_path.exists() else None
+    return str(resolved), index_stat.st_ino, index_stat.st_mtime_ns, ann_mtime
+
+
+@dataclass
+class _Version:
+    vectorstore: FAISS
+    fingerprint: Optional[Tuple]
+    kb_version: str
+    loaded_at: float
+    refs: int = 0
+    retired: bool = False
+
+
+class IndexHolder:
+    """
+    Double-buffered, reference-counted holder of the KB vectorstore.
+
+    Args:
+        vectorstore_path (Path): Published store directory.
+        hf_model_name (str): Embedding model.
+        manifest_path (Path): Manifest used to report the KB version.
+        loader: Callable(vectorstore_path, hf_model_name) -> FAISS.
+        warmup_query (str): Searched once on a new version before it goes live.
+    """
+
+    def __init__(
+        self,
+        vectorstore_path: Path = VECTORSTORE_PATH,
+        hf_model_name: str = HF_MODEL_NAME,
+        manifest_path: Path = MANIFEST_PATH,
+        loader: Callable[[Path, str], FAISS] = load_saved_vectorstore,
+        warmup_query: str = "warmup",
+    ):
+        self.vectorstore_path = Path(vectorstore_path)
+        self.hf_model_name = hf_model_name
+        self.manifest_path = Path(manifest_path)
+        self.loader = loader
+        self.warmup_query = warmup_query
+
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._current: _Version = self._load()
+        self._reloads = 0
+        self._last_error: Optional[str] = None
+
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    # -------------------------
+    # Loading
+    # -------------------------
+    def _load(self) -> _Version:
+        # Pin one published version: the symlink may be swapped while we load
+        resolved = resolve_store(self.vectorstore_path)
+        fingerprint = store_fingerprint(resolved)
+        vectorstore = self.loader(resolved, self.hf_model_name)
+        if self.warmup_query:
+            # Page in the index and docstore before serving traffic
+            vectorstore.similarity_search(self.warmup_query, k=1)
+        return _Version(
+            vectorstore=vectorstore,
+            fingerprint=fingerprint,
+            kb_version=kb_version(self.manifest_path),
+            loaded_at=time.time(),
+        )
+
+    def _release(self, version: _Version) -> None:
+        close_vectorstore(version.vectorstore)
+        logger.info("KB version %s released", version.kb_version)
+
+    # -------------------------
+    # Readers
+    # -------------------------
+    @contextmanager
+    def acquire(self) -> Iterator[FAISS]:
+        """Pin the current version for the duration of one search."""
+        with self._lock:
+            version = self._current
+            version.refs += 1
+        try:
+            yield version.vectorstore
+        finally:
+            with self._lock:
+                version.refs -= 1
+                release = version.retired and version.refs == 0
+            if release:
+                self._release(version)
+
+    def retrieve(self, query_text: str, k: int = 3, **kwargs) -> list:
+        """retrieve_from_kb against the current version."""
+        with self.acquire() as vectorstore:
+            return retrieve_from_kb(query_text, vectorstore, k=k, **kwargs)
+
+    # -------------------------
+    # Reload
+    # -------------------------
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load the published store and swap it in.
+
+        Args:
+            force (bool): Reload even if the store fingerprint is unchanged.
+
+        Returns:
+            bool: True if a new version went live. On failure the current
+            version keeps serving and the error is kept for stats().
+        """
+        with self._reload_lock:
+            if not force and store_fingerprint(self.vectorstore_path) == self._current.fingerprint:
+                return False
+            started = time.perf_counter()
+            try:
+                new = self._load()
+            except Exception as e:
+                self._last_error = str(e)
+                logger.exception("KB reload failed; keeping version %s", self._current.kb_version)
+                return False
+
+            with self._lock:
+                old, self._current = self._current, new
+                old.retired = True
+                release = old.refs == 0
+                self._reloads += 1
+                self._last_error = None
+            if release:
+                self._release(old)
+
+        logger.info(
+            "KB version %s live (was %s) | load %.1fs",
+            new.kb_version, old.kb_version, time.perf_counter() - started,
+        )
+        return True
+
+    def reload_in_background(self, force: bool = False) -> threading.Thread:
+        """Start reload() in a daemon thread and return it."""
+        thread = threading.Thread(target=self.reload, kwargs={"force": force}, name="kb-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def start_watching(self, interval_seconds: float = 5.0) -> "IndexHolder":
+        """Poll for newly published versions and reload them."""
+        if self._watcher is not None:
+            return self
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval_seconds):
+                if store_fingerprint(self.vectorstore_path) not in (None, self._current.fingerprint):
+                    self.reload()
+
+        self._watcher = threading.Thread(target=watch, name="kb-watcher", daemon=True)
+        self._watcher.start()
+        return self
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kb_version": self._current.kb_version,
+                "vectors": self._current.vectorstore.index.ntotal,
+                "loaded_at": self._current.loaded_at,
+                "in_flight": self._current.refs,
+                "reloads": self._reloads,
+                "last_error": self._last_error,
+                "watching": self._watcher is not None,
+            }
@@ -0,0 +1,249 @@
+# indexer.py
+
+"""
+Incremental KB indexing.
+
+Keeps a manifest of  file path -> content hash -> vector IDs (+ parent
+IDs)  next to the saved FAISS index. On refresh only added or changed
+files are embedded and vectors of changed/deleted files are removed.
+Refresh cost scales with the size of the change, not the size of the
+corpus.
+
+Updates run under the store's build lock on a staging copy of the store
+that is published with one symlink swap, so readers never see a
+half-applied update.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_community.vectorstores import FAISS
+
+from knowledge import chunk_file, get_embeddings, load_saved_vectorstore
+from knowledge.docstore import (
+    build_lock,
+    close_vectorstore,
+    is_saved_vectorstore,
+    publish_vectorstore,
+    save_vectorstore,
+    staging_path,
+)
+from knowledge.ann import refresh_ann_index, update_ann_index
+from knowledge.config import KB_FOLDER, VECTORSTORE_PATH, MANIFEST_PATH, HF_MODEL_NAME
+from logger import logger
+
+# 2: files are indexed as passage chunks with parent documents
+MANIFEST_VERSION = 2
+
+
+@dataclass
+class IndexUpdate:
+    """Summary of one incremental refresh."""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    vectors_added: int = 0
+    vectors_removed: int = 0
+
+    @property
+    def is_noop(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+
+# -------------------------
+# Manifest
+# -------------------------
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path: Path = MANIFEST_PATH) -> dict:
+    """Load the manifest, or an empty one if it does not exist yet."""
+    if not manifest_path.exists():
+        return {"version": MANIFEST_VERSION, "model": None, "files": {}}
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+
+def save_manifest(manifest: dict, manifest_path: Path = MANIFEST_PATH) -> None:
+    """Write the manifest atomically (tmp file + rename)."""
+    tmp_path = manifest_path.with_suffix(manifest_path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, manifest_path)
+
+
+def kb_version(manifest_path: Path = MANIFEST_PATH) -> str:
+    """
+    Short fingerprint of the indexed KB content.
+
+    Changes whenever any indexed file is added, edited or removed.
+    """
+    manifest = load_manifest(manifest_path)
+    fingerprint = json.dumps(
+        {path: entry["sha256"] for path, entry in manifest["files"].items()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+
+def vector_ids_for(rel_path: str, sha256: str, count: int) -> List[str]:
+    """Deterministic vector IDs for the documents produced from one file."""
+    return [f"{rel_path}#{sha256[:12]}#{i}" for i in range(count)]
+
+
+# -------------------------
+# Incremental update
+# -------------------------
+def update_vectorstore(
+    kb_folder: Path = KB_FOLDER,
+    vectorstore_path: Path = VECTORSTORE_PATH,
+    manifest_path: Path = MANIFEST_PATH,
+    hf_model_name: str = HF_MODEL_NAME,
+    blocking: bool = True,
+) -> IndexUpdate:
+    """
+    Bring the saved vectorstore in line with the .txt files in kb_folder.
+
+    Only added/changed files are embedded. Vectors of changed and deleted
+    files are removed. Falls back to a full build when there is no saved
+    index yet or the embedding model changed. Runs under the store's
+    build lock, so concurrent updates (other processes included) queue up.
+
+    Args:
+        kb_folder (Path): Folder containing FAQ text files.
+        vectorstore_path (Path): Saved FAISS vectorstore to update.
+        manifest_path (Path): Manifest of indexed files.
+        hf_model_name (str): HuggingFace embedding model name.
+        blocking (bool): Wait for a running build; otherwise fail at once.
+
+    Returns:
+        IndexUpdate: What was added, changed, removed.
+
+    Raises:
+        FileNotFoundError: If kb_folder does not exist.
+        ValueError: If no .txt files are found.
+        BlockingIOError: With blocking=False, if another build is running.
+    """
+    with build_lock(vectorstore_path, blocking=blocking):
+        return _update_vectorstore(kb_folder, vectorstore_path, manifest_path, hf_model_name)
+
+
+def _update_vectorstore(kb_folder: Path, vectorstore_path: Path, manifest_path: Path, hf_model_name: str) -> IndexUpdate:
+    if not kb_folder.exists():
+        raise FileNotFoundError(f"Folder does not exist: {kb_folder}")
+
+    current = {
+        path.relative_to(kb_folder).as_posix(): path
+        for path in sorted(kb_folder.glob("*.txt"))
+    }
+    if not current:
+        raise ValueError(f"No .txt files found in {kb_folder}")
+
+    manifest = load_manifest(manifest_path)
+    full_rebuild = (
+        not is_saved_vectorstore(vectorstore_path)
+        or manifest.get("model") != hf_model_name
+        or manifest.get("version") != MANIFEST_VERSION
+    )
+    if full_rebuild:
+        logger.info("KB index: full rebuild (no saved index or model changed)")
+        manifest = {"version": MANIFEST_VERSION, "model": hf_model_name, "files": {}}
+
+    indexed: Dict[str, dict] = manifest["files"]
+    update = IndexUpdate()
+
+    hashes = {rel: file_sha256(path) for rel, path in current.items()}
+    for rel, sha in hashes.items():
+        if rel not in indexed:
+            update.added.append(rel)
+        elif indexed[rel]["sha256"] != sha:
+            update.changed.append(rel)
+        else:
+            update.unchanged.append(rel)
+    update.removed = [rel for rel in indexed if rel not in current]
+
+    if update.is_noop and not full_rebuild:
+        logger.info("KB index up to date | files=%d", len(update.unchanged))
+        return update
+
+    stale_ids = [
+        vid
+        for rel in update.changed + update.removed
+        for vid in indexed[rel]["ids"]
+    ]
+
+    stale_parents = [
+        pid
+        for rel in update.changed + update.removed
+        for pid in indexed[rel].get("parent_ids", [])
+    ]
+
+    # -------------------------
+    # Embed only new content
+    # -------------------------
+    new_docs, new_ids, new_parents = [], [], {}
+    for rel in update.added + update.changed:
+        parents, docs = chunk_file(current[rel])
+        ids = vector_ids_for(rel, hashes[rel], len(docs))
+        new_docs.extend(docs)
+        new_ids.extend(ids)
+        new_parents.update({doc.metadata["id"]: doc for doc in parents})
+        indexed[rel] = {"sha256": hashes[rel], "ids": ids, "parent_ids": [doc.metadata["id"] for doc in parents]}
+
+    embeddings = get_embeddings(hf_model_name)
+    staging = staging_path(vectorstore_path, copy_current=not full_rebuild)
+    if full_rebuild:
+        vectorstore = FAISS.from_documents(new_docs, embeddings, ids=new_ids)
+    else:
+        vectorstore = load_saved_vectorstore(staging, hf_model_name, mmap=False)
+
+        # Tolerate a manifest that lags the index (crash between the two saves)
+        positions = {vid: position for position, vid in vectorstore.index_to_docstore_id.items()}
+        present = set(positions)
+        to_delete = [vid for vid in stale_ids + new_ids if vid in present]
+        removed_positions = [positions[vid] for vid in to_delete]
+        if to_delete:
+            vectorstore.delete(to_delete)
+        if new_docs:
+            vectorstore.add_documents(new_docs, ids=new_ids)
+        # Parent IDs are content-addressed: drop the old ones, (re)write the new ones
+        vectorstore.docstore.delete_parents([pid for pid in stale_parents if pid not in new_parents])
+        update.vectors_removed = len([vid for vid in stale_ids if vid in present])
+
+    update.vectors_added = len(new_ids)
+    for rel in update.removed:
+        indexed.pop(rel, None)
+
+    save_vectorstore(vectorstore, staging, parents=new_parents)
+    close_vectorstore(vectorstore)
+    if full_rebuild:
+        refresh_ann_index(staging)
+    else:
+        # Edit the ANN index like the flat one; it is retrained only past drift/size thresholds
+        update_ann_index(staging, removed_positions)
+    publish_vectorstore(staging, vectorstore_path)
+    save_manifest(manifest, manifest_path)
+
+    logger.info(
+        "KB index updated | added=%d changed=%d removed=%d unchanged=%d vectors +%d -%d",
+        len(update.added), len(update.changed), len(update.removed), len(update.unchanged),
+        update.vectors_added, update.vectors_removed,
+    )
+    return update
+
+
+if __name__ == "__main__":
+    result = update_vectorstore()
+    print(
+        f"Added: {result.added}\nChanged: {result.changed}\nRemoved: {result.removed}\n"
+        f"Unchanged: {len(result.unchanged)} files | vectors +{result.vectors_added} -{result.vectors_removed}"
+    )
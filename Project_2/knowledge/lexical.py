@@ -0,0 +1,289 @@
+# lexical.py
+
+"""
+Persistent BM25 inverted index and hybrid (lexical + dense) search.
+
+The index lives in the same SQLite file as the docstore:
+    lex_postings(term, doc_id, tf)   one row per (term, document)
+    lex_docs(doc_id, length)         document lengths for BM25
+    lex_stats(key, value)            running document / token totals
+
+SQLiteDocstore updates it on every add/delete, so full builds,
+streaming builds and incremental refreshes keep it in sync for free,
+inside the same transaction as the documents.
+
+Hybrid search fuses BM25 and FAISS rankings with reciprocal rank
+fusion. Queries with a strong exact match (every query term present in
+the best document, clear margin over the runner-up) take a lexical-only
+fast path and never embed the query.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_classic.schema import Document
+
+from knowledge.config import (
+    BM25_K1,
+    BM25_B,
+    RRF_K,
+    LEXICAL_FAST_PATH_MARGIN,
+)
+from logger import logger
+
+LEXICAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lex_postings (
+    term TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lex_postings_doc ON lex_postings (doc_id);
+CREATE TABLE IF NOT EXISTS lex_docs (
+    doc_id TEXT PRIMARY KEY,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lex_stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Keeps error codes, versions and dotted/hyphenated names whole ("0x80070005", "11.2", "sso-login")
+_TOKEN = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its my "
+    "no not of on or our so that the their there this to was we what when where which why will "
+    "with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms with stopwords removed."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 index over the docstore's documents.
+
+    Args:
+        connection: The docstore's _SQLiteConnection (shares its lock and
+            transaction; nothing here commits on its own except rebuild()).
+    """
+
+    def __init__(self, connection):
+        self._db = connection
+
+    # -------------------------
+    # Writes
+    # -------------------------
+    def add(self, documents: Dict[str, Document]) -> None:
+        postings, lengths, total = [], [], 0
+        for doc_id, doc in documents.items():
+            terms = tokenize(doc.page_content)
+            postings.extend((term, doc_id, tf) for term, tf in Counter(terms).items())
+            lengths.append((doc_id, len(terms)))
+            total += len(terms)
+
+        with self._db.lock:
+            self._db.conn.executemany("INSERT OR REPLACE INTO lex_postings (term, doc_id, tf) VALUES (?, ?, ?)", postings)
+            self._db.conn.executemany("INSERT OR REPLACE INTO lex_docs (doc_id, length) VALUES (?, ?)", lengths)
+            self._bump_stats(len(lengths), total)
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with self._db.lock:
+            removed_docs, removed_tokens = 0, 0
+            for start in range(0, len(ids), 500):
+                batch = list(ids[start:start + 500])
+                placeholders = ",".join("?" * len(batch))
+                count, tokens = self._db.conn.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM lex_docs WHERE doc_id IN ({placeholders})", batch
+                ).fetchone()
+                removed_docs += count
+                removed_tokens += tokens
+                self._db.conn.execute(f"DELETE FROM lex_postings WHERE doc_id IN ({placeholders})", batch)
+                self._db.conn.execute(f"DELETE FROM lex_docs WHERE doc_id IN ({placeholders})", batch)
+            self._bump_stats(-removed_docs, -removed_tokens)
+
+    def _bump_stats(self, docs: int, tokens: int) -> None:
+        self._db.conn.executemany(
+            "INSERT INTO lex_stats (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            [("docs", docs), ("tokens", tokens)],
+        )
+
+    def rebuild(self, batch_size: int = 500) -> int:
+        """Re-index every document in the docstore and commit. Returns the document count."""
+        with self._db.lock:
+            self._db.conn.execute("DELETE FROM lex_postings")
+            self._db.conn.execute("DELETE FROM lex_docs")
+            self._db.conn.execute("DELETE FROM lex_stats")
+            cursor = self._db.conn.execute("SELECT id, page_content FROM documents")
+            indexed = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                self.add({id_: Document(page_content=text) for id_, text in rows})
+                indexed += len(rows)
+            self._db.conn.commit()
+        return indexed
+
+    def ensure_built(self) -> None:
+        """Build the index for stores saved before it existed."""
+        with self._db.lock:
+            documents = self._db.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            indexed = self._stats()[0]
+        if documents and not indexed:
+            logger.info("Building lexical index for %d documents", documents)
+            self.rebuild()
+
+    # -------------------------
+    # Search
+    # -------------------------
+    def _stats(self) -> Tuple[int, int]:
+        rows = dict(self._db.conn.execute("SELECT key, value FROM lex_stats").fetchall())
+        return rows.get("docs", 0), rows.get("tokens", 0)
+
+    def search(self, query_text: str, k: int = 10) -> List[Tuple[str, float, float]]:
+        """
+        BM25 top-k.
+
+        Returns:
+            List of (doc_id, score, coverage) where coverage is the share of
+            distinct query terms found in the document.
+        """
+        terms = list(dict.fromkeys(tokenize(query_text)))
+        if not terms:
+            return []
+
+        placeholders = ",".join("?" * len(terms))
+        with self._db.lock:
+            n_docs, n_tokens = self._stats()
+            rows = self._db.conn.execute(
+                "SELECT p.term, p.doc_id, p.tf, d.length FROM lex_postings p "
+                f"JOIN lex_docs d ON d.doc_id = p.doc_id WHERE p.term IN ({placeholders})",
+                terms,
+            ).fetchall()
+        if not rows or not n_docs:
+            return []
+
+        avgdl = n_tokens / n_docs
+        df = Counter(term for term, _, _, _ in rows)
+        scores: Dict[str, float] = defaultdict(float)
+        matched: Dict[str, int] = defaultdict(int)
+        for term, doc_id, tf, length in rows:
+            idf = math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)
+            scores[doc_id] += idf * tf * (BM25_K1 + 1) / norm
+            matched[doc_id] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(doc_id, score, matched[doc_id] / len(terms)) for doc_id, score in ranked]
+
+
+# -------------------------
+# Fusion
+# -------------------------
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], rrf_k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: score(d) = sum over lists of 1 / (rrf_k + rank)."""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] += 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def result_relevance(result: dict) -> float:
+    """
+    Relevance of one retrieval result in 0..1, whichever retriever scored it.
+
+    retrieve_many and TicketMemory.search scores are already similarities
+    in 0..1. retrieve_hybrid's are not, and depend on its 'retriever':
+    "dense" is an L2 distance (lower is better), "lexical" a raw BM25
+    score, and "hybrid" an RRF sum that peaks at 2 / (RRF_K + 1) for a
+    document ranked first by both retrievers. A missing score counts as 0.
+    """
+    score = result.get("score")
+    if score is None:
+        return 0.0
+    score = float(score)
+    retriever = result.get("retriever")
+    if retriever == "dense":
+        score = 1.0 / (1.0 + max(score, 0.0))
+    elif retriever == "lexical":
+        score = score / (1.0 + score) if score > 0 else 0.0
+    elif retriever == "hybrid":
+        score = score * (RRF_K + 1) / 2
+    return min(1.0, max(0.0, score))
+
+
+def is_strong_lexical_match(hits: List[Tuple[str, float, float]], margin: float = LEXICAL_FAST_PATH_MARGIN) -> bool:
+    """Top hit contains every query term and clearly beats the runner-up."""
+    if not hits or hits[0][2] < 1.0:
+        return False
+    if len(hits) == 1:
+        return True
+    return hits[0][1] >= margin * hits[1][1]
+
+
+def hybrid_search(
+    query_text: str,
+    vectorstore,
+    k: int = 3,
+    fetch_k: Optional[int] = None,
+    lexical_fast_path: bool = True,
+) -> Tuple[List[Document], List[float], str]:
+    """
+    BM25 + FAISS search fused with reciprocal rank fusion.
+
+    Args:
+        query_text (str): User query.
+        vectorstore (FAISS): Store with a SQLiteDocstore (older stores
+            without a lexical index fall back to dense search).
+        k (int): Results to return.
+        fetch_k (int): Candidates taken from each retriever (default 4 x k).
+        lexical_fast_path (bool): Skip the dense search on a strong exact match.
+
+    Returns:
+        (documents, scores, retriever) where retriever is "lexical",
+        "hybrid" or "dense".
+    """
+    fetch_k = fetch_k or 4 * k
+    lexical: Optional[LexicalIndex] = getattr(vectorstore.docstore, "lexical", None)
+
+    if lexical is None:
+        pairs = vectorstore.similarity_search_with_score(query_text, k=k)
+        return [doc for doc, _ in pairs], [float(score) for _, score in pairs], "dense"
+
+    hits = lexical.search(query_text, k=fetch_k)
+    if lexical_fast_path and is_strong_lexical_match(hits):
+        ids = [doc_id for doc_id, _, _ in hits[:k]]
+        docs = vectorstore.docstore.mget(ids)
+        return [docs[i] for i in ids if i in docs], [score for i, score, _ in hits[:k] if i in docs], "lexical"
+
+    dense = vectorstore.similarity_search_with_score(query_text, k=fetch_k)
+    dense_docs = {}
+    dense_ranking = []
+    for doc, _ in dense:
+        # SQLiteDocstore sets Document.id, so both rankings share IDs
+        dense_docs[doc.id] = doc
+        dense_ranking.append(doc.id)
+
+    fused = reciprocal_rank_fusion([[doc_id for doc_id, _, _ in hits], dense_ranking])[:k]
+
+    missing = [doc_id for doc_id, _ in fused if doc_id not in dense_docs]
+    fetched = vectorstore.docstore.mget(missing) if missing else {}
+    docs, scores = [], []
+    for doc_id, score in fused:
+        doc = dense_docs.get(doc_id) or fetched.get(doc_id)
+        if doc is not None:
+            docs.append(doc)
+            scores.append(score)
+    return docs, scores, "hybrid"
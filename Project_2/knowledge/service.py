@@ -0,0 +1,402 @@
+# service.py
+
+"""
+Shared retrieval service: one index + one embedding model for every worker.
+
+Each worker process that calls load_saved_vectorstore holds its own copy
+of the FAISS index, the embedding model and the docstore. This sidecar
+owns a single copy (through knowledge.hot_reload.IndexHolder, so KB
+updates are picked up without a restart) and serves queries over a Unix
+socket.
+
+Concurrent queries from all workers are micro-batched: the first query
+waits up to RETRIEVAL_MAX_WAIT_MS for others to join, then the whole
+batch goes through one retrieve_many call (one embedding forward pass,
+one FAISS search). If a batch fails, its queries are retried one by one,
+so a single bad query only fails its own request.
+
+Protocol: one JSON object per line in each direction.
+    -> {"op": "retrieve", "queries": [...], "k": 3, "expand_parent": false}
+    <- {"results": [[...], ...]}  or  {"error": "..."}
+    -> {"op": "stats"}
+    <- {"stats": {...}}
+
+Usage:
+    python -m knowledge.service --watch          # sidecar
+    from knowledge.service import retrieve_from_kb  # in workers (drop-in)
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from knowledge import apply_token_budget, retrieve_many
+from knowledge.config import (
+    RETRIEVAL_MAX_BATCH,
+    RETRIEVAL_MAX_WAIT_MS,
+    RETRIEVAL_SOCKET_PATH,
+    RETRIEVAL_MAX_K,
+    RETRIEVAL_MAX_QUERIES,
+    RETRIEVAL_REQUEST_TIMEOUT_SECONDS,
+)
+from logger import logger
+
+
+# -------------------------
+# Micro-batching
+# -------------------------
+@dataclass
+class _Pending:
+    query: str
+    k: int
+    expand_parent: bool
+    future: Future = field(default_factory=Future)
+
+
+class MicroBatcher:
+    """
+    Collects queries from many threads and runs them as retrieve_many batches.
+
+    Args:
+        holder (IndexHolder): Source of the current vectorstore.
+        max_batch (int): Queries per batch.
+        max_wait_ms (float): Time the oldest query waits for the batch to fill.
+    """
+
+    def __init__(self, holder, max_batch: int = RETRIEVAL_MAX_BATCH, max_wait_ms: float = RETRIEVAL_MAX_WAIT_MS):
+        self.holder = holder
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_ms / 1000
+
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="kb-batcher", daemon=True)
+        self._lock = threading.Lock()
+        self._counts = {"queries": 0, "batches": 0, "failed_batches": 0, "max_batch_seen": 0}
+
+    def start(self) -> "MicroBatcher":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the batching thread; queries still queued fail with RuntimeError."""
+        with self._lock:
+            self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending.future.set_running_or_notify_cancel():
+                pending.future.set_exception(RuntimeError("Retrieval service stopped"))
+
+    def submit(self, query: str, k: int, expand_parent: bool) -> Future:
+        """
+        Queue one query; the Future resolves to its result list.
+
+        Raises:
+            RuntimeError: If the batcher was stopped.
+        """
+        pending = _Pending(query=query, k=k, expand_parent=expand_parent)
+        # Under the lock so nothing is queued after stop() drains the queue
+        with self._lock:
+            if self._stop.is_set():
+                raise RuntimeError("Retrieval service stopped")
+            self._queue.put(pending)
+        return pending.future
+
+    def _collect(self) -> List[_Pending]:
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_group(self, group: List[_Pending], expand_parent: bool) -> None:
+        # One search at the largest k; smaller requests take a prefix
+        k = max(p.k for p in group)
+        try:
+            with self.holder.acquire() as vectorstore:
+                results = retrieve_many([p.query for p in group], vectorstore, k=k, expand_parent=expand_parent)
+        except Exception:
+            logger.exception("Batched retrieval failed | queries=%d; retrying one by one", len(group))
+            with self._lock:
+                self._counts["failed_batches"] += 1
+            for p in group:
+                self._run_single(p, expand_parent)
+            return
+        for p, result in zip(group, results):
+            p.future.set_result(result[:p.k])
+
+    def _run_single(self, p: _Pending, expand_parent: bool) -> None:
+        try:
+            with self.holder.acquire() as vectorstore:
+                result = retrieve_many([p.query], vectorstore, k=p.k, expand_parent=expand_parent)[0]
+        except Exception as e:
+            p.future.set_exception(e)
+        else:
+            p.future.set_result(result)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Skip queries whose request already timed out
+            batch = [p for p in self._collect() if p.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self._lock:
+                self._counts["queries"] += len(batch)
+                self._counts["batches"] += 1
+                self._counts["max_batch_seen"] = max(self._counts["max_batch_seen"], len(batch))
+            for expand_parent in (False, True):
+                group = [p for p in batch if p.expand_parent == expand_parent]
+                if group:
+                    self._run_group(group, expand_parent)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["mean_batch"] = round(counts["queries"] / counts["batches"], 2) if counts["batches"] else 0.0
+        counts["queued"] = self._queue.qsize()
+        return counts
+
+
+# -------------------------
+# Server
+# -------------------------
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class RetrievalServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix-socket retrieval sidecar (one thread per connection, one shared batcher).
+
+    Args:
+        holder (IndexHolder): Loaded index.
+        socket_path (Path): Socket file; a stale one is replaced.
+        max_batch (int): See MicroBatcher.
+        max_wait_ms (float): See MicroBatcher.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        holder,
+        socket_path: Path = RETRIEVAL_SOCKET_PATH,
+        max_batch: int = RETRIEVAL_MAX_BATCH,
+        max_wait_ms: float = RETRIEVAL_MAX_WAIT_MS,
+    ):
+        self.holder = holder
+        self.socket_path = Path(socket_path)
+        self.batcher = MicroBatcher(holder, max_batch, max_wait_ms).start()
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        super().__init__(str(self.socket_path), _Handler)
+
+    def dispatch(self, request: dict) -> dict:
+        op = request.get("op", "retrieve")
+        if op == "stats":
+            return {"stats": {"kb": self.holder.stats(), "batcher": self.batcher.stats()}}
+        if op != "retrieve":
+            return {"error": f"Unknown op: {op}"}
+
+        queries, k = request.get("queries"), request.get("k", 3)
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            return {"error": "'queries' must be a list of strings"}
+        if len(queries) > RETRIEVAL_MAX_QUERIES:
+            return {"error": f"At most {RETRIEVAL_MAX_QUERIES} queries per request"}
+        if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= RETRIEVAL_MAX_K:
+            return {"error": f"'k' must be an integer between 1 and {RETRIEVAL_MAX_K}"}
+
+        expand_parent = bool(request.get("expand_parent", False))
+        futures = [self.batcher.submit(q, k, expand_parent) for q in queries]
+        deadline = time.monotonic() + RETRIEVAL_REQUEST_TIMEOUT_SECONDS
+        try:
+            return {"results": [f.result(timeout=max(0.0, deadline - time.monotonic())) for f in futures]}
+        except FutureTimeout:
+            for f in futures:
+                f.cancel()
+            return {"error": f"Retrieval timed out after {RETRIEVAL_REQUEST_TIMEOUT_SECONDS:.0f}s"}
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.batcher.stop()
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+
+def serve(
+    socket_path: Path = RETRIEVAL_SOCKET_PATH,
+    max_batch: int = RETRIEVAL_MAX_BATCH,
+    max_wait_ms: float = RETRIEVAL_MAX_WAIT_MS,
+    watch_interval: Optional[float] = None,
+) -> None:
+    """Load the index once and serve until interrupted."""
+    from knowledge.hot_reload import IndexHolder
+
+    holder = IndexHolder()
+    if watch_interval:
+        holder.start_watching(watch_interval)
+
+    with RetrievalServer(holder, socket_path, max_batch, max_wait_ms) as server:
+        logger.info("Retrieval service listening on %s | max_batch=%d max_wait=%.1fms", socket_path, max_batch, max_wait_ms)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            holder.stop_watching()
+
+
+# -------------------------
+# Client
+# -------------------------
+class RetrievalClient:
+    """
+    Thin client for the retrieval service (one connection per thread).
+
+    Args:
+        socket_path (Path): Service socket.
+        timeout (float): Seconds to wait for a response.
+    """
+
+    def __init__(self, socket_path: Path = RETRIEVAL_SOCKET_PATH, timeout: float = 30.0):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+        return conn
+
+    def _reset(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def request(self, payload: dict) -> dict:
+        """
+        Send one request and wait for its response.
+
+        Raises:
+            ConnectionError: If the service is unreachable or closed the connection.
+            TimeoutError: If no response came within the timeout (not retried:
+                the service is busy, and a retry would queue the work twice).
+            RuntimeError: If the service reported an error.
+        """
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        for attempt in range(2):
+            try:
+                sock, reader = self._connection()
+                sock.sendall(data)
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError("Retrieval service closed the connection")
+                break
+            except socket.timeout:
+                # The late response would arrive on this connection; drop it
+                self._reset()
+                raise TimeoutError(f"Retrieval service did not answer within {self.timeout:.0f}s")
+            except (ConnectionError, FileNotFoundError) as e:
+                # Reconnect once (service restarted, idle connection dropped)
+                self._reset()
+                if attempt:
+                    raise ConnectionError(f"Retrieval service unavailable at {self.socket_path}: {e}")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"Retrieval service error: {response['error']}")
+        return response
+
+    def retrieve_many(self, queries: List[str], k: int = 3, expand_parent: bool = False) -> List[list]:
+        """Same results as knowledge.retrieve_many, served by the sidecar."""
+        if not queries:
+            return []
+        return self.request({"op": "retrieve", "queries": list(queries), "k": k, "expand_parent": expand_parent})["results"]
+
+    def retrieve(self, query_text: str, k: int = 3, token_budget: Optional[int] = None, expand_parent: bool = False) -> list:
+        results = self.retrieve_many([query_text], k=k, expand_parent=expand_parent)[0]
+        return apply_token_budget(results, token_budget)
+
+    def stats(self) -> dict:
+        return self.request({"op": "stats"})["stats"]
+
+    def close(self) -> None:
+        self._reset()
+
+
+_default_client: Optional[RetrievalClient] = None
+
+
+def get_client() -> RetrievalClient:
+    """Process-wide client for the socket in RETRIEVAL_SOCKET_PATH (or $KB_RETRIEVAL_SOCKET)."""
+    global _default_client
+    if _default_client is None:
+        _default_client = RetrievalClient(os.getenv("KB_RETRIEVAL_SOCKET", str(RETRIEVAL_SOCKET_PATH)))
+    return _default_client
+
+
+def retrieve_from_kb(
+    query_text: str,
+    vectorstore=None,
+    k: int = 3,
+    token_budget: Optional[int] = None,
+    expand_parent: bool = False,
+) -> list:
+    """
+    Drop-in replacement for knowledge.retrieve_from_kb backed by the service.
+
+    `vectorstore` is accepted for signature compatibility and ignored:
+    the service owns the index. Results also carry 'score'.
+
+    Raises:
+        ConnectionError: If the service is not running.
+    """
+    return get_client().retrieve(query_text, k=k, token_budget=token_budget, expand_parent=expand_parent)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared KB retrieval service (Unix socket).")
+    parser.add_argument("--socket", type=Path, default=RETRIEVAL_SOCKET_PATH)
+    parser.add_argument("--max-batch", type=int, default=RETRIEVAL_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=RETRIEVAL_MAX_WAIT_MS)
+    parser.add_argument("--watch", type=float, nargs="?", const=5.0, default=None, help="Poll for new KB versions every N seconds")
+    args = parser.parse_args()
+
+    serve(args.socket, args.max_batch, args.max_wait_ms, args.watch)
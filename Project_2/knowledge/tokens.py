@@ -0,0 +1,42 @@
+# tokens.py
+
+"""
+Token counting for prompt budgets.
+
+Uses tiktoken when installed; otherwise falls back to the usual
+~4 characters per token estimate, which is close enough for budgeting.
+"""
+
+from functools import lru_cache
+
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (exact with tiktoken, estimated otherwise)."""
+    if not text:
+        return 0
+    encoder = _encoder()
+    if encoder is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoder.encode(text))
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut text so that it fits in `budget` tokens."""
+    if budget <= 0:
+        return ""
+    encoder = _encoder()
+    if encoder is None:
+        return text[: budget * CHARS_PER_TOKEN]
+    tokens = encoder.encode(text)
+    return text if len(tokens) <= budget else encoder.decode(tokens[:budget])
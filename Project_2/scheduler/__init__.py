@@ -0,0 +1,323 @@
+"""
+SLA-aware ticket scheduler.
+
+Tickets are queued by SLA deadline (last user message, or creation time,
++ sla_seconds) and a worker pool always takes the earliest deadline
+first (EDF) instead of FIFO.
+
+At dispatch, a ticket whose remaining slack cannot fit the full path
+(running estimate of recent full-path durations + a safety margin) is
+preempted onto the fast path instead: request info or escalate, which
+answers within the SLA rather than breaching it. The full-path estimate
+only learns from full-path runs, so while every ticket is preempted it
+decays back toward its prior (half-life ESTIMATE_HALF_LIFE_SECONDS);
+one slow spike cannot lock the scheduler onto the fast path for good.
+
+Per-ticket queue wait and slack (at dispatch and at completion) are
+recorded; stats() aggregates them for monitoring.
+
+Usage:
+    scheduler = EDFScheduler(handler=run_agent, workers=8)
+    scheduler.start()
+    future = scheduler.submit(state)
+    result_state = future.result()
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from logger import logger
+from state import SupportTicketState
+
+# -------------------------
+# CONFIG
+# -------------------------
+MAX_REQUEST_INFOS = 2  # fast path escalates once this many info requests were sent
+SAFETY_MARGIN_SECONDS = 1.0
+INITIAL_FULL_PATH_ESTIMATE_SECONDS = 5.0
+ESTIMATE_HALF_LIFE_SECONDS = 60.0  # unused full-path estimate halves its distance to the prior
+
+FULL_PATH = "full"
+FAST_PATH = "fast"
+
+
+def sla_deadline(state: SupportTicketState) -> float:
+    """Epoch seconds by which the ticket must get an agent response."""
+    anchor = state.last_user_message_at or state.ticket_created_at
+    return anchor.timestamp() + state.sla_seconds
+
+
+def default_fast_path(state: SupportTicketState) -> SupportTicketState:
+    """
+    Cheapest SLA-safe response, no LLM call: ask for details if none were
+    given yet (and we have not asked too often), otherwise escalate.
+    """
+    request_info = not state.info_list and state.number_of_request_infos < MAX_REQUEST_INFOS
+    return state.model_copy(update={
+        "current_verdict": "R" if request_info else "E",
+        "number_of_request_infos": state.number_of_request_infos + int(request_info),
+        "last_agent_action_at": datetime.now(),
+    })
+
+
+@dataclass
+class ScheduledTicket:
+    """One queued ticket and its timing record."""
+
+    state: SupportTicketState
+    deadline: float
+    enqueued_at: float
+    future: Future = field(default_factory=Future)
+    path: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    slack_at_dispatch: Optional[float] = None
+
+    @property
+    def queue_wait_seconds(self) -> Optional[float]:
+        return None if self.started_at is None else self.started_at - self.enqueued_at
+
+    @property
+    def slack_at_finish(self) -> Optional[float]:
+        return None if self.finished_at is None else self.deadline - self.finished_at
+
+    @property
+    def breached(self) -> bool:
+        return self.finished_at is not None and self.finished_at > self.deadline
+
+    def metrics(self) -> dict:
+        return {
+            "ticket_id": self.state.ticket_id,
+            "path": self.path,
+            "queue_wait_ms": None if self.queue_wait_seconds is None else round(self.queue_wait_seconds * 1000, 1),
+            "slack_at_dispatch_s": None if self.slack_at_dispatch is None else round(self.slack_at_dispatch, 3),
+            "slack_at_finish_s": None if self.slack_at_finish is None else round(self.slack_at_finish, 3),
+            "breached": self.breached,
+        }
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class EDFScheduler:
+    """
+    Earliest-deadline-first worker pool for SupportTicketState.
+
+    Args:
+        handler: Full processing path, state -> state (LLM extraction,
+            retrieval, answer generation).
+        fast_handler: Cheap path used for tickets about to breach.
+        workers (int): Worker threads.
+        safety_margin_seconds (float): Extra slack required to take the full path.
+        ewma_alpha (float): Weight of the newest duration in the running estimates.
+        estimate_half_life_seconds (float): Decay of an unused full-path estimate toward its prior.
+        history (int): Completed tickets kept for stats().
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[SupportTicketState], SupportTicketState],
+        fast_handler: Callable[[SupportTicketState], SupportTicketState] = default_fast_path,
+        workers: int = 4,
+        safety_margin_seconds: float = SAFETY_MARGIN_SECONDS,
+        ewma_alpha: float = 0.2,
+        estimate_half_life_seconds: float = ESTIMATE_HALF_LIFE_SECONDS,
+        history: int = 1000,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.handler = handler
+        self.fast_handler = fast_handler
+        self.workers = workers
+        self.safety_margin_seconds = safety_margin_seconds
+        self.ewma_alpha = ewma_alpha
+        self.estimate_half_life_seconds = estimate_half_life_seconds
+
+        self._cond = threading.Condition()
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._in_flight = 0
+
+        self._estimates = {FULL_PATH: INITIAL_FULL_PATH_ESTIMATE_SECONDS, FAST_PATH: 0.0}
+        self._full_path_updated_at = time.time()
+        self._completed: deque = deque(maxlen=history)
+        self._counts = {"processed": 0, "breached": 0, "failed": 0, FULL_PATH: 0, FAST_PATH: 0}
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    def start(self) -> "EDFScheduler":
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"edf-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("EDF scheduler started | workers=%d", self.workers)
+        return self
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop accepting work.
+
+        With wait=True, queued tickets are drained first. With wait=False,
+        queued tickets are dropped and their futures cancelled; tickets
+        already being processed still finish.
+        """
+        with self._cond:
+            self._running = False
+            dropped = [] if wait else [item for _, _, item in self._heap]
+            if not wait:
+                self._heap.clear()
+            self._cond.notify_all()
+        for item in dropped:
+            item.future.cancel()
+        if dropped:
+            logger.warning("EDF scheduler stopped | %d queued tickets cancelled", len(dropped))
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    # -------------------------
+    # Submission
+    # -------------------------
+    def submit(self, state: SupportTicketState, deadline: Optional[float] = None) -> Future:
+        """
+        Queue a ticket.
+
+        Args:
+            state (SupportTicketState): Ticket to process.
+            deadline (float): Epoch seconds; defaults to sla_deadline(state).
+
+        Returns:
+            Future: Resolves to the processed SupportTicketState.
+        """
+        item = ScheduledTicket(
+            state=state,
+            deadline=sla_deadline(state) if deadline is None else deadline,
+            enqueued_at=time.time(),
+        )
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Scheduler is not running")
+            heapq.heappush(self._heap, (item.deadline, next(self._seq), item))
+            self._cond.notify()
+        return item.future
+
+    # -------------------------
+    # Workers
+    # -------------------------
+    def _full_path_estimate(self, now: float) -> float:
+        """Full-path EWMA, decayed toward its prior for the time it went unused."""
+        idle = max(0.0, now - self._full_path_updated_at)
+        weight = 0.5 ** (idle / self.estimate_half_life_seconds)
+        prior = INITIAL_FULL_PATH_ESTIMATE_SECONDS
+        return prior + (self._estimates[FULL_PATH] - prior) * weight
+
+    def _choose_path(self, slack: float, now: float) -> str:
+        needed = self._full_path_estimate(now) + self.safety_margin_seconds
+        return FULL_PATH if slack >= needed else FAST_PATH
+
+    def _record_duration(self, path: str, seconds: float, now: float) -> None:
+        if path == FULL_PATH:
+            self._estimates[FULL_PATH] = self._full_path_estimate(now)
+            self._full_path_updated_at = now
+        self._estimates[path] += self.ewma_alpha * (seconds - self._estimates[path])
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and self._running:
+                    self._cond.wait()
+                if not self._heap:
+                    return
+                _, _, item = heapq.heappop(self._heap)
+                item.started_at = time.time()
+                item.slack_at_dispatch = item.deadline - item.started_at
+                item.path = self._choose_path(item.slack_at_dispatch, item.started_at)
+                estimate = self._full_path_estimate(item.started_at)
+                self._in_flight += 1
+
+            if item.path == FAST_PATH:
+                logger.warning(
+                    "Ticket %s preempted to fast path | slack=%.1fs < full-path estimate %.1fs",
+                    item.state.ticket_id, item.slack_at_dispatch, estimate,
+                )
+
+            handler = self.handler if item.path == FULL_PATH else self.fast_handler
+            result, error = None, None
+            try:
+                result = handler(item.state)
+            except Exception as e:
+                error = e
+            item.finished_at = time.time()
+
+            with self._cond:
+                self._in_flight -= 1
+                self._record_duration(item.path, item.finished_at - item.started_at, item.finished_at)
+                self._completed.append(item)
+                self._counts["processed"] += 1
+                self._counts[item.path] += 1
+                self._counts["breached"] += int(item.breached)
+                self._counts["failed"] += int(error is not None)
+
+            if item.breached:
+                logger.warning("SLA breached | %s", item.metrics())
+            if error is not None:
+                logger.error("Ticket %s failed on %s path: %s", item.state.ticket_id, item.path, error)
+                item.future.set_exception(error)
+            else:
+                item.future.set_result(result)
+
+    # -------------------------
+    # Metrics
+    # -------------------------
+    def queued(self) -> List[dict]:
+        """Queued tickets in dispatch order with their current slack."""
+        now = time.time()
+        with self._cond:
+            entries = sorted(self._heap)
+        return [
+            {"ticket_id": item.state.ticket_id, "slack_s": round(item.deadline - now, 3), "waited_s": round(now - item.enqueued_at, 3)}
+            for _, _, item in entries
+        ]
+
+    def stats(self) -> dict:
+        with self._cond:
+            completed = list(self._completed)
+            stats = {
+                "queued": len(self._heap),
+                "in_flight": self._in_flight,
+                **self._counts,
+                "full_path_estimate_s": round(self._full_path_estimate(time.time()), 3),
+                "fast_path_estimate_s": round(self._estimates[FAST_PATH], 3),
+            }
+            earliest = self._heap[0][0] if self._heap else None
+
+        waits = [item.queue_wait_seconds * 1000 for item in completed]
+        slacks = [item.slack_at_finish for item in completed]
+        stats.update({
+            "queue_wait_ms_p50": _percentile(waits, 0.5),
+            "queue_wait_ms_p95": _percentile(waits, 0.95),
+            "slack_at_finish_s_p05": _percentile(slacks, 0.05),
+            "slack_at_finish_s_min": min(slacks) if slacks else None,
+            "earliest_queued_slack_s": None if earliest is None else round(earliest - time.time(), 3),
+        })
+        return stats
@@ -6,6 +6,14 @@ from datetime import datetime
 Verdict = Literal["A", "R", "E"]  # Answer, Request Info, Escalate
 
 
+class ExtractedFacts(BaseModel):
+    """Structured output of INPUT_PARSING_PROMPT"""
+    facts: List[str] = Field(
+        default_factory=list,
+        description="Facts explicitly stated by the user, one short statement each"
+    )
+
+
 class SupportTicketState(BaseModel):
     # -------------------------
     # Identity
@@ -0,0 +1,35 @@
+# facts.py
+
+"""
+Fact list merging shared by fact extraction (agents.extractor) and the
+session store: facts are de-duplicated by normalized text and appended
+in order, so a merge never reorders or rewrites facts already stored.
+"""
+
+import re
+import unicodedata
+from typing import List, Tuple
+
+
+def normalize_fact(fact: str) -> str:
+    """Comparison key: NFKC, case-folded, whitespace collapsed, trailing punctuation dropped."""
+    text = unicodedata.normalize("NFKC", fact).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(".!;,: ")
+
+
+def merge_facts(existing: List[str], new: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Append facts not already present (by normalized text).
+
+    Returns:
+        (merged, added): The merged list (existing order kept) and the facts actually added.
+    """
+    seen = {normalize_fact(f) for f in existing}
+    added = []
+    for fact in new:
+        key = normalize_fact(fact)
+        if key and key not in seen:
+            seen.add(key)
+            added.append(fact.strip())
+    return existing + added, added
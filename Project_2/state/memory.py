@@ -0,0 +1,379 @@
+# memory.py
+
+"""
+Past-ticket memory: append-only store of resolved tickets + vector search.
+
+Storage (state/ticket_memory/):
+    tickets.sqlite   tickets(row_id, ticket_id, resolved_at, ticket_text,
+                     info_list, final_verdict, answer, embedding, archived)
+    cold.faiss       ANN index over archived tickets (IDs = row_id)
+    cold.json        cold index type / size
+
+Lookups stay bounded as the archive grows:
+- Tickets resolved within the hot window (HOT_WINDOW_DAYS) live in an
+  in-memory exact index, rebuilt from SQLite on open.
+- compact() moves tickets older than the window into the cold ANN index
+  (type chosen by size via knowledge.ann), which is only searched when
+  include_archive=True. It also runs on its own once the hot index holds
+  more than HOT_MAX_TICKETS, archiving the oldest tickets down to
+  HOT_LOW_WATER of that limit, so the cold index is rewritten once per
+  many adds instead of on every add past the limit.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from knowledge import get_embeddings
+from knowledge.ann import choose_index_type, default_params, make_index, set_search_params
+from knowledge.config import HF_MODEL_NAME, ANN_TRAIN_SAMPLE
+from logger import logger
+from state import SupportTicketState
+
+# -------------------------
+# CONFIG
+# -------------------------
+MEMORY_DIR = Path("state/ticket_memory")
+HOT_WINDOW_DAYS = 30
+HOT_MAX_TICKETS = 50_000  # hot index size that triggers compaction
+HOT_LOW_WATER = 0.5  # share of HOT_MAX_TICKETS left hot after a size-triggered compaction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    row_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id TEXT NOT NULL,
+    resolved_at REAL NOT NULL,
+    ticket_text TEXT NOT NULL,
+    info_list TEXT NOT NULL,
+    final_verdict TEXT NOT NULL,
+    answer TEXT,
+    embedding BLOB NOT NULL,
+    archived INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tickets_hot ON tickets (archived, resolved_at);
+CREATE INDEX IF NOT EXISTS tickets_ticket_id ON tickets (ticket_id);
+"""
+
+
+def ticket_document(ticket_text: str, info_list: List[str]) -> str:
+    """Text embedded for a ticket: the message plus its extracted facts."""
+    return "\n".join([ticket_text, *info_list])
+
+
+class TicketMemory:
+    """
+    Append-only past-ticket store with a hot/cold vector index.
+
+    Args:
+        memory_dir (Path): Where the SQLite file and cold index live.
+        hot_window_days (float): Age after which compact() archives a ticket.
+        hot_max_tickets (int): Hot index size that triggers compact() on add.
+        embeddings: LangChain embeddings (default: the shared KB model).
+    """
+
+    def __init__(
+        self,
+        memory_dir: Path = MEMORY_DIR,
+        hot_window_days: float = HOT_WINDOW_DAYS,
+        hot_max_tickets: int = HOT_MAX_TICKETS,
+        embeddings=None,
+    ):
+        self.memory_dir = Path(memory_dir)
+        self.memory_dir.mkdir(parents=True, exist_ok=True)
+        self.hot_window_days = hot_window_days
+        self.hot_max_tickets = hot_max_tickets
+        self.embeddings = embeddings or get_embeddings(HF_MODEL_NAME)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.memory_dir / "tickets.sqlite"), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        self._cold_path = self.memory_dir / "cold.faiss"
+        self._cold_meta_path = self.memory_dir / "cold.json"
+
+        self._hot: Optional[faiss.IndexIDMap2] = None
+        self._cold: Optional[faiss.IndexIDMap2] = None
+        self._load_indexes()
+
+    # -------------------------
+    # Index plumbing
+    # -------------------------
+    def _new_hot(self, dim: int) -> faiss.IndexIDMap2:
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+
+    def _load_indexes(self) -> None:
+        rows = self._conn.execute(
+            "SELECT row_id, embedding FROM tickets WHERE archived = 0 ORDER BY row_id"
+        ).fetchall()
+        if rows:
+            vectors = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            self._hot = self._new_hot(vectors.shape[1])
+            self._hot.add_with_ids(vectors, np.array([row_id for row_id, _ in rows], dtype=np.int64))
+
+        if self._cold_path.exists():
+            self._cold = faiss.read_index(str(self._cold_path))
+            meta = json.loads(self._cold_meta_path.read_text(encoding="utf-8"))
+            self._apply_search_params(self._cold, meta["params"])
+
+        logger.info(
+            "Ticket memory opened | hot=%d cold=%d",
+            self._hot.ntotal if self._hot else 0, self._cold.ntotal if self._cold else 0,
+        )
+
+    @staticmethod
+    def _apply_search_params(index: faiss.IndexIDMap2, params: dict) -> None:
+        set_search_params(faiss.downcast_index(index.index), params.get("nprobe"), params.get("ef_search"))
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    # -------------------------
+    # Writes
+    # -------------------------
+    def add(self, state: SupportTicketState, resolved_at: Optional[datetime] = None) -> int:
+        """
+        Record a resolved ticket.
+
+        Args:
+            state (SupportTicketState): Ticket with a final_verdict.
+            resolved_at (datetime): Defaults to state.last_agent_action_at, then now.
+
+        Returns:
+            int: Row ID of the stored ticket.
+
+        Raises:
+            ValueError: If the ticket has no final_verdict yet.
+        """
+        return self.add_many([state], [resolved_at])[0]
+
+    def add_many(self, states: List[SupportTicketState], resolved_at: Optional[List[Optional[datetime]]] = None) -> List[int]:
+        """Record many resolved tickets with one embedding batch."""
+        resolved_at = resolved_at or [None] * len(states)
+        for state in states:
+            if state.final_verdict is None:
+                raise ValueError(f"Ticket {state.ticket_id} has no final_verdict; only resolved tickets are stored")
+
+        vectors = self._embed([ticket_document(s.ticket_text, s.info_list) for s in states])
+        timestamps = [
+            (when or s.last_agent_action_at or datetime.now()).timestamp()
+            for s, when in zip(states, resolved_at)
+        ]
+
+        with self._lock:
+            row_ids = []
+            for state, ts, vector in zip(states, timestamps, vectors):
+                cursor = self._conn.execute(
+                    "INSERT INTO tickets (ticket_id, resolved_at, ticket_text, info_list, final_verdict, answer, embedding) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (state.ticket_id, ts, state.ticket_text, json.dumps(state.info_list),
+                     state.final_verdict, state.answer, vector.tobytes()),
+                )
+                row_ids.append(cursor.lastrowid)
+            self._conn.commit()
+
+            if self._hot is None:
+                self._hot = self._new_hot(vectors.shape[1])
+            self._hot.add_with_ids(vectors, np.array(row_ids, dtype=np.int64))
+
+            if self._hot.ntotal > self.hot_max_tickets:
+                self.compact()
+        return row_ids
+
+    # -------------------------
+    # Reads
+    # -------------------------
+    def search(
+        self,
+        query_text: str,
+        k: int = 3,
+        include_archive: bool = False,
+        max_age_days: Optional[float] = None,
+    ) -> List[dict]:
+        """
+        Most similar past tickets.
+
+        Args:
+            query_text (str): New ticket text (plus facts, if known).
+            k (int): Number of tickets to return.
+            include_archive (bool): Also search tickets moved out of the hot window.
+            max_age_days (float): Ignore tickets resolved longer ago than this.
+
+        Returns:
+            List[dict]: Shaped like retrieve_from_kb results ('source',
+            'category', 'snippet', 'score') plus 'ticket_id', 'info_list',
+            'final_verdict', 'answer' and 'resolved_at'.
+        """
+        query = np.asarray([self.embeddings.embed_query(query_text)], dtype=np.float32)
+        # Over-fetch when filtering by age, since filtered hits are dropped afterwards
+        fetch_k = k * 4 if max_age_days is not None else k
+
+        with self._lock:
+            best = {}
+            for index in (self._hot, self._cold if include_archive else None):
+                if index is None or index.ntotal == 0:
+                    continue
+                distances, ids = index.search(query, min(fetch_k, index.ntotal))
+                for d, i in zip(distances[0], ids[0]):
+                    if i != -1:
+                        best[int(i)] = min(float(d), best.get(int(i), float("inf")))
+            hits = sorted((d, i) for i, d in best.items())
+
+            if not hits:
+                return []
+            by_id = {row[0]: row for row in self._fetch_rows([i for _, i in hits])}
+
+        cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+        results = []
+        for distance, row_id in hits:
+            row = by_id.get(row_id)
+            if row is None or (cutoff is not None and row[2] < cutoff):
+                continue
+            _, ticket_id, resolved_at, ticket_text, info_list, final_verdict, answer = row
+            results.append({
+                "source": f"ticket:{ticket_id}",
+                "category": "PAST_TICKET",
+                "snippet": ticket_text if not answer else f"{ticket_text}\n\nResolution: {answer}",
+                "score": 1.0 / (1.0 + distance),
+                "ticket_id": ticket_id,
+                "info_list": json.loads(info_list),
+                "final_verdict": final_verdict,
+                "answer": answer,
+                "resolved_at": datetime.fromtimestamp(resolved_at).isoformat(),
+            })
+            if len(results) == k:
+                break
+        return results
+
+    def _fetch_rows(self, row_ids: List[int]) -> list:
+        placeholders = ",".join("?" * len(row_ids))
+        return self._conn.execute(
+            "SELECT row_id, ticket_id, resolved_at, ticket_text, info_list, final_verdict, answer "
+            f"FROM tickets WHERE row_id IN ({placeholders})",
+            row_ids,
+        ).fetchall()
+
+    # -------------------------
+    # Compaction
+    # -------------------------
+    def compact(self, now: Optional[datetime] = None) -> dict:
+        """
+        Move tickets older than the hot window into the cold ANN index.
+        When the hot index exceeds hot_max_tickets, the oldest tickets are
+        moved too, down to HOT_LOW_WATER of the limit.
+
+        The cold index grows incrementally while its index type still
+        suits its size, and is rebuilt (retrained on a sample) when it
+        crosses into the next type. The new cold index is built aside and
+        written before the archived flags are committed; on any failure
+        the flags are rolled back and the in-memory indexes are untouched.
+
+        Returns:
+            dict: {'archived': n moved, 'hot': hot size, 'cold': cold size, 'cold_type': type}
+        """
+        cutoff = (now or datetime.now()).timestamp() - self.hot_window_days * 86400
+        with self._lock:
+            hot = self._hot.ntotal if self._hot else 0
+            overflow = hot - int(self.hot_max_tickets * HOT_LOW_WATER) if hot > self.hot_max_tickets else 0
+            rows = self._conn.execute(
+                "SELECT row_id, embedding FROM tickets WHERE archived = 0 AND (resolved_at < ? OR row_id IN "
+                "(SELECT row_id FROM tickets WHERE archived = 0 ORDER BY resolved_at, row_id LIMIT ?)) ORDER BY row_id",
+                (cutoff, overflow),
+            ).fetchall()
+            if not rows:
+                return self._compaction_summary(0)
+
+            ids = np.array([row_id for row_id, _ in rows], dtype=np.int64)
+            vectors = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+
+            cold_total = (self._cold.ntotal if self._cold else 0) + len(rows)
+            cold_type = choose_index_type(cold_total)
+            meta = json.loads(self._cold_meta_path.read_text(encoding="utf-8")) if self._cold_meta_path.exists() else None
+
+            try:
+                self._conn.executemany("UPDATE tickets SET archived = 1 WHERE row_id = ?", [(int(i),) for i in ids])
+                if self._cold is not None and meta and meta["type"] == cold_type:
+                    cold = faiss.clone_index(self._cold)
+                    cold.add_with_ids(vectors, ids)
+                    self._apply_search_params(cold, meta["params"])
+                else:
+                    cold, meta = self._rebuild_cold(cold_type, vectors.shape[1])
+
+                tmp_path = self._cold_path.with_suffix(".faiss.tmp")
+                faiss.write_index(cold, str(tmp_path))
+                tmp_path.replace(self._cold_path)
+                self._cold_meta_path.write_text(json.dumps({**meta, "ntotal": cold.ntotal}), encoding="utf-8")
+                self._conn.commit()
+            except Exception:
+                # A cold file written before a failed commit only duplicates
+                # hot tickets, which search() de-duplicates by row ID
+                self._conn.rollback()
+                logger.exception("Ticket memory compaction failed; nothing archived")
+                raise
+
+            self._cold = cold
+            self._hot.remove_ids(ids)
+
+        logger.info("Ticket memory compacted | archived=%d hot=%d cold=%d", len(rows), self._hot.ntotal, self._cold.ntotal)
+        return self._compaction_summary(len(rows), meta["type"])
+
+    def _rebuild_cold(self, index_type: str, dim: int) -> Tuple[faiss.IndexIDMap2, dict]:
+        """Build a cold index from every archived row (lock held, new rows already flagged)."""
+        total = self._conn.execute("SELECT COUNT(*) FROM tickets WHERE archived = 1").fetchone()[0]
+        params = default_params(index_type, total, dim)
+        inner = make_index(index_type, dim, params)
+
+        if not inner.is_trained:
+            sample = self._conn.execute(
+                "SELECT embedding FROM tickets WHERE archived = 1 ORDER BY RANDOM() LIMIT ?", (ANN_TRAIN_SAMPLE,)
+            ).fetchall()
+            inner.train(np.vstack([np.frombuffer(blob, dtype=np.float32) for (blob,) in sample]))
+
+        cold = faiss.IndexIDMap2(inner)
+        cursor = self._conn.execute("SELECT row_id, embedding FROM tickets WHERE archived = 1 ORDER BY row_id")
+        while True:
+            batch = cursor.fetchmany(10_000)
+            if not batch:
+                break
+            cold.add_with_ids(
+                np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in batch]),
+                np.array([row_id for row_id, _ in batch], dtype=np.int64),
+            )
+
+        self._apply_search_params(cold, params)
+        logger.info("Ticket memory cold index rebuilt | type=%s vectors=%d", index_type, cold.ntotal)
+        return cold, {"type": index_type, "params": params}
+
+    def _compaction_summary(self, archived: int, cold_type: Optional[str] = None) -> dict:
+        return {
+            "archived": archived,
+            "hot": self._hot.ntotal if self._hot else 0,
+            "cold": self._cold.ntotal if self._cold else 0,
+            "cold_type": cold_type,
+        }
+
+    # -------------------------
+    # Introspection
+    # -------------------------
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tickets": len(self),
+                "hot": self._hot.ntotal if self._hot else 0,
+                "cold": self._cold.ntotal if self._cold else 0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,371 @@
+# session_store.py
+
+"""
+Persistent conversation state for SupportTicketState.
+
+Each ticket is stored as a base snapshot plus an append-only log of
+per-turn deltas:
+    sessions(ticket_id, base, deltas, updated_at, version)
+                                                   base = full state at last compaction
+    deltas(ticket_id, seq, field, op, payload)     op: "append" (list suffix) or "set"
+
+save() diffs the state against the last stored version and writes only
+what changed: new messages / facts / retrieval results are appended,
+changed scalar fields are set. Nothing re-serializes the whole model per
+turn. Deltas are folded into the base every COMPACT_EVERY turns, so
+rehydration cost stays bounded.
+
+An in-process LRU holds recently active tickets; others are rehydrated
+lazily from SQLite when the user replies.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from exceptions import SessionConflictError
+from logger import logger
+from state import SupportTicketState
+from state.facts import merge_facts
+
+# -------------------------
+# CONFIG
+# -------------------------
+SESSION_DB = Path("state/sessions.sqlite")
+SESSION_CACHE_SIZE = 10_000
+COMPACT_EVERY = 50  # deltas per ticket before they are folded into the base snapshot
+SAVE_RETRIES = 5  # attempts when another writer changed the ticket concurrently
+
+LIST_FIELDS = ("messages", "info_list", "retrieved_from_kb")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    ticket_id TEXT PRIMARY KEY,
+    base TEXT NOT NULL,
+    deltas INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS deltas (
+    ticket_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    op TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (ticket_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def diff_state(old: dict, new: dict) -> List[tuple]:
+    """
+    Deltas turning `old` into `new` (both model_dump(mode="json") dicts).
+
+    Returns:
+        List of (field, op, value): ("messages", "append", [...new items]),
+        ("confidence", "set", 0.8), ...
+    """
+    deltas = []
+    for field, value in new.items():
+        before = old.get(field)
+        if value == before:
+            continue
+        if field in LIST_FIELDS and isinstance(before, list) and value[:len(before)] == before:
+            deltas.append((field, "append", value[len(before):]))
+        else:
+            deltas.append((field, "set", value))
+    return deltas
+
+
+def apply_deltas(snapshot: dict, deltas: List[tuple]) -> dict:
+    """Replay (field, op, value) deltas onto a snapshot dict (in place)."""
+    for field, op, value in deltas:
+        if op == "append":
+            snapshot[field] = list(snapshot.get(field) or []) + value
+        else:
+            snapshot[field] = value
+    return snapshot
+
+
+class SessionStore:
+    """
+    LRU-cached, SQLite-backed store of open tickets.
+
+    Several instances (threads or processes) may share one database: every
+    write runs in a BEGIN IMMEDIATE transaction that first checks the
+    ticket's version. If another instance wrote since this one cached the
+    ticket, the cache entry is dropped, the ticket rehydrated and the
+    write retried, so delta sequence numbers never collide.
+
+    Args:
+        db_path (Path): SQLite file.
+        cache_size (int): Tickets kept in memory.
+        compact_every (int): Deltas before a ticket's base is rewritten.
+    """
+
+    def __init__(self, db_path: Path = SESSION_DB, cache_size: int = SESSION_CACHE_SIZE, compact_every: int = COMPACT_EVERY):
+        self.cache_size = cache_size
+        self.compact_every = compact_every
+
+        self._lock = threading.RLock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+        # ticket_id -> (snapshot dict, deltas since base, version)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+
+    # -------------------------
+    # Cache
+    # -------------------------
+    def _remember(self, ticket_id: str, snapshot: dict, delta_count: int, version: int) -> None:
+        self._cache[ticket_id] = (snapshot, delta_count, version)
+        self._cache.move_to_end(ticket_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _snapshot(self, ticket_id: str) -> Optional[tuple]:
+        """Cached (snapshot, delta_count, version), rehydrating from SQLite on a miss."""
+        cached = self._cache.get(ticket_id)
+        if cached is not None:
+            self._cache.move_to_end(ticket_id)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        # One read transaction, so a concurrent compaction cannot land between the two reads
+        self._conn.execute("BEGIN")
+        try:
+            row = self._conn.execute(
+                "SELECT base, deltas, version FROM sessions WHERE ticket_id = ?", (ticket_id,)
+            ).fetchone()
+            rows = [] if row is None else self._conn.execute(
+                "SELECT field, op, payload FROM deltas WHERE ticket_id = ? ORDER BY seq", (ticket_id,)
+            ).fetchall()
+        finally:
+            self._conn.rollback()
+        if row is None:
+            return None
+        snapshot = json.loads(row[0])
+        apply_deltas(snapshot, [(field, op, json.loads(payload)) for field, op, payload in rows])
+        self._remember(ticket_id, snapshot, row[1], row[2])
+        return snapshot, row[1], row[2]
+
+    # -------------------------
+    # Writes
+    # -------------------------
+    def _write(self, ticket_id: str, new: dict, cached: Optional[tuple]) -> Optional[int]:
+        """
+        Write `new` as the next version of the ticket cached as `cached` (lock held).
+
+        Returns:
+            int: Deltas written, or None if the stored version moved on
+            (the caller rehydrates and retries).
+        """
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT deltas, version FROM sessions WHERE ticket_id = ?", (ticket_id,)
+            ).fetchone()
+            if cached is None and row is None:
+                self._conn.execute(
+                    "INSERT INTO sessions (ticket_id, base, deltas, updated_at, version) VALUES (?, ?, 0, ?, 1)",
+                    (ticket_id, json.dumps(new), now),
+                )
+                self._conn.commit()
+                self._remember(ticket_id, new, 0, 1)
+                return 0
+            if cached is None or row is None or row[1] != cached[2]:
+                self._conn.rollback()
+                return None
+
+            old, delta_count, version = cached
+            deltas = diff_state(old, new)
+            if not deltas:
+                self._conn.rollback()
+                return 0
+
+            if delta_count + len(deltas) > self.compact_every:
+                # Fold everything into a new base instead of growing the log
+                self._conn.execute("DELETE FROM deltas WHERE ticket_id = ?", (ticket_id,))
+                self._conn.execute(
+                    "UPDATE sessions SET base = ?, deltas = 0, updated_at = ?, version = ? WHERE ticket_id = ?",
+                    (json.dumps(new), now, version + 1, ticket_id),
+                )
+                delta_count = 0
+                logger.info("Session %s compacted into a new base snapshot", ticket_id)
+            else:
+                self._conn.executemany(
+                    "INSERT INTO deltas (ticket_id, seq, field, op, payload) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (ticket_id, delta_count + i, field, op, json.dumps(value))
+                        for i, (field, op, value) in enumerate(deltas)
+                    ],
+                )
+                delta_count += len(deltas)
+                self._conn.execute(
+                    "UPDATE sessions SET deltas = ?, updated_at = ?, version = ? WHERE ticket_id = ?",
+                    (delta_count, now, version + 1, ticket_id),
+                )
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        self._remember(ticket_id, new, delta_count, version + 1)
+        return len(deltas)
+
+    def _conflict(self, ticket_id: str) -> None:
+        self.conflicts += 1
+        self._cache.pop(ticket_id, None)
+        logger.info("Session %s changed by another writer; rehydrating", ticket_id)
+
+    # -------------------------
+    # API
+    # -------------------------
+    def get(self, ticket_id: str) -> Optional[SupportTicketState]:
+        """Current state of a ticket (a fresh object each call), or None."""
+        with self._lock:
+            cached = self._snapshot(ticket_id)
+        return None if cached is None else SupportTicketState.model_validate(cached[0])
+
+    def save(self, state: SupportTicketState) -> int:
+        """
+        Persist a ticket, writing only what changed since the last save.
+
+        The saved state replaces whatever is stored (last writer wins); use
+        update() to change a ticket based on its current stored state.
+
+        Returns:
+            int: Number of deltas written (0 if nothing changed).
+
+        Raises:
+            SessionConflictError: If other writers kept changing the ticket.
+        """
+        new = state.model_dump(mode="json")
+        with self._lock:
+            for _ in range(SAVE_RETRIES):
+                written = self._write(state.ticket_id, new, self._snapshot(state.ticket_id))
+                if written is not None:
+                    return written
+                self._conflict(state.ticket_id)
+        raise SessionConflictError(f"Ticket {state.ticket_id} kept changing during save")
+
+    def update(
+        self, ticket_id: str, change: Callable[[SupportTicketState], SupportTicketState]
+    ) -> SupportTicketState:
+        """
+        Read-modify-write a ticket atomically.
+
+        `change` gets the current stored state and returns the new one. It
+        is re-run on the fresh state if another writer got in first, so it
+        must not have side effects.
+
+        Raises:
+            KeyError: If the ticket is unknown.
+            SessionConflictError: If other writers kept changing the ticket.
+        """
+        with self._lock:
+            for _ in range(SAVE_RETRIES):
+                cached = self._snapshot(ticket_id)
+                if cached is None:
+                    raise KeyError(ticket_id)
+                state = change(SupportTicketState.model_validate(cached[0]))
+                if self._write(ticket_id, state.model_dump(mode="json"), cached) is not None:
+                    return state
+                self._conflict(ticket_id)
+        raise SessionConflictError(f"Ticket {ticket_id} kept changing during update")
+
+    def append_turn(self, ticket_id: str, role: str, text: str, at=None) -> SupportTicketState:
+        """
+        Record a new user/agent message on an existing ticket.
+
+        A user message also becomes the latest `ticket_text` and moves
+        `last_user_message_at`; an agent message moves `last_agent_action_at`.
+
+        Raises:
+            KeyError: If the ticket is unknown.
+        """
+        at = at or datetime.now()
+
+        def add_turn(state: SupportTicketState) -> SupportTicketState:
+            update: Dict = {"messages": [*state.messages, (role, text)]}
+            if role == "user":
+                update.update({"ticket_text": text, "last_user_message_at": at})
+            else:
+                update["last_agent_action_at"] = at
+            return state.model_copy(update=update)
+
+        return self.update(ticket_id, add_turn)
+
+    def merge_facts(self, ticket_id: str, facts: List[str]) -> List[str]:
+        """
+        Merge facts into the ticket's current info_list (de-duplicated).
+
+        Returns:
+            List[str]: The facts actually added.
+
+        Raises:
+            KeyError: If the ticket is unknown.
+        """
+        added: List[str] = []
+
+        def merge(state: SupportTicketState) -> SupportTicketState:
+            info_list, new = merge_facts(list(state.info_list), facts)
+            added[:] = new
+            return state.model_copy(update={"info_list": info_list})
+
+        if facts:
+            self.update(ticket_id, merge)
+        return added
+
+    def delete(self, ticket_id: str) -> None:
+        """Remove a closed ticket."""
+        with self._lock:
+            self._conn.execute("DELETE FROM deltas WHERE ticket_id = ?", (ticket_id,))
+            self._conn.execute("DELETE FROM sessions WHERE ticket_id = ?", (ticket_id,))
+            self._conn.commit()
+            self._cache.pop(ticket_id, None)
+
+    def evict(self, ticket_id: str) -> None:
+        """Drop a ticket from memory only (it is rehydrated on next access)."""
+        with self._lock:
+            self._cache.pop(ticket_id, None)
+
+    def ticket_ids(self) -> List[str]:
+        """IDs of every stored ticket, least recently updated first."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT ticket_id FROM sessions ORDER BY updated_at")]
+
+    def __contains__(self, ticket_id: str) -> bool:
+        with self._lock:
+            if ticket_id in self._cache:
+                return True
+            return self._conn.execute("SELECT 1 FROM sessions WHERE ticket_id = ?", (ticket_id,)).fetchone() is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cached": len(self._cache),
+                "stored": self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+                "hits": self.hits,
+                "misses": self.misses,
+                "conflicts": self.conflicts,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,87 @@
+"""
+Test doubles shared by the Project_2 tests.
+
+FakeEmbeddings hashes words into a small vector, so texts sharing words
+are similar (cosine) and identical texts embed identically, without
+downloading a model. FakeChain replays canned outputs like a LangChain
+Runnable (invoke / batch / abatch / stream).
+"""
+
+import hashlib
+import math
+import re
+from typing import List
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:  # tests that need LangChain skip themselves
+    Embeddings = object
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings (embed_query / embed_documents)."""
+
+    def __init__(self, dim: int = 32):
+        self.dim = dim
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return self._embed(text)
+
+
+class FakeChain:
+    """
+    Runnable stand-in: `respond(input)` gives each output (an Exception is raised).
+
+    Args:
+        respond: Callable input -> output, or a list of chunks for stream().
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.inputs = []
+        self.closed = False
+
+    def _call(self, value):
+        self.inputs.append(value)
+        result = self.respond(value)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def invoke(self, value, config=None):
+        return self._call(value)
+
+    def batch(self, values, config=None, return_exceptions=False):
+        results = []
+        for value in values:
+            try:
+                results.append(self._call(value))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    async def abatch(self, values, config=None, return_exceptions=False):
+        return self.batch(values, config, return_exceptions)
+
+    def stream(self, value, config=None):
+        chunks = self._call(value)
+        try:
+            for chunk in chunks:
+                yield chunk
+        finally:
+            self.closed = True
@@ -0,0 +1,89 @@
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+
+from knowledge import ann, docstore
+from tests.fakes import FakeEmbeddings
+
+DIM = 16
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(0)
+    flat = faiss.IndexFlatL2(DIM)
+    flat.add(rng.normal(size=(2000, DIM)).astype(np.float32))
+    faiss.write_index(flat, str(tmp_path / ann.SOURCE_INDEX_FILE))
+    return tmp_path, flat, rng
+
+
+def edit_flat(path, flat, removed, added):
+    flat.remove_ids(np.asarray(removed, dtype=np.int64))
+    flat.add(added)
+    faiss.write_index(flat, str(path / ann.SOURCE_INDEX_FILE))
+
+
+def test_ivf_edit_keeps_positions_aligned(store):
+    path, flat, rng = store
+    ann.build_ann_index(path, "ivf_flat")
+
+    edit_flat(path, flat, [3, 400, 1999], rng.normal(size=(10, DIM)).astype(np.float32))
+    meta = ann.update_ann_index(path, [3, 400, 1999])
+
+    assert meta["added_since_training"] == 10  # edited, not rebuilt
+    index = ann.load_ann_index(path, nprobe=meta["params"]["nlist"])
+    queries = rng.normal(size=(20, DIM)).astype(np.float32)
+    assert index.ntotal == flat.ntotal
+    assert (index.search(queries, 5)[1] == flat.search(queries, 5)[1]).all()
+
+
+def test_hnsw_removal_rebuilds(store):
+    path, flat, rng = store
+    ann.build_ann_index(path, "hnsw")
+    edit_flat(path, flat, [0], rng.normal(size=(1, DIM)).astype(np.float32))
+
+    meta = ann.update_ann_index(path, [0])
+    assert meta["ntotal"] == flat.ntotal
+    assert ann.load_ann_index(path) is not None
+
+
+def test_growth_past_threshold_retrains(store):
+    path, flat, rng = store
+    ann.build_ann_index(path, "ivf_flat")
+    edit_flat(path, flat, [], rng.normal(size=(1500, DIM)).astype(np.float32))
+
+    meta = ann.update_ann_index(path)
+    assert meta["trained_ntotal"] == flat.ntotal
+
+
+def test_drifted_additions_retrain(store):
+    path, flat, rng = store
+    ann.build_ann_index(path, "ivf_flat")
+    edit_flat(path, flat, [], (rng.normal(size=(64, DIM)) + 10).astype(np.float32))
+
+    meta = ann.update_ann_index(path)
+    assert meta["added_since_training"] == 0
+    assert json.loads((path / ann.ANN_META_FILE).read_text())["trained_ntotal"] == flat.ntotal
+
+
+def test_cli_build_publishes_a_new_version(tmp_path):
+    path = tmp_path / "kb_index"
+    with docstore.build_lock(path):
+        staging = docstore.staging_path(path)
+        docstore.save_vectorstore(FAISS.from_texts([f"passage {i}" for i in range(50)], FakeEmbeddings()), staging)
+        docstore.publish_vectorstore(staging, path)
+    live = docstore.resolve_store(path)
+
+    meta = ann.publish_ann_index(path, "hnsw")
+
+    assert meta["type"] == "hnsw" and docstore.resolve_store(path) != live
+    assert (docstore.resolve_store(path) / ann.ANN_INDEX_FILE).exists()
+    assert not (live / ann.ANN_INDEX_FILE).exists()  # the version being served was not touched
+    with pytest.raises(FileNotFoundError):
+        ann.publish_ann_index(tmp_path / "missing")
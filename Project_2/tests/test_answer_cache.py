@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_core.documents import Document
+
+import knowledge
+from knowledge.answer_cache import AnswerCache
+from tests.fakes import FakeEmbeddings
+
+QUESTION = "how do I reset my password"
+SOURCES = [{"source": "faq.txt", "snippet": "Use the reset link."}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AnswerCache(
+        tmp_path / "answers.sqlite",
+        threshold=0.8,
+        ttl_seconds=3600,
+        embeddings=FakeEmbeddings(),
+        manifest_path=tmp_path / "manifest.json",
+        vectorstore_path=tmp_path / "kb_index",
+    )
+    yield cache
+    cache.close()
+
+
+def expire(cache, query_text):
+    cache._conn.execute("UPDATE answers SET created_at = created_at - 7200 WHERE query_text = ?", (query_text,))
+    cache._conn.commit()
+
+
+def test_hit_and_miss(cache):
+    cache.store(QUESTION, "Use the reset link.", SOURCES)
+
+    hit = cache.lookup(QUESTION)
+    assert hit.answer == "Use the reset link." and hit.retrieved_from_kb == SOURCES
+    assert cache.lookup("my invoice is wrong") is None
+
+
+def test_expired_nearest_entry_does_not_hide_a_valid_one(cache):
+    cache.store(QUESTION, "old answer", SOURCES)
+    cache.store(QUESTION + " please", "fresh answer", SOURCES)
+    expire(cache, QUESTION)
+
+    hit = cache.lookup(QUESTION)
+    assert hit is not None and hit.answer == "fresh answer"
+    assert cache.stats()["entries"] == 1  # the expired one was dropped on the way
+
+
+def test_expired_entries_are_purged_periodically(cache):
+    cache.store(QUESTION, "old answer", SOURCES)
+    cache.store("billing cycle dates", "The 1st of each month.", SOURCES)
+    expire(cache, QUESTION)
+    cache._last_purge = 0
+
+    cache.lookup("something unrelated entirely")
+    assert cache.stats()["entries"] == 1
+    assert cache._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 1
+
+
+def test_full_rebuild_invalidates_cached_answers(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(knowledge, "get_embeddings", lambda *a, **k: FakeEmbeddings())
+    docs = [Document(page_content="Use the reset link.", metadata={"source": "faq.txt"})]
+    knowledge.build_vectorstore(docs, vectorstore_path=tmp_path / "kb_index")
+    cache.store(QUESTION, "Use the reset link.", SOURCES)
+    assert cache.lookup(QUESTION) is not None
+
+    # No manifest is written by a full rebuild; the new published version is enough
+    knowledge.build_vectorstore(docs, vectorstore_path=tmp_path / "kb_index")
+    assert cache.lookup(QUESTION) is None
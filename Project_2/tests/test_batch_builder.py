@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+import knowledge
+from knowledge import batch_builder, chunk_file, docstore, indexer, retrieve_from_kb
+from knowledge.batch_builder import batched, build_kb_streaming
+from knowledge.embedding_cache import CachedEmbeddings
+from tests.fakes import FakeEmbeddings
+
+KB_FOLDER = Path(__file__).resolve().parents[1] / "knowledge" / "Knowledge Base"
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    embeddings = FakeEmbeddings()
+    for module in (knowledge, batch_builder, indexer):
+        monkeypatch.setattr(module, "get_embeddings", lambda *a, **k: embeddings)
+    return {"kb_folder": KB_FOLDER, "vectorstore_path": tmp_path / "kb_index", "manifest_path": tmp_path / "manifest.json"}
+
+
+def fake_model(hf_model_name):
+    """Worker model for the multi-process tests (imported by spawned workers)."""
+    return FakeEmbeddings()
+
+
+def test_batched_keeps_the_remainder():
+    assert [len(b) for b in batched(range(7), 3)] == [3, 3, 1]
+
+
+def test_streaming_build_indexes_every_chunk_with_parents(paths):
+    vectorstore = build_kb_streaming(**paths, batch_size=4, workers=1)
+    chunks = chunk_file(KB_FOLDER / "kb.txt")[1]
+
+    assert vectorstore.index.ntotal == len(chunks)
+    assert "**Title:**" in retrieve_from_kb("error codes", vectorstore, k=1, expand_parent=True)[0]["snippet"]
+    assert paths["vectorstore_path"].is_symlink()
+    docstore.close_vectorstore(vectorstore)
+
+    # The manifest lets the next refresh be incremental
+    assert indexer.update_vectorstore(**paths).is_noop
+
+
+def test_empty_stream_does_not_publish(paths):
+    with pytest.raises(ValueError):
+        batch_builder.build_vectorstore_streaming(iter(()), vectorstore_path=paths["vectorstore_path"], workers=1)
+    assert not paths["vectorstore_path"].exists()
+    assert not list(paths["vectorstore_path"].parent.glob(".kb_index.staging-*"))
+
+
+def test_worker_pool_build_embeds_every_chunk(paths, tmp_path, monkeypatch):
+    cache = CachedEmbeddings(None, cache_dir=tmp_path / "cache", model_name="fake")
+    monkeypatch.setattr(batch_builder, "open_embedding_cache", lambda *a, **k: cache)
+
+    pooled = build_kb_streaming(**paths, batch_size=3, workers=2, max_pending=2, load_model=fake_model)
+    texts = [c.page_content for c in chunk_file(KB_FOLDER / "kb.txt")[1]]
+
+    # Batches finish in any order; every chunk must still sit next to its own vector
+    assert pooled.index.ntotal == len(texts)
+    assert all(pooled.similarity_search(text, k=1)[0].page_content == text for text in texts)
+    assert len(cache) == len(set(texts))  # workers' vectors were stored by the parent
+    docstore.close_vectorstore(pooled)
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+
+from knowledge import apply_token_budget, chunk_file, docstore, retrieve_from_kb
+from knowledge.config import CHUNK_SIZE
+from knowledge.tokens import count_tokens, truncate_to_tokens
+from tests.fakes import FakeEmbeddings
+
+KB_FILE = Path(__file__).resolve().parents[1] / "knowledge" / "Knowledge Base" / "kb.txt"
+
+
+@pytest.fixture
+def store(tmp_path):
+    parents, chunks = chunk_file(KB_FILE)
+    docstore.save_vectorstore(
+        FAISS.from_documents(chunks, FakeEmbeddings()), tmp_path, parents={p.metadata["id"]: p for p in parents}
+    )
+    vectorstore = docstore.load_vectorstore(tmp_path, FakeEmbeddings())
+    yield vectorstore
+    docstore.close_vectorstore(vectorstore)
+
+
+def test_each_faq_entry_is_a_parent_split_into_passages():
+    parents, chunks = chunk_file(KB_FILE)
+
+    assert [p.metadata["title"] for p in parents][1] == "Troubleshooting Common Application Crashes and Errors"
+    assert len(parents) == 6 and len(chunks) > len(parents)
+    assert {c.metadata["parent_id"] for c in chunks} == {p.metadata["id"] for p in parents}
+    assert all(len(c.page_content) <= CHUNK_SIZE for c in chunks)
+    assert chunk_file(KB_FILE)[0][0].metadata["id"] == parents[0].metadata["id"]  # stable ids
+
+
+def test_expand_parent_returns_whole_entries_once(store):
+    chunks = retrieve_from_kb("error codes 504 401 500", store, k=3)
+    parents = retrieve_from_kb("error codes 504 401 500", store, k=3, expand_parent=True)
+
+    assert all(len(r["snippet"]) <= CHUNK_SIZE for r in chunks)
+    assert len({r["parent_id"] for r in parents}) == len(parents)
+    assert any("**Title:**" in r["snippet"] for r in parents)
+
+
+def test_token_budget_keeps_rank_order_and_truncates_a_lone_result():
+    results = [{"snippet": "word " * 40}, {"snippet": "short answer"}, {"snippet": "word " * 40}]
+    packed = apply_token_budget(results, count_tokens(results[0]["snippet"]) + count_tokens("short answer"))
+    assert [r["snippet"] for r in packed] == [results[0]["snippet"], "short answer"]
+
+    lone = apply_token_budget(results, 5)
+    assert len(lone) == 1 and lone[0]["truncated"] and count_tokens(lone[0]["snippet"]) <= 5
+    assert truncate_to_tokens("anything", 0) == ""
@@ -0,0 +1,101 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+
+from decision.confidence import FEATURES, ConfidenceModel, extract_features, past_resolution_rate
+from knowledge import chunk_file, docstore, retrieve_hybrid
+from tests.fakes import FakeEmbeddings
+
+KB_FILE = Path(__file__).resolve().parents[1] / "knowledge" / "Knowledge Base" / "kb.txt"
+
+KB_RESULTS = [
+    {"score": 0.9, "snippet": "Reinstall the app to fix crashes on login."},
+    {"score": 0.4, "snippet": "Billing changes apply next cycle."},
+]
+
+
+def test_extract_features():
+    row = dict(zip(FEATURES, extract_features(
+        KB_RESULTS,
+        ticket_text="app crashes on login",
+        info_list=["Android"],
+        past_tickets=[{"score": 1.0, "final_verdict": "A"}, {"score": 0.5, "final_verdict": "E"}],
+    )))
+
+    assert row["top1"] == pytest.approx(0.9) and row["margin"] == pytest.approx(0.5)
+    assert row["mean_topk"] == pytest.approx(0.65)
+    assert 0 < row["overlap"] < 1  # "android" is not in the snippets
+    assert row["past_rate"] == pytest.approx(2 / 3)
+    assert row["has_facts"] == 1.0
+
+
+def test_no_results_gives_zero_features():
+    assert not extract_features([]).any()
+    assert past_resolution_rate([]) == 0.0
+
+
+def test_score_batch_matches_single_scores():
+    model = ConfidenceModel()
+    rows = np.vstack([extract_features(KB_RESULTS, "app crashes"), extract_features([])])
+    scores = model.score_batch(rows)
+
+    assert scores.shape == (2,)
+    assert scores[0] == pytest.approx(model.score(rows[0]))
+    assert scores[0] > scores[1]
+
+
+def test_fit_moves_weights_toward_the_labels():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(size=(200, len(FEATURES))).astype(np.float32)
+    y = (X[:, FEATURES.index("overlap")] > 0.5).astype(float)  # only overlap decides
+    model = ConfidenceModel()
+
+    before = ((model.score_batch(X) >= 0.5) == y).mean()
+    report = model.fit(X, y, epochs=2000)
+
+    assert report["accuracy"] > before and report["accuracy"] > 0.8
+    weights = dict(zip(FEATURES, model.weights))
+    assert weights["overlap"] == max(weights.values())
+
+
+def test_fit_rejects_bad_shapes():
+    with pytest.raises(ValueError):
+        ConfidenceModel().fit(np.zeros((3, 2)), np.zeros(3))
+
+
+def test_save_load_round_trip(tmp_path):
+    model = ConfidenceModel()
+    model.fit(np.eye(len(FEATURES)), np.array([1, 0, 1, 0, 1, 0]), epochs=10)
+    model.save(tmp_path / "confidence.json")
+
+    loaded = ConfidenceModel.load(tmp_path / "confidence.json")
+    assert np.allclose(loaded.weights, model.weights) and loaded.bias == pytest.approx(model.bias)
+
+
+@pytest.fixture
+def kb_store(tmp_path):
+    chunks = chunk_file(KB_FILE)[1]
+    docstore.save_vectorstore(FAISS.from_documents(chunks, FakeEmbeddings()), tmp_path)
+    store = docstore.load_vectorstore(tmp_path, FakeEmbeddings())
+    yield store, chunks
+    docstore.close_vectorstore(store)
+
+
+def test_hybrid_and_dense_scores_become_comparable_relevance(kb_store):
+    store, chunks = kb_store
+    exact, garbage = chunks[3].page_content, "zebra quantum"
+    dense_store = FAISS.from_documents(chunks, FakeEmbeddings())  # no lexical index: dense fallback
+
+    for search in (
+        lambda q: retrieve_hybrid(q, store, k=3, lexical_fast_path=False),
+        lambda q: retrieve_hybrid(q, store, k=3),
+        lambda q: retrieve_hybrid(q, dense_store, k=3),
+    ):
+        hit, miss = extract_features(search(exact)), extract_features(search(garbage))
+        assert 0.0 <= miss[0] < hit[0] <= 1.0
+        assert miss[FEATURES.index("mean_topk")] < 0.9
@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from knowledge.context import DROP_DUPLICATE, DROP_MAX_PASSAGES, DROP_OVER_BUDGET, assemble_context, lexical_similarity
+from knowledge.tokens import count_tokens
+from tests.fakes import FakeEmbeddings
+
+CACHE = "Clear the cache via Settings > Storage > Clear Cache to stop repeated crashes."
+UPDATE = "Always run the latest stable version; outdated versions conflict with server APIs."
+BILLING = "Billing changes take effect at the next billing cycle."
+
+
+def kb(*snippets):
+    return [{"title": f"t{i}", "snippet": s, "score": 1.0 - i / 10} for i, s in enumerate(snippets)]
+
+
+def test_lexical_similarity_is_cosine():
+    sim = lexical_similarity([CACHE, CACHE, BILLING])
+    assert sim[0, 1] == pytest.approx(1.0) and sim[0, 2] == pytest.approx(0.0)
+
+
+def test_past_ticket_quoting_the_faq_is_dropped_as_duplicate():
+    past = [{"ticket_id": "T9", "category": "PAST_TICKET", "snippet": CACHE, "score": 0.9}]
+    context = assemble_context(kb(CACHE, UPDATE), past)
+
+    assert [p["snippet"] for p in context.passages] == [CACHE, UPDATE]
+    assert context.dropped[0]["reason"] == DROP_DUPLICATE
+    assert context.dropped[0]["similar_to"]["title"] == "t0"
+    assert context.tokens_saved == count_tokens(CACHE)
+
+
+def test_budget_skips_large_passages_but_keeps_smaller_ones():
+    long = " ".join(["Reports include logs, system info and stack traces."] * 20)
+    budget = count_tokens(CACHE) + count_tokens(BILLING)
+    context = assemble_context(kb(CACHE, long, BILLING), token_budget=budget)
+
+    assert [p["snippet"] for p in context.passages] == [CACHE, BILLING]
+    assert context.summary()["dropped"] == {DROP_OVER_BUDGET: 1}
+    assert context.tokens_used <= budget
+
+
+def test_single_oversized_passage_is_truncated():
+    context = assemble_context(kb(" ".join([UPDATE] * 50)), token_budget=20)
+    assert context.passages[0]["truncated"] and context.tokens_used <= 20
+
+
+def test_max_passages_and_embedding_similarity():
+    context = assemble_context(kb(CACHE, UPDATE, BILLING), max_passages=2, embeddings=FakeEmbeddings())
+    assert len(context.passages) == 2 and context.dropped[0]["reason"] == DROP_MAX_PASSAGES
+    assert "[1] (KB) t0" in context.as_text()
+
+
+def test_dense_distances_keep_the_exact_match_first():
+    # retrieve_hybrid's dense fallback scores by L2 distance: lower is better
+    results = [
+        {"title": "exact", "snippet": CACHE, "score": 0.0, "retriever": "dense"},
+        {"title": "near", "snippet": UPDATE, "score": 0.8, "retriever": "dense"},
+        {"title": "far", "snippet": BILLING, "score": 1.9, "retriever": "dense"},
+    ]
+    context = assemble_context(results, token_budget=count_tokens(CACHE) + count_tokens(BILLING))
+
+    assert context.passages[0]["title"] == "exact"
+    assert [d["title"] for d in context.dropped] == ["near"]
@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+
+from knowledge import docstore
+from tests.fakes import FakeEmbeddings
+
+TEXTS = ["reset your password from the login page", "billing changes apply next cycle"]
+
+
+def build(texts=TEXTS):
+    return FAISS.from_texts(texts, FakeEmbeddings(), ids=[f"doc-{i}" for i in range(len(texts))])
+
+
+def test_round_trip(tmp_path):
+    docstore.save_vectorstore(build(), tmp_path)
+    loaded = docstore.load_vectorstore(tmp_path, FakeEmbeddings())
+
+    assert loaded.index.ntotal == 2
+    assert loaded.similarity_search("password login", k=1)[0].page_content == TEXTS[0]
+    docstore.close_vectorstore(loaded)
+
+
+def test_docstore_is_committed_before_the_index_goes_live(tmp_path, monkeypatch):
+    def crash(*args):
+        raise OSError("crashed before the index was swapped in")
+
+    monkeypatch.setattr(docstore.os, "replace", crash)
+    with pytest.raises(OSError):
+        docstore.save_vectorstore(build(), tmp_path)
+
+    assert not (tmp_path / docstore.INDEX_FILE).exists()
+    with sqlite3.connect(tmp_path / docstore.DOCSTORE_FILE) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM index_map").fetchone()[0] == 2
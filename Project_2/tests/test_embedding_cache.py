@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from knowledge.embedding_cache import CachedEmbeddings
+from tests.fakes import FakeEmbeddings
+
+
+def make_cache(path, base=None):
+    return CachedEmbeddings(base or FakeEmbeddings(), cache_dir=path, model_name="fake")
+
+
+def test_cached_texts_skip_the_model(tmp_path):
+    base = FakeEmbeddings()
+    cache = make_cache(tmp_path, base)
+    first = cache.embed_documents(["reset password", "billing cycle"])
+    again = cache.embed_documents(["billing cycle", "reset password"])
+
+    assert base.calls == 1
+    assert again == [first[1], first[0]]
+    assert make_cache(tmp_path).lookup(["reset password"])[0] is not None
+
+
+def test_torn_last_row_is_truncated_on_open(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.embed_documents(["one", "two"])
+    # Crash mid-append: half a vector and no key for it
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\0" * 10)
+
+    reopened = make_cache(tmp_path)
+    assert len(reopened) == 2
+    reopened.embed_documents(["three"])
+
+    final = make_cache(tmp_path)
+    assert len(final) == 3
+    expected = FakeEmbeddings().embed_documents(["three"])[0]
+    assert np.allclose(final.lookup(["three"])[0], expected)
+
+
+def test_unmatched_keys_are_dropped(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.embed_documents(["one"])
+    with open(tmp_path / "keys.txt", "a", encoding="utf-8") as f:
+        f.write("deadbeef\n")
+
+    reopened = make_cache(tmp_path)
+    assert len(reopened) == 1
+    assert (tmp_path / "keys.txt").read_text(encoding="utf-8").count("\n") == 1
+
+
+def test_two_writers_stay_aligned(tmp_path):
+    a, b = make_cache(tmp_path), make_cache(tmp_path)
+    a.embed_documents(["shared", "only a"])
+    b.embed_documents(["shared", "only b"])  # "shared" already stored by a
+
+    merged = make_cache(tmp_path)
+    assert len(merged) == 3
+    fake = FakeEmbeddings()
+    for text in ["shared", "only a", "only b"]:
+        assert np.allclose(merged.lookup([text])[0], fake.embed_query(text))
+
+
+def test_queries_stay_in_memory_and_are_evicted(tmp_path):
+    base = FakeEmbeddings()
+    cache = CachedEmbeddings(base, cache_dir=tmp_path, model_name="fake", query_cache_size=2, query_prefix="")
+    cache.embed_documents(["reset password"])
+
+    cache.embed_documents_array(["q1", "q2", "q3"], kind="query")
+    assert len(cache) == 1  # only the document row is on disk
+    assert cache.stats()["query_lru"] == 2
+
+    base.calls = 0
+    cache.embed_query("q3")
+    assert base.calls == 0
+    cache.embed_query("q1")  # evicted
+    assert base.calls == 1
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("langchain_groq")
+
+from agents.extractor import aextract_bulk, extract_bulk, run_backlog_extraction, update_facts
+from state import ExtractedFacts, SupportTicketState
+from state.facts import merge_facts, normalize_fact
+from state.session_store import SessionStore
+from tests.fakes import FakeChain
+
+
+def ticket(ticket_id, text, info_list=()):
+    return SupportTicketState(
+        ticket_id=ticket_id,
+        ticket_text=text,
+        info_list=list(info_list),
+        confidence=0.0,
+        ticket_created_at=datetime(2026, 6, 1),
+        sla_seconds=3600,
+    )
+
+
+def facts_chain(facts_by_message):
+    def respond(value):
+        facts = facts_by_message[value["message"]]
+        return facts if isinstance(facts, Exception) else ExtractedFacts(facts=facts)
+    return FakeChain(respond)
+
+
+def test_normalize_and_merge_facts():
+    assert normalize_fact("  App  crashes ON login. ") == "app crashes on login"
+    merged, added = merge_facts(["App crashes on login"], ["app crashes on login!", "Version 2.3", ""])
+    assert merged == ["App crashes on login", "Version 2.3"] and added == ["Version 2.3"]
+
+
+def test_update_facts_only_extracts_the_latest_message():
+    chain = facts_chain({"it is version 2.3": ["Version 2.3", "App crashes"]})
+    state = update_facts(ticket("T1", "it is version 2.3", ["App crashes"]), chain)
+
+    assert state.info_list == ["App crashes", "Version 2.3"]
+    assert chain.inputs == [{"message": "it is version 2.3"}]
+
+
+def test_extract_bulk_reports_failures_after_retry():
+    chain = facts_chain({"ok": ["Fact"], "bad": RuntimeError("rate limited")})
+    states, report = extract_bulk([ticket("T1", "ok"), ticket("T2", "bad")], chain, retries=1)
+
+    assert states[0].info_list == ["Fact"] and states[1].info_list == []
+    assert report.succeeded == 1 and "T2" in report.failed and report.retried == 1
+
+
+def test_async_bulk_matches_sync():
+    tickets = [ticket("T1", "ok"), ticket("T2", "bad")]
+    chain = facts_chain({"ok": ["Fact"], "bad": RuntimeError("rate limited")})
+    sync_states, sync_report = extract_bulk(tickets, chain, retries=2)
+    async_states, async_report = asyncio.run(aextract_bulk(tickets, chain, retries=2))
+
+    assert async_states == sync_states
+    assert (async_report.succeeded, async_report.failed, async_report.retried) == \
+        (sync_report.succeeded, sync_report.failed, sync_report.retried) == (1, {"T2": "rate limited"}, 2)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_backlog_extraction_forwards_retries(tmp_path, use_async):
+    store = SessionStore(tmp_path / "sessions.sqlite")
+    store.save(ticket("T1", "bad"))
+    chain = facts_chain({"bad": RuntimeError("rate limited")})
+
+    report = run_backlog_extraction(store, chain=chain, retries=3, use_async=use_async)
+
+    assert len(chain.inputs) == 4 and report.retried == 3 and "T1" in report.failed
+
+
+def test_backlog_extraction_keeps_turns_saved_meanwhile(tmp_path):
+    store = SessionStore(tmp_path / "sessions.sqlite")
+    store.save(ticket("T1", "app crashes", ["Android"]))
+
+    def respond(value):
+        # The user replies while the batch LLM call is in flight
+        store.append_turn("T1", "user", "still broken")
+        return ExtractedFacts(facts=["App crashes", "Android"])
+
+    report = run_backlog_extraction(store, chain=FakeChain(respond))
+    state = store.get("T1")
+
+    assert report.succeeded == 1 and report.facts_added == 1
+    assert state.info_list == ["Android", "App crashes"]
+    assert state.ticket_text == "still broken" and len(state.messages) == 1
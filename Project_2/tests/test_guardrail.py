@@ -0,0 +1,102 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_groq")
+
+from agents.responder import SentenceSplitter, StreamGuard, respond
+from decision.confidence import SUPPORT_THRESHOLD, sentence_support, snippet_terms
+from decision.policy import check_forbidden
+from exceptions import GuardrailViolationError
+from state import SupportTicketState
+from tests.fakes import FakeChain
+
+KB = (Path(__file__).resolve().parents[1] / "knowledge" / "Knowledge Base" / "kb.txt").read_text(encoding="utf-8")
+ACCOUNT, CRASHES, _, BILLING, _, NETWORK = [section for section in KB.split("---") if section.strip()][:6]
+
+# (sentence, passage, ticket text); used to calibrate SUPPORT_THRESHOLD
+GROUNDED = [
+    ("Sorry to hear about the crashes.", CRASHES, "the app crashes on login"),
+    ("macOS 13 is supported, so your OS version is not the cause.", CRASHES, "app crashes on macOS 13"),
+    ("Make sure the app is running the latest stable version.", CRASHES, "app crashes"),
+    ("Clear the cache via Settings > Storage > Clear Cache.", CRASHES, "app crashes"),
+    ("Error 401 means your login credentials or token have expired.", CRASHES, "I get error 401"),
+    ("You can download invoices in PDF format under Settings > Billing > History.", BILLING, "where are my invoices"),
+    ("Corporate firewalls may block API calls, so whitelist the saasapp.com domains.", NETWORK, "firewall blocks app"),
+    ("Passwords must be at least 12 characters long.", ACCOUNT, "password rejected"),
+]
+INVENTED = [
+    ("Passwords must be at least 16 characters long.", ACCOUNT, "password rejected"),
+    ("Your account will be migrated to the new European datacenter tonight.", NETWORK, "app slow"),
+    ("Reinstalling the graphics driver usually resolves rendering glitches on Nvidia cards.", CRASHES, "app crashes"),
+    ("Premium subscribers receive a dedicated account manager and phone support.", BILLING, "plans"),
+    ("Delete the config folder in AppData and restart.", CRASHES, "app crashes on windows"),
+]
+
+
+def support(sentence, passage, ticket_text):
+    return sentence_support(sentence, snippet_terms([passage, ticket_text]))
+
+
+def test_threshold_separates_grounded_and_invented_sentences():
+    grounded = [support(*case) for case in GROUNDED]
+    invented = [support(*case) for case in INVENTED]
+
+    assert min(grounded) >= SUPPORT_THRESHOLD > max(invented)
+
+
+@pytest.mark.parametrize("sentence", ["Try these steps:", "Let me know if that helps!", "Happy to help further."])
+def test_courtesy_and_framing_sentences_are_not_judged(sentence):
+    assert StreamGuard([CRASHES]).check_sentence(sentence) is None
+
+
+def test_user_supplied_numbers_are_not_invented():
+    sentence = "macOS 13 is supported."
+    with pytest.raises(GuardrailViolationError):
+        StreamGuard([CRASHES]).check_sentence(sentence)
+    assert StreamGuard([CRASHES], ticket_text="crashes on macOS 13").check_sentence(sentence) == 1.0
+    assert StreamGuard([CRASHES], info_list=["macOS 13"]).check_sentence(sentence) == 1.0
+
+
+def test_policy_flags_promises_but_not_kb_facts():
+    assert check_forbidden("We will issue you a full refund today.").rule == "refund_promise"
+    assert check_forbidden("Please send us your password.").rule == "credential_request"
+    assert check_forbidden("Refund requests are evaluated on a case-by-case basis.") is None
+
+
+def test_sentence_splitter_keeps_list_numbers_and_buffers_the_tail():
+    splitter = SentenceSplitter()
+    assert splitter.feed("1. Clear the cache. Then rest") == ["1. Clear the cache. "]
+    assert splitter.feed("art the app!\nDone") == ["Then restart the app!\n"]
+    assert splitter.flush() == "Done"
+
+
+def ticket(text):
+    return SupportTicketState(
+        ticket_id="T1",
+        ticket_text=text,
+        confidence=0.0,
+        ticket_created_at=datetime(2026, 6, 1),
+        sla_seconds=3600,
+        retrieved_from_kb=[{"source": "kb.txt", "title": "Crashes", "parent_id": "p2", "snippet": CRASHES, "score": 0.9}],
+    )
+
+
+def test_respond_releases_a_grounded_answer_with_courtesy_sentences():
+    chain = FakeChain(lambda inputs: ["Sorry to hear about the crashes. Try these steps:\n",
+                                      "Clear the cache via Settings > Storage > Clear Cache. ",
+                                      "Let me know if that helps!"])
+    released = []
+    state, result = respond(ticket("the app crashes on macOS 13"), chain=chain, on_text=released.append)
+
+    assert state.current_verdict == "A" and len(released) == 4
+    assert [s["support"] for s in result.sentences] == [1.0, None, 1.0, None]
+
+
+def test_respond_stops_the_stream_on_an_invented_claim():
+    chain = FakeChain(lambda inputs: ["Clear the cache. ", "Passwords must be 16 characters. ", "Never reached."])
+    state, result = respond(ticket("the app crashes"), chain=chain)
+
+    assert state.current_verdict == "E" and result.violation["check"] == "unsupported_claim"
+    assert chain.closed and result.chunks_streamed == 2
@@ -0,0 +1,99 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+import knowledge
+from knowledge import docstore, indexer
+from knowledge.hot_reload import IndexHolder, store_fingerprint
+from tests.fakes import FakeEmbeddings
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(indexer, "get_embeddings", lambda *a, **k: embeddings)
+    monkeypatch.setattr(knowledge, "get_embeddings", lambda *a, **k: embeddings)
+
+    folder = tmp_path / "kb"
+    folder.mkdir()
+    (folder / "crash.txt").write_text("**Title:** Crashes\n\nReinstall the app after a crash.", encoding="utf-8")
+    paths = {"kb_folder": folder, "vectorstore_path": tmp_path / "kb_index", "manifest_path": tmp_path / "manifest.json"}
+    indexer.update_vectorstore(**paths)
+    return paths
+
+
+def versions(path):
+    return sorted(p.name for p in path.parent.glob(f"{path.name}.v*"))
+
+
+def test_publish_swaps_a_symlink_and_keeps_two_versions(kb):
+    path = kb["vectorstore_path"]
+    assert path.is_symlink() and len(versions(path)) == 1
+
+    for i in range(3):
+        (kb["kb_folder"] / f"extra{i}.txt").write_text(f"**Title:** Extra {i}\n\nBilling detail {i}.", encoding="utf-8")
+        indexer.update_vectorstore(**kb)
+
+    assert len(versions(path)) == docstore.KEEP_VERSIONS
+    assert os.readlink(path) == versions(path)[-1]
+    assert not list(path.parent.glob(".kb_index.staging-*"))
+
+
+def test_legacy_directory_is_moved_aside(tmp_path):
+    path = tmp_path / "kb_index"
+    path.mkdir()
+    (path / "marker").write_text("old", encoding="utf-8")
+    staging = docstore.staging_path(path)
+
+    docstore.publish_vectorstore(staging, path)
+    assert path.is_symlink()
+    assert (tmp_path / "kb_index.v0" / "marker").exists()
+
+
+def test_incremental_staging_links_indexes_and_copies_the_docstore(kb):
+    live = docstore.resolve_store(kb["vectorstore_path"])
+    staging = docstore.staging_path(kb["vectorstore_path"], copy_current=True)
+
+    assert os.stat(staging / docstore.INDEX_FILE).st_ino == os.stat(live / docstore.INDEX_FILE).st_ino
+    assert os.stat(staging / docstore.DOCSTORE_FILE).st_ino != os.stat(live / docstore.DOCSTORE_FILE).st_ino
+
+
+def test_build_lock_is_exclusive_across_threads(kb):
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with docstore.build_lock(kb["vectorstore_path"]):
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait(5)
+    with pytest.raises(BlockingIOError):
+        indexer.update_vectorstore(**kb, blocking=False)
+    release.set()
+    thread.join()
+
+    with docstore.build_lock(kb["vectorstore_path"]), docstore.build_lock(kb["vectorstore_path"]):
+        pass  # re-entrant in one thread
+
+
+def test_holder_reloads_new_version_while_old_one_is_in_use(kb):
+    holder = IndexHolder(kb["vectorstore_path"], manifest_path=kb["manifest_path"])
+    first = holder.stats()["kb_version"]
+
+    with holder.acquire() as pinned:
+        (kb["kb_folder"] / "billing.txt").write_text("**Title:** Billing\n\nInvoices are sent monthly.", encoding="utf-8")
+        indexer.update_vectorstore(**kb)
+        assert holder.reload() is True
+        # The pinned (retired) version still answers until released
+        assert pinned.similarity_search("crash", k=1)
+
+    stats = holder.stats()
+    assert stats["kb_version"] != first and stats["reloads"] == 1
+    assert holder.reload() is False  # fingerprint unchanged
+    assert store_fingerprint(kb["vectorstore_path"])[0] == str(docstore.resolve_store(kb["vectorstore_path"]))
+    assert holder.retrieve("invoices monthly", k=1)[0]["snippet"]
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("langchain_community")
+
+import knowledge
+from knowledge import indexer
+from tests.fakes import FakeEmbeddings
+
+FAQ = """**FAQ 001 — Account**
+**Title:** Managing your account
+
+Users can change their email in Settings.
+
+---
+
+**FAQ 002 — Billing**
+**Title:** Billing cycles
+
+Billing changes take effect at the next cycle.
+"""
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(indexer, "get_embeddings", lambda *a, **k: embeddings)
+    monkeypatch.setattr(knowledge, "get_embeddings", lambda *a, **k: embeddings)
+
+    folder = tmp_path / "kb"
+    folder.mkdir()
+    (folder / "a.txt").write_text(FAQ, encoding="utf-8")
+    (folder / "b.txt").write_text("**Title:** Crashes\n\nReinstall the app after a crash.", encoding="utf-8")
+    paths = {"kb_folder": folder, "vectorstore_path": tmp_path / "index", "manifest_path": tmp_path / "manifest.json"}
+    return folder, paths
+
+
+def test_first_run_is_a_full_build(kb):
+    _, paths = kb
+    update = indexer.update_vectorstore(**paths)
+    assert sorted(update.added) == ["a.txt", "b.txt"]
+    assert update.vectors_added > 0
+    assert indexer.load_manifest(paths["manifest_path"])["files"].keys() == {"a.txt", "b.txt"}
+
+
+def test_unchanged_folder_is_a_noop(kb):
+    _, paths = kb
+    indexer.update_vectorstore(**paths)
+    update = indexer.update_vectorstore(**paths)
+    assert update.is_noop
+    assert sorted(update.unchanged) == ["a.txt", "b.txt"]
+
+
+def test_only_changed_and_removed_files_are_reindexed(kb):
+    folder, paths = kb
+    indexer.update_vectorstore(**paths)
+    before = indexer.load_manifest(paths["manifest_path"])["files"]
+
+    (folder / "b.txt").write_text("**Title:** Crashes\n\nClear the cache, then reinstall.", encoding="utf-8")
+    (folder / "a.txt").unlink()
+    update = indexer.update_vectorstore(**paths)
+
+    assert update.changed == ["b.txt"] and update.removed == ["a.txt"] and not update.added
+    assert update.vectors_removed == len(before["a.txt"]["ids"]) + len(before["b.txt"]["ids"])
+
+    vectorstore = knowledge.load_saved_vectorstore(paths["vectorstore_path"], ann=False)
+    ids = set(vectorstore.index_to_docstore_id.values())
+    manifest = indexer.load_manifest(paths["manifest_path"])["files"]
+    assert ids == set(manifest["b.txt"]["ids"])
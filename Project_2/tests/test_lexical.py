@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+
+from knowledge import chunk_file, docstore, retrieve_hybrid
+from knowledge.lexical import is_strong_lexical_match, reciprocal_rank_fusion, tokenize
+from tests.fakes import FakeEmbeddings
+
+KB_FILE = Path(__file__).resolve().parents[1] / "knowledge" / "Knowledge Base" / "kb.txt"
+
+
+@pytest.fixture
+def store(tmp_path):
+    docstore.save_vectorstore(FAISS.from_documents(chunk_file(KB_FILE)[1], FakeEmbeddings()), tmp_path)
+    vectorstore = docstore.load_vectorstore(tmp_path, FakeEmbeddings())
+    yield vectorstore
+    docstore.close_vectorstore(vectorstore)
+
+
+def test_tokenize_keeps_codes_and_versions_whole():
+    assert tokenize("Error 0x80070005 on Ubuntu 20.04 with sso-login") == ["error", "0x80070005", "ubuntu", "20.04", "sso-login"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = dict(reciprocal_rank_fusion([["a", "b", "c"], ["b", "a", "d"]], rrf_k=60))
+    assert fused["a"] == fused["b"] > fused["c"] == fused["d"]
+
+
+def test_strong_match_needs_full_coverage_and_a_margin():
+    assert is_strong_lexical_match([("a", 9.0, 1.0), ("b", 3.0, 0.5)], margin=1.5)
+    assert not is_strong_lexical_match([("a", 9.0, 0.5)], margin=1.5)
+    assert not is_strong_lexical_match([("a", 4.0, 1.0), ("b", 3.0, 1.0)], margin=1.5)
+
+
+def test_exact_term_query_takes_the_lexical_fast_path(store):
+    fast = retrieve_hybrid("whitelist saasapp.com", store, k=1)
+    assert fast[0]["retriever"] == "lexical" and "saasapp.com" in fast[0]["snippet"]
+
+    fused = retrieve_hybrid("whitelist saasapp.com", store, k=1, lexical_fast_path=False)
+    assert fused[0]["retriever"] == "hybrid" and "saasapp.com" in fused[0]["snippet"]
+
+
+def test_lexical_index_follows_deletes(store):
+    hits = store.docstore.lexical.search("saasapp.com", k=5)
+    store.delete([hits[0][0]])
+    assert store.docstore.lexical.search("saasapp.com", k=5) == []
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from state import SupportTicketState
+from state import memory as memory_module
+from state.memory import TicketMemory
+from tests.fakes import FakeEmbeddings
+
+NOW = datetime(2026, 6, 1)
+
+
+def ticket(i, text):
+    return SupportTicketState(
+        ticket_id=f"T{i}",
+        ticket_text=text,
+        confidence=0.9,
+        final_verdict="A",
+        answer="Reinstall the app.",
+        ticket_created_at=NOW,
+        sla_seconds=3600,
+    )
+
+
+def archived_flags(memory):
+    return [row[0] for row in memory._conn.execute("SELECT archived FROM tickets ORDER BY row_id")]
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = TicketMemory(tmp_path, hot_window_days=30, embeddings=FakeEmbeddings())
+    memory.add(ticket(1, "app crashes on login"), resolved_at=NOW - timedelta(days=60))
+    memory.add(ticket(2, "billing charged twice"), resolved_at=NOW)
+    yield memory
+    memory.close()
+
+
+def test_compact_moves_old_tickets_to_the_archive(memory):
+    summary = memory.compact(now=NOW)
+
+    assert summary["archived"] == 1 and summary["hot"] == 1 and summary["cold"] == 1
+    assert memory.search("app crashes on login", k=1)[0]["ticket_id"] == "T2"
+    assert memory.search("app crashes on login", k=1, include_archive=True)[0]["ticket_id"] == "T1"
+
+
+def test_failed_compaction_rolls_back(memory, monkeypatch):
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(memory_module.faiss, "write_index", fail)
+    with pytest.raises(OSError):
+        memory.compact(now=NOW)
+
+    assert archived_flags(memory) == [0, 0]
+    assert memory.stats()["hot"] == 2 and memory.stats()["cold"] == 0
+
+    monkeypatch.undo()
+    assert memory.compact(now=NOW)["archived"] == 1
+    assert archived_flags(memory) == [1, 0]
+
+
+def test_hot_index_size_limit_triggers_compaction(tmp_path):
+    memory = TicketMemory(tmp_path, hot_window_days=30, hot_max_tickets=2, embeddings=FakeEmbeddings())
+    for i in range(3):
+        memory.add(ticket(i, f"ticket number {i}"), resolved_at=datetime.now() + timedelta(minutes=i))
+
+    assert memory.stats() == {"tickets": 3, "hot": 1, "cold": 2}
+    assert archived_flags(memory) == [1, 1, 0]  # the oldest ones, down to the low-water mark
+    memory.close()
+
+
+def test_adds_past_the_limit_rewrite_the_cold_index_once(tmp_path, monkeypatch):
+    writes = []
+    write_index = memory_module.faiss.write_index
+    monkeypatch.setattr(memory_module.faiss, "write_index", lambda *a: writes.append(1) or write_index(*a))
+
+    memory = TicketMemory(tmp_path, hot_window_days=30, hot_max_tickets=10, embeddings=FakeEmbeddings())
+    for i in range(16):
+        memory.add(ticket(i, f"ticket number {i}"), resolved_at=datetime.now() + timedelta(minutes=i))
+
+    assert len(writes) == 1
+    assert memory.stats() == {"tickets": 16, "hot": 10, "cold": 6}
+    memory.close()
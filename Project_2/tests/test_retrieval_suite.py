@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from benchmarks import retrieval_suite
+from benchmarks.retrieval_suite import DEFAULT_QUERIES, generate_queries, load_queries, overlap_recall, run_batch
+from tests.fakes import FakeEmbeddings
+
+
+def test_default_query_set_is_paraphrased_and_labelled():
+    queries = load_queries(DEFAULT_QUERIES)
+    indexed = {q["query"].casefold() for q in generate_queries()}
+
+    assert len({q["parent_ids"][0] for q in queries}) == 6  # every FAQ entry is covered
+    assert not indexed & {q["query"].casefold() for q in queries}
+
+
+def test_overlap_recall_against_exact_top_k():
+    exact = [[("p1", "a"), ("p1", "b")], [("p2", "c")]]
+    assert overlap_recall(exact, exact) == 1.0
+    assert overlap_recall([[("p1", "a"), ("p3", "x")], [("p2", "d")]], exact) == 0.25
+
+
+def test_batch_reports_wall_time_not_percentiles():
+    docs = [Document(page_content=f"topic {i}", metadata={"parent_id": f"p{i}"}) for i in range(4)]
+    vectorstore = FAISS.from_documents(docs, FakeEmbeddings())
+    metrics, results = run_batch(vectorstore, [{"query": "topic 1", "parent_ids": ["p1"]}], k=2)
+
+    assert "p50_ms" not in metrics and metrics["batch_seconds"] >= 0
+    assert len(results[0]) == 2
+
+
+def test_subprocess_runner_returns_the_result():
+    assert retrieval_suite._in_subprocess(overlap_recall, [[("p", "a")]], [[("p", "a")]]) == 1.0
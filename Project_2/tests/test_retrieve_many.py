@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from knowledge import retrieve_from_kb, retrieve_many
+from knowledge.embedding_cache import CachedEmbeddings
+from tests.fakes import FakeEmbeddings
+
+TEXTS = [
+    "reset your password from the login page",
+    "billing changes apply next cycle",
+    "clear the cache after a crash",
+    "whitelist the domains in your firewall",
+]
+
+
+@pytest.fixture
+def store():
+    docs = [Document(page_content=t, metadata={"parent_id": f"p{i}", "title": f"t{i}"}) for i, t in enumerate(TEXTS)]
+    return FAISS.from_documents(docs, FakeEmbeddings())
+
+
+def test_matches_per_query_retrieval_with_one_embedding_call(store):
+    queries = ["password login", "firewall domains", "cache crash"]
+    store.embedding_function.calls = 0
+    batched = retrieve_many(queries, store, k=2)
+
+    assert store.embedding_function.calls == 1
+    for query, results in zip(queries, batched):
+        expected = retrieve_from_kb(query, store, k=2)
+        assert [r["snippet"] for r in results] == [r["snippet"] for r in expected]
+        assert all(0.0 <= r["score"] <= 1.0 for r in results)
+
+
+def test_empty_and_oversized_requests(store):
+    assert retrieve_many([], store) == []
+    assert len(retrieve_many(["billing"], store, k=10)[0]) == len(TEXTS)  # -1 padding is skipped
+
+
+def test_cached_query_misses_are_embedded_in_one_batch(tmp_path):
+    base = FakeEmbeddings()
+    cached = CachedEmbeddings(base, cache_dir=tmp_path, model_name="fake", query_prefix="")
+    store = FAISS.from_texts(TEXTS, cached)
+    queries = ["password login", "firewall domains", "cache crash", "billing cycle"]
+
+    base.calls = 0
+    results = retrieve_many(queries, store, k=1)
+    assert base.calls == 1
+    assert [r[0]["snippet"] for r in results] == [retrieve_from_kb(q, store, k=1)[0]["snippet"] for q in queries]
@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import scheduler
+from scheduler import FAST_PATH, FULL_PATH, EDFScheduler
+from state import SupportTicketState
+
+
+def ticket(ticket_id, sla_seconds=3600):
+    return SupportTicketState(
+        ticket_id=ticket_id,
+        ticket_text="app crashes",
+        confidence=0.0,
+        ticket_created_at=datetime.now(),
+        sla_seconds=sla_seconds,
+    )
+
+
+def answered(state):
+    return state.model_copy(update={"current_verdict": "A"})
+
+
+def test_earliest_deadline_runs_first():
+    gate, order = threading.Event(), []
+
+    def handler(state):
+        gate.wait(5)
+        order.append(state.ticket_id)
+        return answered(state)
+
+    edf = EDFScheduler(handler, workers=1).start()
+    blocker = edf.submit(ticket("blocker"))
+    time.sleep(0.05)  # the single worker is now busy
+    futures = [edf.submit(ticket("late"), deadline=time.time() + 300), edf.submit(ticket("soon"), deadline=time.time() + 100)]
+    gate.set()
+    for future in [blocker, *futures]:
+        future.result(5)
+    edf.shutdown()
+
+    assert order == ["blocker", "soon", "late"]
+
+
+def test_ticket_without_slack_takes_the_fast_path():
+    edf = EDFScheduler(answered, workers=1).start()
+    result = edf.submit(ticket("urgent"), deadline=time.time() + 1).result(5)
+    edf.shutdown()
+
+    assert result.current_verdict == "R"  # asked for details instead of running the full path
+    assert edf.stats()[FAST_PATH] == 1
+
+
+def test_unused_full_path_estimate_decays_to_its_prior():
+    edf = EDFScheduler(answered, workers=1, estimate_half_life_seconds=10)
+    now = time.time()
+    edf._record_duration(FULL_PATH, 505.0, now)  # one very slow run
+    slack = scheduler.INITIAL_FULL_PATH_ESTIMATE_SECONDS + 10
+
+    assert edf._choose_path(slack, now) == FAST_PATH
+    assert edf._choose_path(slack, now + 120) == FULL_PATH
+
+
+def test_shutdown_without_wait_cancels_queued_tickets():
+    gate = threading.Event()
+    edf = EDFScheduler(lambda state: gate.wait(5) and answered(state), workers=1).start()
+    running = edf.submit(ticket("running"))
+    time.sleep(0.05)
+    queued = edf.submit(ticket("queued"))
+
+    edf.shutdown(wait=False)
+    gate.set()
+
+    assert queued.cancelled()
+    assert running.result(5).current_verdict == "A"
+    with pytest.raises(RuntimeError):
+        edf.submit(ticket("after"))
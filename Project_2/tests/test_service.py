@@ -0,0 +1,112 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from knowledge import service
+from knowledge.config import RETRIEVAL_MAX_K
+from knowledge.service import MicroBatcher, RetrievalClient, RetrievalServer
+
+
+class FakeHolder:
+    @contextmanager
+    def acquire(self):
+        yield "vectorstore"
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def retrieve_calls(monkeypatch):
+    calls = []
+
+    def retrieve_many(queries, vectorstore, k, expand_parent=False):
+        calls.append(list(queries))
+        if "boom" in queries:
+            raise ValueError("bad query")
+        return [[{"snippet": f"{q} {i}"} for i in range(k)] for q in queries]
+
+    monkeypatch.setattr(service, "retrieve_many", retrieve_many)
+    return calls
+
+
+@pytest.fixture
+def server(tmp_path, retrieve_calls):
+    srv = RetrievalServer(FakeHolder(), socket_path=tmp_path / "kb.sock", max_wait_ms=20)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_batcher_groups_queries_and_slices_k(retrieve_calls):
+    batcher = MicroBatcher(FakeHolder(), max_wait_ms=50)
+    futures = [batcher.submit("a", 1, False), batcher.submit("b", 3, False)]
+    batcher.start()
+
+    assert [len(f.result(5)) for f in futures] == [1, 3]
+    assert retrieve_calls == [["a", "b"]]
+    batcher.stop()
+
+
+def test_failed_batch_only_fails_the_bad_query(retrieve_calls):
+    batcher = MicroBatcher(FakeHolder(), max_wait_ms=50)
+    good, bad = batcher.submit("ok", 2, False), batcher.submit("boom", 2, False)
+    batcher.start()
+
+    assert len(good.result(5)) == 2
+    with pytest.raises(ValueError):
+        bad.result(5)
+    assert batcher.stats()["failed_batches"] == 1
+    batcher.stop()
+
+
+def test_stop_fails_queued_queries_and_rejects_new_ones(retrieve_calls):
+    batcher = MicroBatcher(FakeHolder())
+    queued = batcher.submit("never run", 1, False)  # batcher thread never started
+    batcher.stop()
+
+    with pytest.raises(RuntimeError):
+        queued.result(1)
+    with pytest.raises(RuntimeError):
+        batcher.submit("late", 1, False)
+
+
+@pytest.mark.parametrize("request_", [
+    {"queries": "not a list"},
+    {"queries": ["a", 3]},
+    {"queries": ["a"], "k": 0},
+    {"queries": ["a"], "k": RETRIEVAL_MAX_K + 1},
+    {"queries": ["a"], "k": "3"},
+    {"op": "drop_index"},
+])
+def test_dispatch_rejects_invalid_requests(server, retrieve_calls, request_):
+    assert "error" in server.dispatch(request_)
+    assert retrieve_calls == []
+
+
+def test_client_round_trip(server):
+    client = RetrievalClient(server.socket_path, timeout=5)
+    assert client.retrieve_many(["crash", "billing"], k=2)[1][0]["snippet"] == "billing 0"
+    with pytest.raises(RuntimeError):
+        client.retrieve_many(["crash"], k=RETRIEVAL_MAX_K + 1)
+    client.close()
+
+
+def test_client_timeout_is_not_retried(tmp_path):
+    import socket
+
+    path = str(tmp_path / "silent.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(4)  # accepts connections but never answers
+
+    client = RetrievalClient(path, timeout=0.2)
+    with pytest.raises(TimeoutError):
+        client.retrieve_many(["crash"])
+    assert getattr(client._local, "conn", None) is None  # the stale connection was dropped
+    listener.close()
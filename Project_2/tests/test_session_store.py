@@ -0,0 +1,64 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from state import SupportTicketState
+from state.session_store import SessionStore
+
+
+def ticket(ticket_id="T1"):
+    return SupportTicketState(
+        ticket_id=ticket_id,
+        ticket_text="app crashes on login",
+        confidence=0.0,
+        ticket_created_at=datetime(2026, 6, 1),
+        sla_seconds=3600,
+    )
+
+
+@pytest.fixture
+def db(tmp_path):
+    return tmp_path / "sessions.sqlite"
+
+
+def test_deltas_round_trip_and_compaction(db):
+    store = SessionStore(db, compact_every=3)
+    store.save(ticket())
+    for i in range(5):
+        store.append_turn("T1", "user", f"message {i}")
+
+    fresh = SessionStore(db)
+    state = fresh.get("T1")
+    assert [text for _, text in state.messages] == [f"message {i}" for i in range(5)]
+    assert state.ticket_text == "message 4"
+
+
+def test_two_instances_on_one_db_keep_both_turns(db):
+    a, b = SessionStore(db), SessionStore(db)
+    a.save(ticket())
+    b.get("T1")  # b now caches version 1
+
+    a.append_turn("T1", "user", "from a")
+    b.append_turn("T1", "agent", "from b")  # stale cache: must rehydrate, not collide
+
+    assert [text for _, text in SessionStore(db).get("T1").messages] == ["from a", "from b"]
+    assert b.stats()["conflicts"] == 1
+
+
+def test_concurrent_appends_in_one_instance_are_not_lost(db):
+    store = SessionStore(db)
+    store.save(ticket())
+
+    threads = [threading.Thread(target=store.append_turn, args=("T1", "user", f"m{i}")) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(SessionStore(db).get("T1").messages) == 20
+
+
+def test_update_of_unknown_ticket_raises(db):
+    with pytest.raises(KeyError):
+        SessionStore(db).append_turn("missing", "user", "hello")